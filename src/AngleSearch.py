@@ -0,0 +1,107 @@
+# Library
+import numpy as np
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# Local
+from Rectangles import RectangleFactory
+from ToolPath import ToolPath
+
+# How good sweeping a field at one angle is, lower cost is better
+SweepScore = namedtuple('SweepScore', ['angle', 'turns', 'overhang', 'length', 'cost'])
+
+def ScoreAngle(polygon, toolSize, toolLength, pointsInEachPath, turnPenalty, angle, obstacles = None):
+    """
+    Plans a field at one angle and scores it. Lives at module level so it can be sent to a process pool.
+
+    Args:
+        polygon (Shapely::Polygon): field to plan
+        toolSize (float): Width of rectangle
+        toolLength (float): length of trailing object
+        pointsInEachPath (int): points to be in each seperate path object
+        turnPenalty (float): distance a turn is worth on top of its own length
+        angle (float): radians to rotate the field by, None for the longest edge
+        obstacles (list of Shapely::Polygon): other obstacles in world coordinates, see RectangleFactory
+
+    Returns:
+        SweepScore
+    """
+    rects = RectangleFactory(polygon, toolSize, angle, obstacles)
+    path = ToolPath(toolSize, toolLength, rects.rectangles, pointsInEachPath, obstacles=rects.obstacles)
+
+    turns = len(rects.rectangles.geoms) - 1
+    overhang = rects.rectangles.area - polygon.area
+    length = path.array.Length()
+
+    # overhang is counted as the distance it takes to drive over it
+    cost = length + overhang / toolSize + turnPenalty * turns
+
+    return SweepScore(rects.angle, turns, overhang, length, cost)
+
+# Tries many sweep directions for a field and keeps the best plan, instead of committing to the longest edge
+class AngleSearch():
+    def __init__(self, polygon, toolSize, toolLength, pointsInEachPath, gridSteps = 36, turnPenalty = None, workers = None,
+                 obstacles = None):
+        """
+        Scores every candidate angle across a process pool and plans the field at the best one.
+
+        Args:
+            polygon (Shapely::Polygon): field to plan
+            toolSize (float): Width of rectangle
+            toolLength (float): length of trailing object
+            pointsInEachPath (int): points to be in each seperate path object
+            gridSteps (int): evenly spaced angles to try on top of every edge direction
+            turnPenalty (float): distance a turn is worth on top of its own length, ten tool widths by default
+            workers (int): processes to score with, 1 scores in this process and None uses every core
+            obstacles (list of Shapely::Polygon): other obstacles in world coordinates, see RectangleFactory
+        """
+        if turnPenalty is None:
+            turnPenalty = 10 * toolSize
+
+        angles = self.CandidateAngles(polygon, gridSteps)
+        self.scores = self.ScoreAngles(polygon, toolSize, toolLength, pointsInEachPath, turnPenalty, angles, workers, obstacles)
+        self.best = min(self.scores, key=lambda score: score.cost)
+
+        self.rectangleFactory = RectangleFactory(polygon, toolSize, self.best.angle, obstacles)
+        self.toolPath = ToolPath(toolSize, toolLength, self.rectangleFactory.rectangles, pointsInEachPath,
+                                 obstacles=self.rectangleFactory.obstacles)
+
+    def CandidateAngles(self, polygon, gridSteps):
+        """
+        Angles that make each edge vertical, plus an even grid over a full turn.
+        The longest edge heuristic is always tried as None so the search is never worse than it.
+
+        Args:
+            polygon (Shapely::Polygon)
+            gridSteps (int): evenly spaced angles to add
+
+        Returns:
+            list of angles in radians
+        """
+        coords = np.array(polygon.exterior.coords)
+        edges = np.diff(coords, axis=0)
+        edges = edges[np.hypot(edges[:, 0], edges[:, 1]) > 0]
+
+        angles = np.pi / 2 - np.arctan2(edges[:, 1], edges[:, 0])
+        angles = np.concatenate((angles, np.arange(gridSteps) * 2 * np.pi / gridSteps))
+
+        # dropping angles that are the same direction
+        angles = np.unique(np.round(np.mod(angles, 2 * np.pi), 12))
+
+        return [None] + angles.tolist()
+
+    def ScoreAngles(self, polygon, toolSize, toolLength, pointsInEachPath, turnPenalty, angles, workers, obstacles = None):
+        """
+        Scores each angle, fanned out across a process pool.
+
+        Returns:
+            list of SweepScore in the order of angles
+        """
+        args = [[polygon] * len(angles), [toolSize] * len(angles), [toolLength] * len(angles),
+                [pointsInEachPath] * len(angles), [turnPenalty] * len(angles), angles, [obstacles] * len(angles)]
+
+        if workers == 1:
+            return list(map(ScoreAngle, *args))
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(ScoreAngle, *args, chunksize=max(1, len(angles) // 32)))
@@ -0,0 +1,241 @@
+# Library
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from shapely import wkt
+from shapely.geometry import MultiPolygon, Polygon, shape
+
+# Local
+from AngleSearch import AngleSearch
+from CellDecomposition import CellDecomposition
+from Coverage import Coverage
+from Export import Save, StreamWriter
+from Headlands import Headlands
+from Instrumentation import Profile
+from MaskReader import MaskReader
+from PathArray import PathArray
+from Rectangles import RectangleFactory
+from Sequencer import Sequencer
+from ToolPath import ToolPath
+from TurnTemplates import TurnTemplates
+
+# Boundary files that are read, anything else in the directory is skipped
+EXTENSIONS = ('.geojson', '.json', '.wkt', '.csv', '.npy')
+
+# A path covering less than this much of its field is reported as a warning, something was left out of the plan
+MIN_COVERED = 0.95
+
+# Spans the coverage check of every field is kept to when a full check wasn't asked for, see Coverage.Resolution
+CHECK_SPANS = 200000
+
+# Each worker process keeps the turns it has solved, fields planned with the same tool mostly turn the same way
+TEMPLATES = TurnTemplates()
+
+def ReadFields(path, pixelSize = 1.0):
+    """
+    Reads every field boundary in a file. A file with several polygons gives one field each,
+    named after the file and the polygon's position in it.
+
+    Args:
+        path (str): GeoJSON, WKT (one geometry per line), CSV of x,y coordinates or a .npy field mask
+        pixelSize (float): world units along each side of a mask's pixels
+
+    Returns:
+        list of (name, Shapely::Polygon)
+    """
+    stem, extension = os.path.splitext(os.path.basename(path))
+    extension = extension.lower()
+
+    if extension in ('.geojson', '.json'):
+        with open(path) as file:
+            data = json.load(file)
+        features = data['features'] if data.get('type') == 'FeatureCollection' else [data]
+        geometries = [shape(feature.get('geometry', feature)) for feature in features]
+    elif extension == '.wkt':
+        with open(path) as file:
+            geometries = [wkt.loads(line) for line in file if line.strip()]
+    elif extension == '.npy':
+        # simplified to a pixel, the staircase of the pixel edges isn't worth planning around
+        geometries = MaskReader(path, tolerance = pixelSize, pixelSize = pixelSize).Polygons()
+    else:
+        # a header line is skipped if there is one
+        with open(path) as file:
+            lines = [line for line in file if line.strip()]
+        try:
+            coords = np.loadtxt(lines, delimiter=',', ndmin=2)
+        except ValueError:
+            coords = np.loadtxt(lines[1:], delimiter=',', ndmin=2)
+        geometries = [Polygon(coords[:, :2])]
+
+    polygons = []
+    for geometry in geometries:
+        if isinstance(geometry, MultiPolygon):
+            polygons.extend(geometry.geoms)
+        else:
+            polygons.append(geometry)
+
+    if len(polygons) == 1:
+        return [(stem, polygons[0])]
+
+    return [('{}-{}'.format(stem, i), polygon) for i, polygon in enumerate(polygons)]
+
+def PlanField(name, polygon, toolSize, toolLength, pointsInEachPath, search, headlands = 0, turningRadius = 0, coverage = False,
+              cells = False, format = 'wkt'):
+    """
+    Plans one field and never raises, so a bad polygon only fails its own record.
+    Lives at module level so it can be sent to a process pool.
+    With headlands the laps are driven after the inside, angle is then a list with one for each piece of the inside.
+    A turningRadius orders the passes with Sequencer, only when planning without headlands or a search.
+    With cells the field is split into cells that each pass crosses once, planned one after another in this process.
+    With coverage the path is checked against the field on a grid and the areas are added to the record.
+    Every path is checked on a coarse grid, one that covers much less than the field is kept but its status is warning.
+    Any format but wkt hands back the path's rows, and the rectangles' bounds and frame when there was one plan, for Export to write.
+
+    Returns:
+        record (dict) for the summary and the world tool path as WKT or (rows, bounds, frame), None if it failed
+    """
+    record = {'name': name}
+    start = time.perf_counter()
+
+    try:
+        if not isinstance(polygon, Polygon):
+            raise TypeError('expected a Polygon, got a {}'.format(polygon.geom_type))
+        if not polygon.is_valid:
+            raise ValueError('polygon is not valid')
+
+        with Profile() as stats:
+            if headlands:
+                plan = Headlands(polygon, toolSize, toolLength, pointsInEachPath, rings = headlands, search = search)
+                plans = plan.plans
+            elif cells:
+                plan = CellDecomposition(polygon, toolSize, toolLength, pointsInEachPath, workers = 1)
+                plans = []
+            elif search:
+                plan = AngleSearch(polygon, toolSize, toolLength, pointsInEachPath, workers = 1)
+                plans = [(plan.rectangleFactory, plan.toolPath)]
+            else:
+                rects = RectangleFactory(polygon, toolSize)
+                order = Sequencer(rects.rectangles, turningRadius, toolLength = toolLength).Order() if turningRadius > 0 else None
+                plans = [(rects, ToolPath(toolSize, toolLength, rects.rectangles, pointsInEachPath, obstacles = rects.obstacles, order = order,
+                                            templates = TEMPLATES))]
+
+        if headlands:
+            world = plan.array
+            angle = [rects.angle for rects, _ in plans]
+        elif cells:
+            world = plan.array
+            angle = plan.angle
+            record['cells'] = len(plan.cells)
+        else:
+            # back to where the field is
+            rects, toolPath = plans[0]
+            world = PathArray(toolPath.array.data.copy())
+            rects.frame.Inverse(world.coords)
+            angle = rects.angle
+
+        # the cells' rectangles aren't kept, each one was a pass
+        rectangles = sum(len(rects.rectangles.geoms) for rects, _ in plans) if plans else int(world.passIndex.max(initial=-1)) + 1
+        record.update(status = 'ok', rectangles = rectangles, points = len(world),
+                      length = world.Length(), angle = angle, stats = stats.ToDict())
+
+        check = Coverage(polygon, world, toolSize)
+        report = check.Raster() if coverage else check.Raster(check.Resolution(CHECK_SPANS))
+        if coverage:
+            record['coverage'] = {field: getattr(report, field) for field in ('area', 'covered', 'missed', 'double', 'outside')}
+        if report.covered < MIN_COVERED * report.area:
+            record.update(status = 'warning', warning = 'path covers {:.1f} of the field\'s {:.1f}'.format(report.covered, report.area))
+        if format == 'wkt':
+            result = world.ToLineString().wkt
+        elif len(plans) == 1:
+            result = (world.data, plans[0][1].bounds, plans[0][0].frame)
+        else:
+            result = (world.data, None, None)
+    except Exception as error:
+        record.update(status = 'failed', error = repr(error), traceback = traceback.format_exc())
+        result = None
+
+    record['seconds'] = time.perf_counter() - start
+
+    return record, result
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Plans tool paths for every field boundary in a directory.')
+    parser.add_argument('input', help = 'directory of GeoJSON, WKT or CSV field boundaries, or .npy field masks')
+    parser.add_argument('output', help = 'directory to write the paths and summary.jsonl to')
+    parser.add_argument('--tool-size', type = float, default = 1)
+    parser.add_argument('--tool-length', type = float, default = 1)
+    parser.add_argument('--points', type = int, default = 20, help = 'points in each pass and turn')
+    parser.add_argument('--workers', type = int, default = None, help = 'processes to plan with, every core by default')
+    parser.add_argument('--pixel-size', type = float, default = 1, help = 'world units along each side of a pixel of .npy masks')
+    parser.add_argument('--headlands', type = int, default = 0, help = 'laps around the edge of each field, driven after the inside')
+    parser.add_argument('--turning-radius', type = float, default = 0, help = 'order the passes to skip rows the machine is too wide to turn into')
+    parser.add_argument('--cells', action = 'store_true', help = 'split concave fields into cells each pass crosses once')
+    parser.add_argument('--coverage', action = 'store_true', help = 'check how much of each field its path covers, misses and covers twice')
+    parser.add_argument('--search', action = 'store_true', help = 'search for the best sweep angle of each field')
+    parser.add_argument('--format', choices = ('wkt', 'npz', 'geojson', 'csv'), default = 'wkt', help = 'file format of the paths')
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok = True)
+    summary = open(os.path.join(args.output, 'summary.jsonl'), 'a')
+    start = time.perf_counter()
+    planned = 0
+    failed = 0
+
+    def Write(record, result):
+        nonlocal planned, failed
+        planned += 1
+        if record['status'] == 'warning':
+            print('{}: {}'.format(record['name'], record['warning']), file = sys.stderr)
+        if result is not None:
+            record['path'] = record['name'] + '.' + args.format
+            filename = os.path.join(args.output, record['path'])
+            if args.format == 'wkt':
+                with open(filename, 'w') as file:
+                    file.write(result)
+            elif args.format == 'npz':
+                rows, bounds, frame = result
+                Save(filename, PathArray(rows), bounds, frame, args.tool_size, args.tool_length)
+            else:
+                with StreamWriter(filename, args.format) as writer:
+                    writer.Write(PathArray(result[0]))
+        else:
+            failed += 1
+            print('{}: {}'.format(record['name'], record['error']), file = sys.stderr)
+
+        summary.write(json.dumps(record) + '\n')
+        summary.flush()
+
+    with ProcessPoolExecutor(max_workers = args.workers) as executor:
+        futures = {}
+        for file in sorted(os.listdir(args.input)):
+            if not file.lower().endswith(EXTENSIONS):
+                continue
+            try:
+                fields = ReadFields(os.path.join(args.input, file), args.pixel_size)
+            except Exception as error:
+                Write({'name': file, 'status': 'failed', 'error': repr(error), 'seconds': 0}, None)
+                continue
+
+            for name, polygon in fields:
+                future = executor.submit(PlanField, name, polygon, args.tool_size, args.tool_length, args.points, args.search, args.headlands,
+                                         args.turning_radius, args.coverage, args.cells, args.format)
+                futures[future] = name
+
+        # written as each field finishes, not in the order they were read
+        for future in as_completed(futures):
+            try:
+                record, result = future.result()
+            except Exception as error:
+                record, result = {'name': futures[future], 'status': 'failed', 'error': repr(error), 'seconds': 0}, None
+            Write(record, result)
+
+    summary.close()
+    print('planned {} fields, {} failed, in {:.2f}s'.format(planned, failed, time.perf_counter() - start))
+
+if __name__ == '__main__': main()
@@ -0,0 +1,199 @@
+# Library
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from statistics import median
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import shapely
+
+# Local
+from Plotter import Plotter
+from RandomPolygon import RandomPolygon
+from Rectangles import RectangleFactory
+from ToolPath import ToolPath
+
+# Default corpus, every vertex count is run at every field extent / toolSize ratio
+VERTICES = [5, 50, 500, 5000]
+RATIOS = [10, 100, 1000, 10000]
+
+# Stages timed for each field, in pipeline order
+STAGES = ['RotateForLongestEdge', 'FillLines', 'BuildRectsFromPoints', 'CreatePath', 'Plot']
+
+# Modules a headless planning job imports, none of them should load matplotlib
+HEADLESS = ['Rectangles', 'ToolPath', 'RandomPolygon']
+
+def Corpus(vertices, ratios, toolSize, seed, attempts, strategy):
+    """
+    Seeded fields of every size, the same arguments always give the same fields.
+
+    Returns:
+        list of (case, Shapely::Polygon or None), None when the field could not be generated
+    """
+    fields = []
+    for i, count in enumerate(vertices):
+        for j, ratio in enumerate(ratios):
+            case = {'vertices': count, 'ratio': ratio, 'seed': seed + i * len(ratios) + j}
+            try:
+                polygon = RandomPolygon(count, max_coord=ratio * toolSize, seed=case['seed'],
+                                        max_attempts=attempts, strategy=strategy).polygon
+            except ValueError as error:
+                case['skipped'] = str(error)
+                polygon = None
+            fields.append((case, polygon))
+
+    return fields
+
+def Time(function, repeat):
+    """
+    Runs a function repeat times.
+
+    Returns:
+        the last result, and the seconds of every run
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+
+    return result, times
+
+def Startup(modules, repeat):
+    """
+    Times a fresh interpreter importing modules, the way a batch worker starts.
+
+    Returns:
+        seconds of every run, and the matplotlib modules that got imported along the way
+    """
+    code = 'import json, sys; import {}; print(json.dumps(sorted(m for m in sys.modules if m.split(".")[0] == "matplotlib")))'.format(', '.join(modules))
+    directory = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', code], cwd = directory, capture_output = True, text = True, check = True).stdout
+        times.append(time.perf_counter() - start)
+
+    return times, json.loads(output)
+
+def Summarise(times):
+    return {'min': min(times), 'median': median(times), 'spread': (median(times) - min(times)) / min(times) if min(times) > 0 else 0.0}
+
+def RunCase(polygon, toolSize, toolLength, pointsInEachPath, repeat, plot):
+    """
+    Times every stage of planning a field separately.
+
+    Returns:
+        dict of stage to seconds of each run, and dict of sizes of what was planned
+    """
+    # planning once up front so every stage has its real input
+    factory = RectangleFactory(polygon, toolSize)
+    times = {}
+
+    (coords, frame), times['RotateForLongestEdge'] = Time(lambda: factory.RotateForLongestEdge(polygon), repeat)
+    contour = coords.T
+    points, times['FillLines'] = Time(lambda: factory.FillLines(factory.ContourToPoints(contour), toolSize), repeat)
+    _, times['BuildRectsFromPoints'] = Time(lambda: factory.BuildRectsFromPoints(points, toolSize), repeat)
+    toolPath, times['CreatePath'] = Time(lambda: ToolPath(toolSize, toolLength, factory.rectangles, pointsInEachPath), repeat)
+
+    if plot:
+        def Plot():
+            P = Plotter()
+            P.AddShapes(frame.ToLocal(polygon), color = 'green')
+            P.AddShapes(factory.rectangles)
+            P.AddPoints(toolPath.array.xy, connected = True)
+            P.fig.canvas.draw()
+            plt.close(P.fig)
+        _, times['Plot'] = Time(Plot, repeat)
+
+    sizes = {'points': len(points), 'rectangles': len(factory.rectangles.geoms), 'pathPoints': len(toolPath.array)}
+
+    return times, sizes
+
+def Verdict(a, b, threshold):
+    """
+    Ratio of the fastest runs, and whether it is a change or noise
+    """
+    ratio = b['min'] / a['min'] if a['min'] > 0 else float('inf')
+    noise = max(threshold, a['spread'], b['spread'])
+
+    return ratio, 'noise' if abs(ratio - 1) <= noise else ('slower' if ratio > 1 else 'faster')
+
+def Compare(run, baseline, threshold):
+    """
+    Prints how startup and each stage changed against a baseline run. The fastest run of each is compared,
+    changes smaller than threshold or than either run's own spread are called noise.
+    """
+    if 'startup' in baseline:
+        a, b = baseline['startup'], run['startup']
+        ratio, verdict = Verdict(a, b, threshold)
+        print('startup {:10.6f}s -> {:10.6f}s  x{:<7.2f} {}'.format(a['min'], b['min'], ratio, verdict))
+
+    before = {(r['vertices'], r['ratio']): r for r in baseline['results'] if 'stages' in r}
+
+    for result in run['results']:
+        old = before.get((result['vertices'], result['ratio']))
+        if old is None or 'stages' not in result:
+            continue
+        for stage, new in result['stages'].items():
+            if stage not in old['stages']:
+                continue
+            a, b = old['stages'][stage], new
+            ratio, verdict = Verdict(a, b, threshold)
+            print('{:>5} vertices {:>6} ratio {:<21} {:10.6f}s -> {:10.6f}s  x{:<7.2f} {}'.format(
+                result['vertices'], result['ratio'], stage, a['min'], b['min'], ratio, verdict))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Times each planning stage on a seeded corpus of fields.')
+    parser.add_argument('--output', default = 'benchmark.json', help = 'file to write the results to')
+    parser.add_argument('--baseline', help = 'earlier results to compare against')
+    parser.add_argument('--vertices', type = int, nargs = '+', default = VERTICES)
+    parser.add_argument('--ratios', type = float, nargs = '+', default = RATIOS, help = 'field extent / toolSize')
+    parser.add_argument('--tool-size', type = float, default = 1)
+    parser.add_argument('--tool-length', type = float, default = 1)
+    parser.add_argument('--points', type = int, default = 20)
+    parser.add_argument('--repeat', type = int, default = 5)
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--strategy', default = 'star', help = 'how RandomPolygon generates the fields')
+    parser.add_argument('--attempts', type = int, default = 10000, help = 'tries to generate each field before skipping it')
+    parser.add_argument('--threshold', type = float, default = 0.1, help = 'relative change treated as noise')
+    parser.add_argument('--no-plot', action = 'store_true', help = "don't time rendering")
+    args = parser.parse_args()
+
+    times, loaded = Startup(HEADLESS, args.repeat)
+    startup = dict(Summarise(times), modules = HEADLESS, matplotlib = loaded)
+    print('startup {:.6f}s importing {}'.format(startup['min'], ', '.join(HEADLESS))
+          + (', pulled in matplotlib' if loaded else ''))
+
+    results = []
+    for case, polygon in Corpus(args.vertices, args.ratios, args.tool_size, args.seed, args.attempts, args.strategy):
+        if polygon is not None:
+            times, sizes = RunCase(polygon, args.tool_size, args.tool_length, args.points, args.repeat, not args.no_plot)
+            case.update(sizes)
+            case['stages'] = {stage: Summarise(t) for stage, t in times.items()}
+            print('{:>5} vertices {:>6} ratio '.format(case['vertices'], case['ratio'])
+                  + ' '.join('{} {:.6f}s'.format(stage, case['stages'][stage]['min']) for stage in STAGES if stage in case['stages']))
+        else:
+            print('{:>5} vertices {:>6} ratio skipped: {}'.format(case['vertices'], case['ratio'], case['skipped']))
+        results.append(case)
+
+    run = {'meta': {'time': time.time(), 'python': platform.python_version(), 'numpy': np.__version__,
+                    'shapely': shapely.__version__, 'matplotlib': matplotlib.__version__, 'platform': platform.platform(),
+                    'args': vars(args)},
+           'startup': startup, 'results': results}
+
+    with open(args.output, 'w') as file:
+        json.dump(run, file, indent = 1)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            Compare(run, json.load(file), args.threshold)
+
+if __name__ == '__main__': main()
@@ -0,0 +1,284 @@
+# Library
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from shapely.geometry import MultiPolygon, Point, Polygon, box
+from shapely.ops import unary_union
+from shapely.prepared import prep
+
+# Local
+from Instrumentation import Stage, Count
+from Obstacles import Obstacles
+from PathArray import PathArray, TRANSIT
+from Rectangles import RectangleFactory
+from ToolPath import ToolPath
+
+def PlanCell(bounds, frame, toolSize, toolLength, pointsInEachPath, obstacles):
+    """
+    Plans the columns of one cell in the whole field's frame. Lives at module level so it can be sent to a process pool.
+
+    Args:
+        bounds (np.array): (n, 4) bounds of the cell's rectangles in the field's local frame, left to right
+        frame (Frame): the whole field's frame, so every cell is swept the same way on the same columns
+        toolSize (float): Width of rectangle
+        toolLength (float): length of trailing object
+        pointsInEachPath (int): points to be in each seperate path object
+        obstacles (list of Shapely::Polygon): obstacles in world coordinates
+
+    Returns:
+        np.array with the PATH_DTYPE of the cell's path in world coordinates
+    """
+    if len(bounds) == 0:
+        return PathArray.Empty(0).data
+
+    if obstacles is not None:
+        obstacles = Obstacles([frame.ToLocal(obstacle) for obstacle in getattr(obstacles, 'geoms', obstacles)], toolSize / 2)
+    toolPath = ToolPath(toolSize, toolLength, bounds, pointsInEachPath, obstacles = obstacles)
+
+    path = PathArray(toolPath.array.data.copy())
+    frame.Inverse(path.coords)
+
+    return path.data
+
+# Splits a field into cells that every pass crosses only once (a boustrophedon decomposition), so a column
+# that crosses an L or U shaped field twice isn't one rectangle over the gap. The cells are planned
+# across a process pool on the whole field's columns, and joined up with the tool up in between, going
+# round the edge of the field and around obstacles where the straight way between them would leave it or hit one.
+class CellDecomposition():
+    def __init__(self, polygon, toolSize, toolLength, pointsInEachPath, angle = None, obstacles = None, workers = None):
+        """
+        Args:
+            polygon (Shapely::Polygon): field to plan, its holes are split around instead of driven around
+            toolSize (float): Width of rectangle
+            toolLength (float): length of trailing object
+            pointsInEachPath (int): points to be in each seperate path object
+            angle (float): radians to rotate the field by, defaults to making the longest edge vertical
+            obstacles (list of Shapely::Polygon): other obstacles in world coordinates, see RectangleFactory
+            workers (int): processes to plan the cells with, 1 plans in this process and None uses every core
+        """
+        # the whole field sets the sweep direction and the columns every cell is planned on
+        whole = RectangleFactory(polygon, toolSize, angle)
+        self.frame = whole.frame
+        self.angle = whole.angle
+
+        with Stage('DecomposeCells'):
+            local = self.frame.ToLocal(polygon)
+            pieces = self.Slabs(local, self.Events(local))
+            cells = self.Merge(pieces)
+            self.cells = [self.frame.ToWorld(cell) for cell in cells]
+            self.bounds = self.CellColumns(whole, local, cells, toolSize)
+        Count('cells', len(self.cells))
+
+        # the ways between the cells keep out of the holes the cells were split around and the other obstacles
+        blocked = [Polygon(ring) for ring in polygon.interiors]
+        if obstacles is not None:
+            blocked += list(getattr(obstacles, 'geoms', obstacles))
+        self.obstacles = Obstacles(blocked, toolSize / 2)
+        self.field = prep(Polygon(polygon.exterior).buffer(toolSize))
+        self.outline = np.asarray(polygon.exterior.coords)
+
+        self.paths = self.PlanCells(toolSize, toolLength, pointsInEachPath, obstacles, workers)
+        self.array = self.Stitch(self.paths)
+
+    def Events(self, local):
+        """
+        x's where a pass starts crossing the field twice or stops, the vertices furthest left or right
+        along the boundary with the field on both sides of them.
+
+        Args:
+            local (Shapely::Polygon): field in its local frame
+
+        Returns:
+            np.array of x's, ascending
+        """
+        inside = prep(local)
+        minX, _, maxX, _ = local.bounds
+        step = (maxX - minX) * 1e-9
+
+        events = []
+        for ring in [local.exterior] + list(local.interiors):
+            coords = np.asarray(ring.coords)[:-1]
+            x = coords[:, 0]
+            before, after = np.roll(x, 1), np.roll(x, -1)
+
+            # furthest left with the field just left of it splits, furthest right with the field just right of it joins
+            left = (before >= x) & (after >= x) & ((before > x) | (after > x))
+            right = (before <= x) & (after <= x) & ((before < x) | (after < x))
+            for (vx, vy), side in zip(coords[left | right], np.where(left, -1, 1)[left | right]):
+                if inside.contains(Point(vx + side * step, vy)):
+                    events.append(vx)
+
+        return np.unique(events)
+
+    def Slabs(self, local, events):
+        """
+        Cuts the field at every event, no slab has a pass starting or stopping crossing it twice inside it,
+        so every piece of a slab is crossed once by each pass.
+
+        Returns:
+            list of lists of Shapely::Polygon, the pieces in each slab from left to right
+        """
+        minX, minY, maxX, maxY = local.bounds
+        edges = np.concatenate(([minX], events[(events > minX) & (events < maxX)], [maxX]))
+
+        slabs = []
+        for x0, x1 in zip(edges[:-1], edges[1:]):
+            piece = local.intersection(box(x0, minY - 1, x1, maxY + 1))
+            slabs.append([part for part in getattr(piece, 'geoms', [piece])
+                          if part.geom_type == 'Polygon' and part.area > 0])
+
+        return slabs
+
+    def Merge(self, slabs):
+        """
+        Joins pieces of neighbouring slabs that only touch each other, the cut between them wasn't needed.
+
+        Returns:
+            list of Shapely::Polygon cells, from left to right
+        """
+        pieces = [piece for slab in slabs for piece in slab]
+        slab = np.repeat(np.arange(len(slabs)), [len(pieces) for pieces in slabs])
+        parent = np.arange(len(pieces))
+
+        def Root(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        first = np.concatenate(([0], np.cumsum([len(pieces) for pieces in slabs])))
+        for i in range(len(slabs) - 1):
+            left = range(first[i], first[i + 1])
+            right = range(first[i + 1], first[i + 2])
+
+            # pieces of the two slabs that share part of the cut
+            touching = [(a, b) for a in left for b in right
+                        if pieces[a].intersection(pieces[b]).length > 0]
+            lefts = np.bincount([a for a, _ in touching], minlength=len(pieces))
+            rights = np.bincount([b for _, b in touching], minlength=len(pieces))
+
+            for a, b in touching:
+                if lefts[a] == 1 and rights[b] == 1:
+                    parent[Root(b)] = Root(a)
+
+        groups = {}
+        for i in range(len(pieces)):
+            groups.setdefault(Root(i), []).append(i)
+
+        cells = []
+        for members in groups.values():
+            cell = unary_union([pieces[i] for i in members])
+            # snapping can leave slivers along the cuts, only the cell itself is wanted
+            parts = sorted(getattr(cell, 'geoms', [cell]), key=lambda part: -part.area)
+            cells.append((slab[members[0]], parts[0].bounds[1], parts[0]))
+
+        cells.sort(key=lambda cell: cell[:2])
+
+        return [cell for _, _, cell in cells]
+
+    def CellColumns(self, factory, local, cells, toolSize):
+        """
+        Rectangles of every cell on the whole field's columns. A column that a cut goes through is in the
+        cells either side of it, where their rectangles overlap the one with the most of the column
+        takes all of it so it is only driven once.
+
+        Args:
+            factory (RectangleFactory): makes the columns
+            local (Shapely::Polygon): whole field in its local frame
+            cells (list of Shapely::Polygon): cells in the local frame
+
+        Returns:
+            list of (n, 4) np.array of each cell's rectangle bounds, left to right
+        """
+        minX, _, maxX, _ = local.bounds
+        columns = factory.ColumnPositions(minX, maxX + toolSize, toolSize)
+
+        bounds, owner, share = [], [], []
+        for i, cell in enumerate(cells):
+            coords = np.asarray(cell.exterior.coords).T
+            cellBounds = factory.ColumnBounds(factory.FillLines(factory.ContourToPoints(coords), toolSize, columns), toolSize, columns)
+            bounds.append(cellBounds)
+            owner.append(np.full(len(cellBounds), i))
+            share.append(np.minimum(cellBounds[:, 2], cell.bounds[2]) - np.maximum(cellBounds[:, 0], cell.bounds[0]))
+
+        bounds, owner, share = np.concatenate(bounds), np.concatenate(owner), np.concatenate(share)
+        column = np.searchsorted(columns, bounds[:, 0])
+
+        # up each column, a rectangle that starts below the top of the ones before it overlaps them
+        order = np.lexsort((bounds[:, 1], column))
+        keep = np.ones(len(bounds), dtype=bool)
+        group = [order[0]] if len(order) else []
+        for i in list(order[1:]) + [None]:
+            if i is not None and column[i] == column[group[0]] and bounds[i, 1] < bounds[group, 3].max():
+                group.append(i)
+                continue
+
+            if len(group) > 1:
+                best = group[int(np.argmax(share[group]))]
+                bounds[best, 1], bounds[best, 3] = bounds[group, 1].min(), bounds[group, 3].max()
+                keep[[j for j in group if j != best]] = False
+            group = [i]
+        Count('sharedColumns', int((~keep).sum()))
+
+        return [bounds[keep & (owner == i)] for i in range(len(cells))]
+
+    def PlanCells(self, toolSize, toolLength, pointsInEachPath, obstacles, workers):
+        """
+        Plans every cell, fanned out across a process pool.
+
+        Returns:
+            list of PathArray in world coordinates, in the order of self.cells
+        """
+        count = len(self.cells)
+        args = [self.bounds, [self.frame] * count, [toolSize] * count, [toolLength] * count,
+                [pointsInEachPath] * count, [obstacles] * count]
+
+        with Stage('PlanCells'):
+            if workers == 1 or count < 2:
+                paths = list(map(PlanCell, *args))
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    paths = list(executor.map(PlanCell, *args))
+
+        return [PathArray(path) for path in paths]
+
+    def Transit(self, start, end):
+        """
+        Way from the end of one cell to the start of the next, straight across if that stays in the field,
+        otherwise along the edge of the field, and around any obstacles on the way.
+
+        Args:
+            start ((x, y)): end of a cell's path in world coordinates
+            end ((x, y)): start of the next one
+
+        Returns:
+            (m, 2) np.array of points from start to end
+        """
+        return self.obstacles.Route(start, end, self.field, self.outline)
+
+    def Stitch(self, paths):
+        """
+        One path through every cell, driving from the end of each to the start of the next with the tool up.
+        The passes of each cell are numbered on from the ones before.
+
+        Returns:
+            PathArray in world coordinates
+        """
+        pieces = []
+        passes = 0
+        for path in paths:
+            if len(path) == 0:
+                continue
+
+            data = path.data.copy()
+            data['pass'] += passes
+
+            if pieces:
+                points = self.Transit((pieces[-1]['x'][-1], pieces[-1]['y'][-1]), (data['x'][0], data['y'][0]))
+                transit = PathArray.Empty(len(points))
+                transit.Write(0, points, TRANSIT, data['pass'][0])
+                pieces.append(transit.data)
+
+            pieces.append(data)
+            passes = data['pass'].max() + 1
+
+        return PathArray(np.concatenate(pieces)) if pieces else PathArray.Empty(0)
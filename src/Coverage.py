@@ -0,0 +1,330 @@
+# Library
+from collections import namedtuple
+
+import numpy as np
+from shapely.geometry import LineString, MultiPolygon, box
+from shapely.ops import unary_union
+from shapely.strtree import STRtree
+
+# Local
+from Instrumentation import Stage, Count
+from PathArray import PASS, HEADLAND
+
+# Areas of a field the path covers, misses and covers more than once, and what it covers outside the field.
+# The regions are Shapely::MultiPolygons of where the misses and double coverage are, None when not asked for
+CoverageReport = namedtuple('CoverageReport', ['area', 'covered', 'missed', 'double', 'outside', 'missedRegions', 'doubleRegions'])
+
+# Spans of cells Raster aims to sweep by default. Its cost grows with the field's area over the cell size times
+# the toolSize, so bigger fields are checked on coarser cells down to half the toolSize, past that it grows with the area
+RASTER_SPANS = 2000000
+
+# Checks how much of a field a path covers by sweeping the tool along it, either on a grid or exactly with Shapely.
+# Only the parts of the path driven with the tool down count, every run of them is swept on its own so
+# a run never counts as covering anything twice by itself.
+class Coverage():
+    def __init__(self, polygon, path, toolSize, kinds = (PASS, HEADLAND)):
+        """
+        Args:
+            polygon (Shapely::Polygon): field, in the same frame as the path
+            path (PathArray): tool path
+            toolSize (float): width swept by the tool
+            kinds (tuple): kinds of point the tool is down for
+        """
+        self.polygon = polygon
+        self.path = path
+        self.toolSize = toolSize
+        self.starts, self.ends, self.runs = self.Segments(path, kinds)
+
+    @classmethod
+    def FromPlan(cls, polygon, rectangleFactory, toolPath):
+        """
+        Checks a ToolPath against the world polygon it was planned for, in the field's local frame.
+        """
+        return cls(rectangleFactory.frame.ToLocal(polygon), toolPath.array, toolPath.toolSize)
+
+    def Segments(self, path, kinds):
+        """
+        Working segments of a path, between points next to each other in the same run.
+        A run is a stretch of points of the same kind and pass, a segment is driven as the point it leads to,
+        so the step from the end of a turn onto its pass is part of the pass.
+
+        Returns:
+            (m, 2) start and (m, 2) end of each segment, and (m,) run it is part of
+        """
+        change = (np.diff(path.kind.astype(int)) != 0) | (np.diff(path.passIndex) != 0)
+        run = np.concatenate(([0], np.cumsum(change)))
+        working = np.isin(path.kind, kinds)
+
+        keep = working[1:].copy()
+        coords = path.coords
+        keep &= np.any(coords[1:] != coords[:-1], axis=1)
+        starts, ends, runs = coords[:-1][keep], coords[1:][keep], run[1:][keep]
+        if len(starts) == 0:
+            return starts, ends, runs
+
+        # a pass is many segments along one straight line, they are swept as one
+        steps = ends - starts
+        cross = steps[1:, 0] * steps[:-1, 1] - steps[1:, 1] * steps[:-1, 0]
+        dot = (steps[1:] * steps[:-1]).sum(axis=1)
+        joined = ((runs[1:] == runs[:-1]) & np.all(starts[1:] == ends[:-1], axis=1)
+                  & (np.abs(cross) <= 1e-9 * dot) & (dot > 0))
+        first = np.flatnonzero(np.concatenate(([True], ~joined)))
+        last = np.concatenate((first[1:], [len(starts)])) - 1
+
+        return starts[first], ends[last], runs[first]
+
+    def Grid(self, resolution):
+        """
+        Cells covering the field and everything the tool sweeps.
+
+        Returns:
+            x and y of the bottom left corner, rows and columns
+        """
+        half = self.toolSize / 2
+        minX, minY, maxX, maxY = self.polygon.bounds
+        if len(self.starts):
+            points = np.concatenate((self.starts, self.ends))
+            minX, minY = np.minimum((minX, minY), points.min(axis=0) - half)
+            maxX, maxY = np.maximum((maxX, maxY), points.max(axis=0) + half)
+
+        return minX, minY, int(np.ceil((maxY - minY) / resolution)) + 1, int(np.ceil((maxX - minX) / resolution)) + 1
+
+    def Columns(self, starts, ends, grid, resolution):
+        """
+        First and one past the last column of cells whose centres are between starts and ends.
+
+        Returns:
+            (k,) np.array of ints each
+        """
+        x0, _, _, width = grid
+        first = np.clip(np.ceil((starts - x0) / resolution - 0.5), 0, width).astype(np.int64)
+        last = np.clip(np.floor((ends - x0) / resolution - 0.5) + 1, 0, width).astype(np.int64)
+
+        return first, last
+
+    def Crossings(self, grid, resolution):
+        """
+        Where each row of cell centres crosses the polygon's rings, the cells from one crossing to the next are inside.
+
+        Returns:
+            (k,) rows and columns of the crossings
+        """
+        y0 = grid[1]
+        edges = []
+        for ring in [self.polygon.exterior] + list(self.polygon.interiors):
+            coords = np.asarray(ring.coords)
+            edges.append(np.column_stack((coords[:-1], coords[1:])))
+        edges = np.concatenate(edges)
+        edges = edges[edges[:, 1] != edges[:, 3]]
+
+        # half open in y so a vertex on a row's centre is crossed once
+        low, high = np.minimum(edges[:, 1], edges[:, 3]), np.maximum(edges[:, 1], edges[:, 3])
+        first = np.ceil((low - y0) / resolution - 0.5).astype(np.int64)
+        last = np.ceil((high - y0) / resolution - 0.5).astype(np.int64)
+        counts = np.maximum(last - first, 0)
+
+        edge = np.repeat(np.arange(len(edges)), counts)
+        row = np.repeat(first, counts) + np.arange(len(edge)) - np.repeat(np.cumsum(counts) - counts, counts)
+        y = y0 + (row + 0.5) * resolution
+        x1, y1, x2, y2 = edges[edge].T
+        x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+
+        column, _ = self.Columns(x, x, grid, resolution)
+
+        return row, column
+
+    def Spans(self, grid, resolution):
+        """
+        Cells each segment sweeps, as one span of x for every row its rectangle crosses.
+
+        Returns:
+            (k,) rows, x starts, x ends and runs of the spans
+        """
+        x0, y0, height, width = grid
+        half = self.toolSize / 2
+        a, b = self.starts, self.ends
+        length = np.hypot(*(b - a).T)
+        along = (b - a) / length[:, None]
+        normal = np.column_stack((-along[:, 1], along[:, 0]))
+
+        # rows whose centres are between the lowest and highest corner
+        corners = np.stack((a + half * normal, a - half * normal, b + half * normal, b - half * normal))
+        first = np.ceil((corners[..., 1].min(axis=0) - y0) / resolution - 0.5).astype(np.int64)
+        last = np.floor((corners[..., 1].max(axis=0) - y0) / resolution - 0.5).astype(np.int64) + 1
+        counts = np.maximum(last - first, 0)
+
+        segment = np.repeat(np.arange(len(a)), counts)
+        row = np.repeat(first, counts) + np.arange(len(segment)) - np.repeat(np.cumsum(counts) - counts, counts)
+        y = y0 + (row + 0.5) * resolution
+
+        # along the segment from 0 to its length and across it by half the tool, both straight lines in x
+        starts = np.full(len(row), -np.inf)
+        ends = np.full(len(row), np.inf)
+        for direction, low, high in ((along, 0.0, length), (normal, -half, half)):
+            slope = direction[segment, 0]
+            offset = (y - a[segment, 1]) * direction[segment, 1] - a[segment, 0] * slope
+            low = np.broadcast_to(low, length.shape)[segment]
+            high = np.broadcast_to(high, length.shape)[segment]
+
+            flat = np.abs(slope) < 1e-12
+            safe = np.where(flat, 1.0, slope)
+            u, v = (low - offset) / safe, (high - offset) / safe
+            lower = np.where(flat, np.where((offset >= low) & (offset <= high), -np.inf, np.inf), np.minimum(u, v))
+            upper = np.where(flat, np.where((offset >= low) & (offset <= high), np.inf, -np.inf), np.maximum(u, v))
+            starts = np.maximum(starts, lower)
+            ends = np.minimum(ends, upper)
+
+        return row, starts, ends, self.runs[segment]
+
+    def Raster(self, resolution = None, regions = False):
+        """
+        Coverage on a grid of cells. The grid is never held cell by cell, each row is kept as the columns where
+        the number of passes over it or being inside the field changes. Every segment adds a span on each row
+        of cells it crosses, so the time taken goes with the field's area / (resolution * toolSize).
+
+        Args:
+            resolution (float): size of the cells, defaults to the finest of a tenth to a half of the toolSize
+                that keeps to about RASTER_SPANS spans, see Resolution
+            regions (bool): also trace where the misses and double coverage are
+
+        Returns:
+            CoverageReport, the areas are to the nearest cell
+        """
+        if resolution is None:
+            resolution = self.Resolution()
+
+        with Stage('CoverageRaster'):
+            grid = self.Grid(resolution)
+            width = grid[3]
+
+            row, starts, ends, runs = self.Spans(grid, resolution)
+            first, last = self.Columns(starts, ends, grid, resolution)
+            keep = last > first
+            row, first, last, runs = row[keep], first[keep], last[keep], runs[keep]
+
+            # the segments of a run overlap where they join, their spans on each row are merged so a run
+            # counts each cell once. Sorted by run, row and start, a span carries on the one before it unless
+            # it starts after the furthest end so far
+            order = np.lexsort((first, row, runs))
+            row, first, last, runs = row[order], first[order], last[order], runs[order]
+            group = np.concatenate(([0], np.cumsum((np.diff(runs) != 0) | (np.diff(row) != 0))))
+            shift = group * (width + 1)
+            reach = np.maximum.accumulate(last + shift) - shift
+            new = np.concatenate(([True], first[1:] > reach[:-1])) | (np.diff(group, prepend=-1) != 0)
+            spans = np.flatnonzero(new)
+            merged = np.maximum.reduceat(reach, spans) if len(spans) else reach
+            Count('coverageSpans', len(spans))
+
+            # every change along a row as one sorted number, the cell it is at and what changes there:
+            # 0 a pass ends, 1 a pass starts, 2 in or out of the field
+            crossRow, crossColumn = self.Crossings(grid, resolution)
+            events = np.sort(np.concatenate((((row[spans] * (width + 1) + merged) << 2),
+                                             ((row[spans] * (width + 1) + first[spans]) << 2) | 1,
+                                             ((crossRow * (width + 1) + crossColumn) << 2) | 2)))
+            cells, change = events >> 2, events & 3
+            count = np.cumsum(np.where(change == 2, 0, 2 * change - 1))
+            inside = np.cumsum(change == 2) % 2 == 1
+
+        return self.Report(cells, count, inside, grid, resolution, regions)
+
+    def Resolution(self, spans = RASTER_SPANS):
+        """
+        Cell size for a field, the toolSize over a whole number of cells so no cell centre is ever on the edge
+        of a pass and counted by the passes both sides of it.
+
+        Returns:
+            float between a tenth and a half of the toolSize
+        """
+        divisions = int(np.clip(np.floor(spans * self.toolSize**2 / max(self.polygon.area, 1e-12)), 2, 10))
+
+        return self.toolSize / divisions
+
+    def Report(self, cells, count, inside, grid, resolution, regions):
+        """
+        Areas out of the changes along the rows, each holds until the next one.
+
+        Returns:
+            CoverageReport
+        """
+        cell = resolution**2
+        lengths = np.diff(cells)
+        count, inside = count[:-1], inside[:-1]
+
+        def Area(where):
+            return float(lengths[where].sum() * cell)
+
+        missed = inside & (count == 0) & (lengths > 0)
+        double = inside & (count > 1) & (lengths > 0)
+
+        return CoverageReport(area = Area(inside),
+                              covered = Area(inside & (count > 0)),
+                              missed = Area(missed),
+                              double = Area(double),
+                              outside = Area(~inside & (count > 0)),
+                              missedRegions = self.Regions(cells[:-1][missed], lengths[missed], grid, resolution) if regions else None,
+                              doubleRegions = self.Regions(cells[:-1][double], lengths[double], grid, resolution) if regions else None)
+
+    def Regions(self, cells, lengths, grid, resolution):
+        """
+        Joins runs of cells along the rows into polygons.
+
+        Args:
+            cells (np.array): (k,) first cell of each run, counted along the rows
+            lengths (np.array): (k,) cells in each run
+
+        Returns:
+            Shapely::MultiPolygon
+        """
+        x0, y0, _, width = grid
+        rows, columns = np.divmod(cells, width + 1)
+
+        boxes = [box(x0 + a * resolution, y0 + r * resolution, x0 + (a + n) * resolution, y0 + (r + 1) * resolution)
+                 for r, a, n in zip(rows, columns, lengths)]
+        joined = unary_union(boxes) if boxes else MultiPolygon()
+
+        return joined if isinstance(joined, MultiPolygon) else MultiPolygon([joined])
+
+    def Exact(self):
+        """
+        Coverage with Shapely, every run swept with flat ends and the overlaps between runs intersected.
+        Slow for big fields, for checking the raster against.
+
+        Returns:
+            CoverageReport with the regions
+        """
+        with Stage('CoverageExact'):
+            swept = []
+            for run in np.unique(self.runs):
+                mine = self.runs == run
+                points = np.concatenate((self.starts[mine][:1], self.ends[mine]))
+                swept.append(LineString(points).buffer(self.toolSize / 2, cap_style=2))
+
+            covered = unary_union(swept) if swept else MultiPolygon()
+
+            # only runs whose boxes overlap can cover anything twice
+            tree = STRtree(swept)
+            overlaps = []
+            for i, shape in enumerate(swept):
+                if hasattr(tree, 'query_items'):
+                    others = tree.query_items(shape)
+                else:
+                    others = tree.query(shape)
+                for j in others:
+                    if j > i:
+                        overlap = shape.intersection(swept[j])
+                        if overlap.area > 0:
+                            overlaps.append(overlap)
+            twice = unary_union(overlaps).intersection(self.polygon) if overlaps else MultiPolygon()
+            missed = self.polygon.difference(covered)
+
+        def Polygons(geometry):
+            parts = [part for part in getattr(geometry, 'geoms', [geometry]) if part.geom_type == 'Polygon' and not part.is_empty]
+            return MultiPolygon(parts)
+
+        return CoverageReport(area = self.polygon.area,
+                              covered = self.polygon.intersection(covered).area,
+                              missed = missed.area,
+                              double = twice.area,
+                              outside = covered.difference(self.polygon).area,
+                              missedRegions = Polygons(missed),
+                              doubleRegions = Polygons(twice))
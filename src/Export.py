@@ -0,0 +1,212 @@
+# Library
+import struct
+import zipfile
+from collections import namedtuple
+
+import numpy as np
+
+# Local
+from Instrumentation import Stage, Count
+from PathArray import PathArray, PASS, TURN, LEAD_IN, TRANSIT, HEADLAND
+
+# A plan is saved as an uncompressed .npz, each member a plain .npy that is memory mapped where it sits in the file:
+#   header      one row of HEADER_DTYPE
+#   path        PATH_DTYPE rows in world coordinates, x and y float64, kind uint8 and pass int32, 24 bytes a row
+#   rectangles  (n, 4) float64 minX, minY, maxX, maxY of each pass's rectangle in the local frame, empty if not saved
+# A .npy holds only the path rows.
+FORMAT_VERSION = 1
+
+# version: FORMAT_VERSION of the file
+# toolSize, toolLength: tool the path was planned for
+# angle: radians the field was rotated by for planning
+# toWorld: 3x3 affine matrix taking the local frame (the rectangles) to the world, identity without a frame
+HEADER_DTYPE = np.dtype([('version', np.uint16), ('toolSize', np.float64), ('toolLength', np.float64),
+                         ('angle', np.float64), ('toWorld', np.float64, (3, 3))], align=True)
+
+# Names of the kinds of point in the streamed formats
+KIND_NAMES = {PASS: 'pass', TURN: 'turn', LEAD_IN: 'leadIn', TRANSIT: 'transit', HEADLAND: 'headland'}
+
+SavedPlan = namedtuple('SavedPlan', ['header', 'path', 'rectangles'])
+
+def Save(filename, path, rectangles = None, frame = None, toolSize = 0.0, toolLength = 0.0):
+    """
+    Writes a path, and its rectangles and frame, in the layout above.
+
+    Args:
+        filename (str): .npz, or .npy for only the path
+        path (PathArray): path in world coordinates
+        rectangles (shapely::MultiPolygon or np.array): rectangles in the local frame or their (n, 4) bounds
+        frame (Frame): frame the rectangles are in
+        toolSize (float): Width of rectangle
+        toolLength (float): length of trailing object
+    """
+    with Stage('Export'):
+        if filename.endswith('.npy'):
+            np.save(filename, path.data)
+        else:
+            header = np.zeros(1, dtype=HEADER_DTYPE)
+            header['version'] = FORMAT_VERSION
+            header['toolSize'] = toolSize
+            header['toolLength'] = toolLength
+            header['angle'] = 0.0 if frame is None else frame.angle
+            header['toWorld'] = np.identity(3) if frame is None else frame.inverse
+
+            if rectangles is None:
+                bounds = np.zeros((0, 4))
+            elif isinstance(rectangles, np.ndarray):
+                bounds = np.asarray(rectangles, dtype=float).reshape(-1, 4)
+            else:
+                bounds = np.array([rect.bounds for rect in rectangles.geoms], dtype=float).reshape(-1, 4)
+
+            # savez stores the members without compressing them, which is what lets them be mapped
+            np.savez(filename, header=header, path=path.data, rectangles=bounds)
+
+    Count('pointsExported', len(path))
+
+def Load(filename, mmap = True):
+    """
+    Reads a saved plan, memory mapping every member so nothing is read until it is used.
+
+    Args:
+        filename (str): .npz or .npy written by Save
+        mmap (bool): False reads everything into memory instead
+
+    Returns:
+        SavedPlan of the header row, the PathArray and the (n, 4) rectangle bounds, header and rectangles are None for a .npy
+    """
+    if filename.endswith('.npy'):
+        return SavedPlan(None, PathArray(np.load(filename, mmap_mode='r' if mmap else None)), None)
+
+    if mmap:
+        members = MapMembers(filename)
+    else:
+        with np.load(filename) as file:
+            members = {name: file[name] for name in file.files}
+
+    header = members['header'][0]
+    if header['version'] > FORMAT_VERSION:
+        raise ValueError('{} is format version {}, only up to {} can be read'.format(filename, header['version'], FORMAT_VERSION))
+
+    return SavedPlan(header, PathArray(members['path']), members['rectangles'])
+
+def MapMembers(filename):
+    """
+    Memory maps each array of an uncompressed .npz in place.
+
+    Returns:
+        dict of read only np.memmap by member name
+    """
+    members = {}
+    with zipfile.ZipFile(filename) as archive, open(filename, 'rb') as file:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError('{} in {} is compressed and can\'t be memory mapped'.format(info.filename, filename))
+
+            # the local header can have a different extra field to the central directory's, so its own lengths are read
+            file.seek(info.header_offset)
+            nameLength, extraLength = struct.unpack('<HH', file.read(30)[26:30])
+            file.seek(info.header_offset + 30 + nameLength + extraLength)
+
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(file)
+
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if int(np.prod(shape)) == 0:
+                members[name] = np.zeros(shape, dtype=dtype)
+            else:
+                members[name] = np.memmap(filename, dtype=dtype, mode='r', offset=file.tell(), shape=shape,
+                                          order='F' if fortran else 'C')
+
+    return members
+
+# Writes a path as GeoJSON or CSV as its segments arrive, e.g. from ToolPath.Segments, only one segment is held at a time.
+# Every point is formatted in one string operation per segment rather than building lists for json.
+class StreamWriter():
+    def __init__(self, filename, format = None, frame = None, precision = 6):
+        """
+        Args:
+            filename (str): file to write
+            format (str): 'geojson' or 'csv', defaults to the file's extension
+            frame (Frame): frame the segments are in, they are moved to the world as they are written
+            precision (int): decimal places of the coordinates
+        """
+        self.format = format if format is not None else filename.rsplit('.', 1)[-1].lower()
+        if self.format == 'json':
+            self.format = 'geojson'
+        if self.format not in ('geojson', 'csv'):
+            raise ValueError('can\'t stream {} files'.format(self.format))
+
+        self.frame = frame
+        self.point = '%.{0}f,%.{0}f'.format(precision)
+        self.file = open(filename, 'w')
+
+        # last point written, each GeoJSON line starts at the end of the one before it
+        self.last = None
+        self.features = 0
+        self.points = 0
+
+        if self.format == 'geojson':
+            self.file.write('{"type": "FeatureCollection", "features": [\n')
+        else:
+            self.file.write('x,y,kind,pass\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.Close()
+
+    def Write(self, segment):
+        """
+        Appends a segment of the path.
+
+        Args:
+            segment (PathArray): points following the ones already written
+        """
+        if len(segment) == 0:
+            return
+
+        if self.frame is not None:
+            segment = PathArray(segment.data.copy())
+            self.frame.Inverse(segment.coords)
+
+        if self.format == 'geojson':
+            self.WriteFeatures(segment)
+        else:
+            rows = np.column_stack((segment.x, segment.y, segment.kind, segment.passIndex)).ravel().tolist()
+            self.file.write(((self.point + ',%d,%d\n') * len(segment)) % tuple(rows))
+
+        self.points += len(segment)
+
+    def WriteFeatures(self, segment):
+        """
+        One LineString feature for each run of points of the same kind and pass.
+        """
+        kind, passIndex = segment.kind, segment.passIndex
+        cuts = np.flatnonzero((kind[1:] != kind[:-1]) | (passIndex[1:] != passIndex[:-1])) + 1
+        coords = segment.coords
+
+        for a, b in zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [len(segment)]))):
+            points = coords[a:b] if self.last is None else np.concatenate((self.last, coords[a:b]))
+            self.last = coords[b - 1:b].copy()
+            if len(points) < 2:
+                continue
+
+            line = ','.join(['[' + self.point + ']'] * len(points)) % tuple(points.ravel().tolist())
+            self.file.write('{}{{"type": "Feature", "properties": {{"pass": {}, "kind": "{}"}}, '
+                            '"geometry": {{"type": "LineString", "coordinates": [{}]}}}}'.format(
+                                ',\n' if self.features else '', passIndex[a], KIND_NAMES.get(int(kind[a]), str(kind[a])), line))
+            self.features += 1
+
+    def Close(self):
+        if self.file.closed:
+            return
+
+        if self.format == 'geojson':
+            self.file.write('\n]}\n')
+        self.file.close()
+
+        Count('pointsExported', self.points)
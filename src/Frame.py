@@ -0,0 +1,85 @@
+# Library
+import numpy as np
+from shapely import affinity
+
+# The field's local frame: rotated about its centroid then moved up so nothing is below y = 0.
+# Held as one 3x3 affine matrix so going between world and local is a single transform,
+# instead of a rotate and a translate each allocating a new geometry.
+class Frame():
+    def __init__(self, angle, origin, translate):
+        """
+        Args:
+            angle (float): radians the field is rotated by about origin
+            origin ((x, y)): point the field is rotated about, its centroid
+            translate (float): y translation after rotating
+        """
+        self.angle = angle
+        self.origin = (float(origin[0]), float(origin[1]))
+        self.translate = translate
+
+        # same cos / sin and snapping to 0 as Shapely::affinity.rotate, so a plain rotation matches it exactly
+        cos, sin = np.cos(angle), np.sin(angle)
+        cos = 0.0 if abs(cos) < 2.5e-16 else cos
+        sin = 0.0 if abs(sin) < 2.5e-16 else sin
+        x0, y0 = self.origin
+
+        # world to local
+        self.matrix = np.array([[cos, -sin, x0 - x0 * cos + y0 * sin],
+                                [sin, cos, y0 - x0 * sin - y0 * cos + translate],
+                                [0.0, 0.0, 1.0]])
+
+        # local to world, the rotation's transpose undoes it exactly rather than numerically inverting
+        rotation = self.matrix[:2, :2]
+        self.inverse = np.identity(3)
+        self.inverse[:2, :2] = rotation.T
+        self.inverse[:2, 2] = -rotation.T @ self.matrix[:2, 2]
+
+    def Forward(self, coords):
+        """
+        Moves world coordinates into the local frame in place.
+
+        Args:
+            coords (np.array): (n, 2) float array, or anything with x's and y's in its last axis, e.g. PathArray.coords
+
+        Returns:
+            coords, for chaining
+        """
+        return self.__Apply(self.matrix, coords)
+
+    def Inverse(self, coords):
+        """
+        Moves local coordinates back into the world in place.
+
+        Args:
+            coords (np.array): (n, 2) float array, or anything with x's and y's in its last axis, e.g. PathArray.coords
+
+        Returns:
+            coords, for chaining
+        """
+        return self.__Apply(self.inverse, coords)
+
+    def ToLocal(self, geometry):
+        """
+        Copy of any Shapely geometry in the local frame.
+        """
+        return affinity.affine_transform(geometry, self.__Parameters(self.matrix))
+
+    def ToWorld(self, geometry):
+        """
+        Copy of any Shapely geometry back in the world.
+        """
+        return affinity.affine_transform(geometry, self.__Parameters(self.inverse))
+
+    def __Apply(self, matrix, coords):
+        x = coords[..., 0].copy()
+        y = coords[..., 1]
+
+        # y is written last since the new x needs the old y
+        coords[..., 0] = matrix[0, 0] * x + matrix[0, 1] * y + matrix[0, 2]
+        coords[..., 1] = matrix[1, 0] * x + matrix[1, 1] * y + matrix[1, 2]
+
+        return coords
+
+    def __Parameters(self, matrix):
+        # [a, b, d, e, xoff, yoff] order Shapely wants
+        return [matrix[0, 0], matrix[0, 1], matrix[1, 0], matrix[1, 1], matrix[0, 2], matrix[1, 2]]
@@ -0,0 +1,176 @@
+# Library
+from functools import lru_cache
+
+import numpy as np
+from shapely import wkb
+from shapely.geometry import MultiPolygon, Polygon
+from shapely.geometry.polygon import orient
+from shapely.prepared import prep
+
+# Local
+from AngleSearch import AngleSearch
+from Obstacles import Obstacles
+from PathArray import PathArray, HEADLAND, TRANSIT
+from Rectangles import RectangleFactory
+from ToolPath import ToolPath
+
+@lru_cache(maxsize = 128)
+def OffsetRings(boundary, toolSize, rings):
+    """
+    Offsets a field inwards once per headland lap. Buffering a detailed boundary is slow and the same
+    headlands are asked for again and again, so the results are cached by the field's WKB.
+
+    Args:
+        boundary (bytes): WKB of the field
+        toolSize (float): width of each lap
+        rings (int): laps around the field
+
+    Returns:
+        tuple of laps from the outside in, each a tuple of read only (n, 2) np.array rings to drive,
+        and the WKB of the area left inside the laps
+    """
+    polygon = wkb.loads(boundary)
+    laps = []
+
+    for lap in range(rings):
+        # the middle of the tool drives half a width in from the edge of its lap
+        offset = polygon.buffer(-toolSize * (lap + 0.5))
+        parts = []
+        for part in getattr(offset, 'geoms', [offset]):
+            if part.is_empty:
+                continue
+            # counter clockwise around the outside and clockwise around the holes, always keeping the field on the left
+            part = orient(part)
+            for ring in [part.exterior] + list(part.interiors):
+                coords = np.array(ring.coords)
+                coords.flags.writeable = False
+                parts.append(coords)
+        laps.append(tuple(parts))
+
+    inner = polygon.buffer(-toolSize * rings)
+
+    return tuple(laps), inner.wkb
+
+# Laps around the edge of a field for the turns to overhang into, with the inside planned as usual
+class Headlands():
+    def __init__(self, polygon, toolSize, toolLength, pointsInEachPath, rings = 2, obstacles = None, search = False):
+        """
+        Args:
+            polygon (Shapely::Polygon): field to plan
+            toolSize (float): Width of rectangle, and of each lap
+            toolLength (float): length of trailing object
+            pointsInEachPath (int): points to be in each seperate path object
+            rings (int): laps around the field
+            obstacles (list of Shapely::Polygon): obstacles in world coordinates, see RectangleFactory
+            search (bool): search for the best sweep angle of the inside with AngleSearch
+        """
+        laps, inner = OffsetRings(polygon.wkb, toolSize, rings)
+        self.inner = wkb.loads(inner)
+        self.laps = laps
+
+        # the laps and the ways between them keep out of the holes and the other obstacles, like CellDecomposition's
+        blocked = [Polygon(ring) for ring in polygon.interiors]
+        if obstacles is not None:
+            blocked += list(getattr(obstacles, 'geoms', obstacles))
+        self.obstacles = Obstacles(blocked, toolSize / 2)
+        self.field = prep(Polygon(polygon.exterior).buffer(toolSize))
+        self.outline = np.asarray(polygon.exterior.coords)
+
+        # the inside can be split in two by a narrow neck, each piece gets planned on its own
+        self.plans = []
+        for part in getattr(self.inner, 'geoms', [self.inner]):
+            if part.is_empty or not part.area:
+                continue
+            if search:
+                plan = AngleSearch(part, toolSize, toolLength, pointsInEachPath, workers = 1, obstacles = obstacles)
+                rects, toolPath = plan.rectangleFactory, plan.toolPath
+            else:
+                rects = RectangleFactory(part, toolSize, obstacles = obstacles)
+                toolPath = ToolPath(toolSize, toolLength, rects.rectangles, pointsInEachPath, obstacles = rects.obstacles)
+            self.plans.append((rects, toolPath))
+
+        self._array = None
+
+    def Lap(self, rings, lap, start = None):
+        """
+        Path around one lap, every ring of it one after another. Each ring starts from its point closest
+        to where the last one ended, and is driven to from there with the tool up. Where a ring runs
+        into an obstacle it goes round it with the tool up too.
+
+        Args:
+            rings (tuple of np.array): from OffsetRings
+            lap (int): which lap from the outside in, kept as the pass index
+            start ((x, y)): where the path before the lap ends, None if nothing comes before it
+
+        Returns:
+            PathArray of HEADLAND points in world coordinates, with TRANSIT rows between the rings
+        """
+        pieces = []
+        for ring in rings:
+            if start is not None:
+                # rings are closed, so any point of one can be where it starts and ends
+                nearest = np.argmin(np.hypot(ring[:-1, 0] - start[0], ring[:-1, 1] - start[1]))
+                ring = np.concatenate((ring[nearest:-1], ring[:nearest + 1]))
+                pieces.append((self.Transit(start, ring[0]), TRANSIT))
+
+            source, points, transit, _ = self.obstacles.Reroute(ring, keepEnds = True)
+            pieces.append((ring, HEADLAND) if source is None else (points, np.where(transit, TRANSIT, HEADLAND)))
+            start = pieces[-1][0][-1]
+
+        path = PathArray.Empty(sum(len(points) for points, _ in pieces))
+        offset = 0
+        for points, kind in pieces:
+            offset = path.Write(offset, points, kind, lap)
+
+        return path
+
+    def Transit(self, start, end):
+        """
+        Way between two points with the tool up, see Obstacles.Route.
+
+        Returns:
+            (m, 2) np.array of points from start to end
+        """
+        return self.obstacles.Route(start, end, self.field, self.outline)
+
+    def Segments(self):
+        """
+        The inside first, with its turns overhanging into the headlands, then the laps from the inside out.
+        Each segment is driven to from the end of the one before with the tool up.
+
+        Returns:
+            generator of PathArray in world coordinates
+        """
+        end = None
+        for rects, toolPath in self.plans:
+            path = PathArray(toolPath.array.data.copy())
+            rects.frame.Inverse(path.coords)
+            if len(path) == 0:
+                continue
+
+            if end is not None:
+                points = self.Transit(end, path.coords[0])
+                transit = PathArray.Empty(len(points))
+                transit.Write(0, points, TRANSIT, path.passIndex[0])
+                yield transit
+
+            end = path.coords[-1].copy()
+            yield path
+
+        for lap in reversed(range(len(self.laps))):
+            if not self.laps[lap]:
+                continue
+
+            path = self.Lap(self.laps[lap], lap, end)
+            end = path.coords[-1].copy()
+            yield path
+
+    @property
+    def array(self):
+        """
+        PathArray of every segment one after another
+        """
+        if self._array is None:
+            self._array = PathArray.Concatenate(self.Segments())
+
+        return self._array
@@ -0,0 +1,88 @@
+# Library
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+# One JSON line per profiled plan is logged here when asked for
+logger = logging.getLogger('planning')
+
+# Stats being recorded to, None when nobody is profiling so the hooks cost one comparison
+_active = None
+
+# Wall time of each planning stage and counters of the work done, for one plan
+class PlanStats():
+    def __init__(self):
+        self.seconds = 0.0
+        self.stages = {}
+        self.counters = {}
+
+    def AddTime(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def Count(self, counter, amount = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def ToDict(self):
+        return {'seconds': self.seconds, 'stages': dict(self.stages), 'counters': dict(self.counters)}
+
+    def ToJson(self):
+        return json.dumps(self.ToDict())
+
+@contextmanager
+def Profile(log = False):
+    """
+    Records the stages and counters of everything planned inside the with block.
+    Stages that run inside other stages are counted in both.
+
+        with Profile() as stats:
+            RectangleFactory(polygon, toolSize)
+        print(stats.stages)
+
+    Args:
+        log (bool): also log the stats as one JSON line to the 'planning' logger
+
+    Returns:
+        PlanStats, filled in as the block runs
+    """
+    global _active
+    previous = _active
+    stats = _active = PlanStats()
+    start = time.perf_counter()
+
+    try:
+        yield stats
+    finally:
+        stats.seconds = time.perf_counter() - start
+        _active = previous
+        if log:
+            logger.info(stats.ToJson())
+
+@contextmanager
+def Stage(name):
+    """
+    Times a stage of planning when profiling, does nothing otherwise.
+    """
+    stats = _active
+    if stats is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.AddTime(name, time.perf_counter() - start)
+
+def Count(counter, amount = 1):
+    """
+    Adds to a counter when profiling, does nothing otherwise.
+    """
+    if _active is not None:
+        _active.Count(counter, amount)
+
+def Enabled():
+    """
+    Whether anything is being profiled, for counters that take work to compute.
+    """
+    return _active is not None
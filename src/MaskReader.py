@@ -0,0 +1,162 @@
+# Library
+import numpy as np
+from shapely import affinity
+from shapely.geometry import MultiLineString
+from shapely.ops import polygonize
+
+# Reads field boundaries out of a binary mask too big to load, e.g. one classified from an orthomosaic.
+# The mask is memory mapped and walked a tile at a time, only the pixel edges between field and not
+# field (crack edges) are kept, so memory grows with the length of the boundaries rather than the area.
+class MaskReader():
+    def __init__(self, path, shape = None, dtype = np.uint8, tileSize = 2048, tolerance = 1.0,
+                 pixelSize = 1.0, origin = (0, 0), minArea = 0):
+        """
+        Args:
+            path (str): .npy mask, or a raw mask of shape and dtype with rows stored one after another
+            shape ((rows, columns)): size of a raw mask, read from the header of a .npy
+            dtype: pixel type of a raw mask, any non zero pixel is field
+            tileSize (int): pixels down each side of the tiles read at a time
+            tolerance (float): distance in world units the boundaries are simplified to
+            pixelSize (float): world units along each side of a pixel
+            origin ((x, y)): world position of the top left corner of the mask, rows go down in y
+            minArea (float): fields smaller than this in world units are dropped as noise
+        """
+        self.path = path
+        self.tileSize = tileSize
+        self.tolerance = tolerance
+        self.pixelSize = pixelSize
+        self.origin = origin
+        self.minArea = minArea
+
+        if path.lower().endswith('.npy'):
+            self.mask = np.load(path, mmap_mode = 'r')
+        else:
+            if shape is None:
+                raise ValueError('a raw mask needs its shape')
+            self.mask = np.memmap(path, dtype = dtype, mode = 'r', shape = tuple(shape))
+
+        if self.mask.ndim != 2:
+            raise ValueError('expected a 2D mask, got shape {}'.format(self.mask.shape))
+
+    def Block(self, top, left, bottom, right):
+        """
+        Field pixels of rows top to bottom and columns left to right, anything outside the mask is not field.
+
+        Returns:
+            np.array of bools
+        """
+        rows, columns = self.mask.shape
+        block = np.zeros((bottom - top, right - left), dtype = bool)
+        r0, r1 = max(top, 0), min(bottom, rows)
+        c0, c1 = max(left, 0), min(right, columns)
+
+        if r0 < r1 and c0 < c1:
+            block[r0 - top:r1 - top, c0 - left:c1 - left] = self.mask[r0:r1, c0:c1] != 0
+
+        return block
+
+    def CrackEdges(self, top, left, bottom, right):
+        """
+        Crack edges on the grid lines of one tile, joined into runs. The tile owns the horizontal
+        lines top to bottom and the vertical ones left to right, so every edge is found by exactly one tile.
+
+        Args:
+            top, left, bottom, right (int): grid lines of the tile, bottom and right not included
+
+        Returns:
+            (n, 4) np.array of x0, y0, x1, y1 in pixel grid coordinates
+        """
+        # one extra row and column above and left, the pixels on the other side of the tile's first grid lines
+        block = self.Block(top - 1, left - 1, bottom, right)
+        inside = block[1:, 1:]
+
+        # most tiles of a big field are all field or all not, and have no edges
+        if block.all() or not block.any():
+            return np.empty((0, 4), dtype = int)
+
+        # crack (i, j) is the edge starting at grid point (top + i, left + j) going right or down
+        horizontal = block[:-1, 1:] != inside
+        vertical = block[1:, :-1] != inside
+
+        # a grid point with field in opposite corners has all four edges meeting at it, runs are broken
+        # there so every run only touches the others at its ends, which is what polygonize needs
+        crossing = (block[:-1, :-1] == inside) & (block[:-1, 1:] == block[1:, :-1]) & (block[:-1, :-1] != block[:-1, 1:])
+
+        segments = []
+        for edges, along in ((horizontal, 1), (vertical, 0)):
+            # an edge carries on the run of the one before it unless they meet at a crossing
+            carries = np.zeros_like(edges)
+            if along == 1:
+                carries[:, 1:] = edges[:, 1:] & edges[:, :-1] & ~crossing[:, 1:]
+            else:
+                carries[1:, :] = edges[1:, :] & edges[:-1, :] & ~crossing[1:, :]
+
+            starts = edges & ~carries
+            ends = edges.copy()
+            if along == 1:
+                ends[:, :-1] &= ~carries[:, 1:]
+            else:
+                ends[:-1, :] &= ~carries[1:, :]
+
+            # flat indexes are much faster to find than 2D ones
+            i0, j0 = np.divmod(np.flatnonzero(starts), edges.shape[1])
+            i1, j1 = np.divmod(np.flatnonzero(ends), edges.shape[1])
+            if along == 1:
+                y0, x0, x1 = i0, j0, j1 + 1
+                y1 = y0
+            else:
+                # ordered down each column so every start is paired with its own end,
+                # sorting the few edges is much cheaper than nonzero on a transposed tile
+                first, last = np.lexsort((i0, j0)), np.lexsort((i1, j1))
+                x0, y0, y1 = j0[first], i0[first], i1[last] + 1
+                x1 = x0
+
+            segments.append(np.column_stack((x0 + left, y0 + top, x1 + left, y1 + top)))
+
+        return np.concatenate(segments)
+
+    def Tiles(self):
+        """
+        Grid lines of every tile, the last row and column of tiles also own the mask's far edges.
+
+        Returns:
+            list of (top, left, bottom, right)
+        """
+        rows, columns = self.mask.shape
+        tops = list(range(0, rows, self.tileSize))
+        lefts = list(range(0, columns, self.tileSize))
+
+        return [(top, left, min(top + self.tileSize, rows) + (top + self.tileSize >= rows),
+                 min(left + self.tileSize, columns) + (left + self.tileSize >= columns))
+                for top in tops for left in lefts]
+
+    def Polygons(self):
+        """
+        Field boundaries of the mask, simplified and in world coordinates.
+
+        Returns:
+            list of Shapely::Polygon, largest first
+        """
+        segments = np.concatenate([self.CrackEdges(*tile) for tile in self.Tiles()])
+        if len(segments) == 0:
+            return []
+
+        lines = MultiLineString(segments.reshape(-1, 2, 2).tolist())
+
+        # polygonize gives a face for the field and for each hole in it, one pixel inside tells them apart
+        polygons = []
+        for face in polygonize(lines):
+            point = face.representative_point()
+            if self.mask[int(np.floor(point.y)), int(np.floor(point.x))] == 0:
+                continue
+
+            # rows go down the mask but up in the world
+            face = affinity.affine_transform(face, [self.pixelSize, 0, 0, -self.pixelSize, self.origin[0], self.origin[1]])
+            face = face.simplify(self.tolerance, preserve_topology = True)
+
+            if face.is_valid and not face.is_empty and face.area >= self.minArea:
+                polygons.append(face)
+
+        polygons.sort(key = lambda polygon: -polygon.area)
+
+        return polygons
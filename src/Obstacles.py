@@ -0,0 +1,307 @@
+# Library
+import numpy as np
+from shapely.geometry import LineString
+from shapely.ops import unary_union
+from shapely.strtree import STRtree
+
+# Things in a field that can't be driven through, e.g. ponds, power poles and tree islands.
+# Kept in a spatial index so finding the ones near a pass or a turn doesn't look at every one of them.
+class Obstacles():
+    def __init__(self, polygons, clearance):
+        """
+        Args:
+            polygons (list of Shapely::Polygon): obstacles in the field's local frame
+            clearance (float): distance the middle of the tool keeps from every obstacle, half the toolSize
+        """
+        self.polygons = [polygon for polygon in polygons if not polygon.is_empty]
+        self.clearance = clearance
+
+        # where the middle of the tool can't go without the tool touching the obstacle
+        self.zones = [polygon.buffer(clearance) for polygon in self.polygons]
+        self.tree = STRtree(self.zones)
+
+        # neighbouring passes mostly run into the same zones, so the outline of the zones
+        # each set of hits joins into is kept
+        self.outlines = {}
+
+    def __len__(self):
+        return len(self.zones)
+
+    def Query(self, geometry):
+        """
+        Zones whose bounding boxes overlap a geometry.
+
+        Returns:
+            np.array of indexes into self.zones
+        """
+        # Shapely 1.8's query gives back geometries, its query_items gives the indexes 2.x's query does
+        if hasattr(self.tree, 'query_items'):
+            indexes = self.tree.query_items(geometry)
+        else:
+            indexes = self.tree.query(geometry)
+
+        return np.asarray(indexes, dtype=int)
+
+    def Outlines(self, line):
+        """
+        Outlines of the zones a line runs through, zones that overlap them are joined in.
+        Holes in the joined zones are treated as blocked too, there is no way in or out of them.
+
+        Args:
+            line (Shapely::LineString)
+
+        Returns:
+            list of (n, 2) np.array closed rings
+        """
+        hits = tuple(sorted(i for i in self.Query(line) if self.zones[i].intersects(line)))
+
+        if hits not in self.outlines:
+            joined = unary_union([self.zones[i] for i in hits]) if hits else None
+
+            # zones touching the ones that were hit are joined too, so going around them doesn't run into another
+            touching = set(hits)
+            while joined is not None:
+                more = {i for i in self.Query(joined) if i not in touching and self.zones[i].intersects(joined)}
+                if not more:
+                    break
+                touching |= more
+                joined = unary_union([joined] + [self.zones[i] for i in more])
+
+            parts = getattr(joined, 'geoms', [joined]) if hits else []
+            self.outlines[hits] = [np.asarray(part.exterior.coords) for part in parts]
+
+        return self.outlines[hits]
+
+    def Reroute(self, points, keepEnds = False):
+        """
+        Takes a path around every zone it runs into, along the outline of the zone from where it goes in
+        to where it comes out. A path that starts inside a zone starts where it comes out, and one that
+        ends inside a zone stops where it goes in, unless its ends are kept.
+
+        Args:
+            points (np.array): (n, 2) points of the path
+            keepEnds (bool): go round to the closest point of the outline to an end inside a zone and then to the end
+
+        Returns:
+            (m,) row of points each new point takes its kind and pass from, None if nothing is in the way,
+            (m, 2) new points, (m,) whether each is driven to with the tool up, and whether the path ended inside a zone
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(points) < 2:
+            return None, points, None, False
+
+        crossings = []
+        for ring in self.Outlines(LineString(points)):
+            crossings += self.Crossings(points, ring)
+        if not crossings:
+            return None, points, None, False
+
+        # going in at -1 is starting inside a zone
+        crossings.sort(key=lambda crossing: crossing[0])
+
+        source, new, transit = [], [], []
+        def Add(rows, coords, up):
+            source.append(np.asarray(rows, dtype=int).reshape(-1))
+            new.append(np.asarray(coords, dtype=float).reshape(-1, 2))
+            transit.append(np.full(len(source[-1]), up))
+
+        # next row to copy, and how far along the path the last detour came out
+        done = 0
+        reached = -1.0
+        ended = False
+        for enter, p1, leave, p2, ring in crossings:
+            if enter >= 0:
+                if enter < reached:
+                    continue
+                row = int(enter)
+                Add(np.arange(done, row + 1), points[done:row + 1], False)
+                Add([row + 1], p1, False)
+
+                if leave is None:
+                    if keepEnds:
+                        around = self.Detour(p1, points[-1], ring)[1:]
+                        Add(np.full(len(around), len(points) - 1), around, True)
+                    done = len(points)
+                    ended = True
+                    break
+
+                around = self.Detour(p1, p2, ring)[1:-1]
+                Add(np.full(len(around), row + 1), around, True)
+            elif keepEnds:
+                around = self.Detour(points[0], p2, ring)[:-1]
+                Add(np.zeros(len(around)), around, True)
+
+            # comes out on the edge from row to row + 1, which is driven as row + 1
+            row = int(leave)
+            Add([row + 1], p2, True)
+            done = row + 1
+            reached = leave
+
+        Add(np.arange(done, len(points)), points[done:], False)
+
+        return np.concatenate(source), np.concatenate(new), np.concatenate(transit), ended
+
+    def Crossings(self, points, ring):
+        """
+        Where a path goes into and comes out of the inside of a ring. The path is cut wherever it meets the
+        ring and each piece is checked on its own, so running along an edge or through a vertex of the ring
+        can't leave the path thinking it is on the wrong side for the rest of it. Pieces on the outline count
+        as outside, the middle of the tool is allowed to run along the edge of a zone.
+
+        Args:
+            points (np.array): (n, 2) points of the path
+            ring (np.array): closed outline of a zone
+
+        Returns:
+            list of (enter, p1, leave, p2, ring), where along the path it goes in and comes out as the row of the
+            edge plus how far along it, -1 and None for enter if it starts inside and None for leave if it ends inside
+        """
+        a, b = points[:-1], points[1:]
+        low, high = ring.min(axis=0), ring.max(axis=0)
+        near = np.flatnonzero(np.all(np.maximum(a, b) >= low, axis=1) & np.all(np.minimum(a, b) <= high, axis=1))
+        if len(near) == 0:
+            return []
+        tolerance = 1e-9 * (1 + (high - low).max())
+
+        # every edge of the path near the ring against every edge of the ring, touching ends included
+        d = (b - a)[near][:, None, :]
+        f = np.diff(ring, axis=0)[None, :, :]
+        w = ring[None, :-1, :] - a[near][:, None, :]
+        denominator = d[..., 0] * f[..., 1] - d[..., 1] * f[..., 0]
+        safe = np.where(denominator == 0, 1.0, denominator)
+        t = (w[..., 0] * f[..., 1] - w[..., 1] * f[..., 0]) / safe
+        u = (w[..., 0] * d[..., 1] - w[..., 1] * d[..., 0]) / safe
+        hit = (denominator != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+
+        # vertices of the ring the path runs through or along, which a parallel edge never finds
+        length = np.maximum((d**2).sum(axis=2), tolerance**2)
+        along = (w * d).sum(axis=2) / length
+        off = np.abs(w[..., 0] * d[..., 1] - w[..., 1] * d[..., 0]) / np.sqrt(length)
+        touch = (off <= tolerance) & (along > 0) & (along < 1)
+
+        edge, _ = np.nonzero(hit)
+        touched, _ = np.nonzero(touch)
+        cuts = np.unique(np.concatenate((np.arange(len(points), dtype=float), near[edge] + t[hit], near[touched] + along[touch])))
+
+        # whether the middle of each piece between the cuts is inside, only pieces on edges near the ring can be
+        starts, ends = cuts[:-1], cuts[1:]
+        middle = (starts + ends) / 2
+        inside = np.zeros(len(middle), dtype=bool)
+        check = np.flatnonzero(np.isin(np.floor(middle).astype(int), near))
+        inside[check] = self.Strictly(self.At(points, middle[check]), ring, tolerance)
+
+        # every change between outside and inside is where the piece after it starts
+        changes = np.flatnonzero(inside[1:] != inside[:-1]) + 1
+        events = [(starts[i], self.At(points, starts[i:i + 1])[0]) for i in changes]
+        if inside[0]:
+            events.insert(0, (-1.0, None))
+        if len(events) % 2:
+            events.append((None, None))
+
+        return [(enter[0], enter[1], leave[0], leave[1], ring) for enter, leave in zip(events[::2], events[1::2])]
+
+    def At(self, points, positions):
+        """
+        Points along a path at positions given as the row of the edge plus how far along it.
+        """
+        row = np.minimum(np.floor(positions).astype(int), len(points) - 2)
+        t = (positions - row)[:, None]
+
+        return points[row] + t * (points[row + 1] - points[row])
+
+    def Strictly(self, points, ring, tolerance):
+        """
+        Whether each point is inside a closed ring and further than the tolerance from its outline.
+        """
+        x0, y0 = ring[:-1, 0], ring[:-1, 1]
+        x1, y1 = ring[1:, 0], ring[1:, 1]
+        px, py = points[:, 0, None], points[:, 1, None]
+
+        crosses = (y0 > py) != (y1 > py)
+        x = x0 + (py - y0) * (x1 - x0) / np.where(crosses, y1 - y0, 1)
+        inside = np.count_nonzero(crosses & (x > px), axis=1) % 2 == 1
+
+        # distance to the closest edge
+        dx, dy = x1 - x0, y1 - y0
+        t = np.clip(((px - x0) * dx + (py - y0) * dy) / np.maximum(dx**2 + dy**2, tolerance**2), 0, 1)
+        distance = np.hypot(x0 + t * dx - px, y0 + t * dy - py).min(axis=1)
+
+        return inside & (distance > tolerance)
+
+    def Clear(self, curves):
+        """
+        Whether each curve keeps clear of every obstacle.
+
+        Args:
+            curves (np.array): (n, numPoints, 2) points of each curve
+
+        Returns:
+            (n,) np.array of bools
+        """
+        clear = np.ones(len(curves), dtype=bool)
+        for i, curve in enumerate(curves):
+            line = LineString(curve)
+            clear[i] = not any(self.zones[j].intersects(line) for j in self.Query(line))
+
+        return clear
+
+    def Route(self, start, end, field, outline):
+        """
+        Way between two points with the tool up, straight across if that stays in the field, otherwise
+        along the field's outline, and around any zones on the way. Both ends are kept, even when they
+        are only just in a zone.
+
+        Args:
+            start ((x, y)): where the way starts
+            end ((x, y)): where it ends
+            field (Shapely::PreparedGeometry): where the way can go straight across
+            outline (np.array): closed outline of the field to go along otherwise
+
+        Returns:
+            (m, 2) np.array of points from start to end
+        """
+        points = np.array([start, end], dtype=float)
+        if not field.contains(LineString(points)):
+            points = self.Detour(points[0], points[1], outline)
+
+        source, around, _, _ = self.Reroute(points, keepEnds = True)
+
+        return points if source is None else around
+
+    def Detour(self, start, end, ring):
+        """
+        Way around a zone between two points on its outline, going whichever way round is shorter.
+
+        Args:
+            start ((x, y)): where the path meets the zone
+            end ((x, y)): where the path leaves it
+            ring (np.array): closed outline of the zone, from Gaps
+
+        Returns:
+            (m, 2) np.array of points from start to end
+        """
+        edges = np.diff(ring, axis=0)
+        lengths = np.hypot(edges[:, 0], edges[:, 1])
+        distance = np.concatenate(([0], np.cumsum(lengths)))
+        length = distance[-1]
+        a = self.__Project(ring, edges, lengths, distance, start)
+        b = self.__Project(ring, edges, lengths, distance, end)
+
+        # how far round each vertex is from start going one way, the ones before end are kept
+        if (b - a) % length <= length / 2:
+            along, stop = (distance[:-1] - a) % length, (b - a) % length
+        else:
+            along, stop = (a - distance[:-1]) % length, (a - b) % length
+        between = np.flatnonzero((along > 0) & (along < stop))
+
+        return np.concatenate(([start], ring[between[np.argsort(along[between])]], [end]))
+
+    def __Project(self, ring, edges, lengths, distance, point):
+        """
+        Distance round a ring to the closest point on it
+        """
+        t = np.clip(((point - ring[:-1]) * edges).sum(axis=1) / np.where(lengths > 0, lengths**2, 1), 0, 1)
+        closest = ring[:-1] + t[:, None] * edges
+        i = np.argmin(np.hypot(*(closest - point).T))
+
+        return distance[i] + t[i] * lengths[i]
@@ -0,0 +1,120 @@
+# Library
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from shapely.geometry import LineString
+
+# What part of the path a point belongs to
+PASS = 0
+TURN = 1
+LEAD_IN = 2
+TRANSIT = 3     # driving around an obstacle with the tool up
+HEADLAND = 4    # a lap around the edge of the field
+
+# One row per point of a path, the pass is the one being driven or turned into
+PATH_DTYPE = np.dtype([('x', np.float64), ('y', np.float64), ('kind', np.uint8), ('pass', np.int32)], align=True)
+
+# A tool path stored in one structured numpy array instead of a list of [x, y] lists
+class PathArray():
+    def __init__(self, data):
+        """
+        Wraps an array of path points.
+
+        Args:
+            data (np.ndarray): array with the PATH_DTYPE
+        """
+        self.data = data
+
+    @classmethod
+    def Empty(cls, size):
+        """
+        Preallocates a path to be filled with Write.
+
+        Args:
+            size (int): number of points in the path
+
+        Returns:
+            PathArray of zeros
+        """
+        return cls(np.zeros(size, dtype=PATH_DTYPE))
+
+    @classmethod
+    def Concatenate(cls, paths):
+        """
+        Joins paths one after another, e.g. the segments of a streamed ToolPath.
+
+        Args:
+            paths (iterable of PathArray)
+
+        Returns:
+            PathArray holding a copy of every point
+        """
+        return cls(np.concatenate([path.data for path in paths]))
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def x(self):
+        return self.data['x']
+
+    @property
+    def y(self):
+        return self.data['y']
+
+    @property
+    def kind(self):
+        return self.data['kind']
+
+    @property
+    def passIndex(self):
+        return self.data['pass']
+
+    @property
+    def xy(self):
+        """
+        Views of the x's and y's, same layout as Shapely::LineString.xy
+        """
+        return self.x, self.y
+
+    @property
+    def coords(self):
+        """
+        (n, 2) view of the points, no copy is made so writing to it changes the path
+        """
+        return as_strided(self.x, shape=(len(self.data), 2), strides=(self.data.strides[0], self.x.itemsize))
+
+    def Write(self, offset, points, kind, passIndex):
+        """
+        Fills rows of the path starting at offset.
+
+        Args:
+            offset (int): first row to write
+            points (np.array): (n, 2) points to write
+            kind (int or np.array): PASS, TURN or LEAD_IN of each point
+            passIndex (int or np.array): pass each point belongs to
+
+        Returns:
+            The row after the last one written
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        end = offset + len(points)
+        rows = self.data[offset:end]
+
+        rows['x'] = points[:, 0]
+        rows['y'] = points[:, 1]
+        rows['kind'] = kind
+        rows['pass'] = passIndex
+
+        return end
+
+    def Length(self):
+        """
+        Total distance driven along the path.
+        """
+        return np.hypot(np.diff(self.x), np.diff(self.y)).sum()
+
+    def ToLineString(self):
+        """
+        Builds a Shapely::LineString of the path, this copies every point.
+        """
+        return LineString(self.coords)
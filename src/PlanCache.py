@@ -0,0 +1,234 @@
+# Library
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+from shapely.geometry import MultiPolygon, box
+
+# Local
+from Export import MapMembers
+from Frame import Frame
+from PathArray import PathArray
+from Rectangles import RectangleFactory
+from ToolPath import ToolPath
+
+# The parts of a planned field, without any Shapely objects so it loads fast
+class CachedPlan():
+    def __init__(self, bounds, centroid, angle, translate, path):
+        """
+        Args:
+            bounds (np.array): (n, 4) bounds of the rectangles
+            centroid ((x, y)): centroid the field was rotated about
+            angle (float): rotation of the field
+            translate (float): y translation after rotating
+            path (PathArray): tool path in the rotated frame
+        """
+        self.bounds = bounds
+        self.centroid = centroid
+        self.angle = angle
+        self.translate = translate
+        self.path = path
+        self._rectangles = None
+
+    @classmethod
+    def FromPlanners(cls, rectangleFactory, toolPath):
+        """
+        Takes what is needed out of a RectangleFactory and its ToolPath.
+        """
+        bounds = np.array([rect.bounds for rect in rectangleFactory.rectangles.geoms]).reshape(-1, 4)
+        centroid = (rectangleFactory.centroid.x, rectangleFactory.centroid.y)
+
+        return cls(bounds, centroid, rectangleFactory.angle, rectangleFactory.translate, toolPath.array)
+
+    @property
+    def rectangles(self):
+        """
+        Shapely::MultiPolygon of the rectangles, only built the first time it is asked for
+        """
+        if self._rectangles is None:
+            self._rectangles = MultiPolygon([box(*bound, ccw = True) for bound in self.bounds])
+
+        return self._rectangles
+
+    @property
+    def frame(self):
+        """
+        Frame to take the path and rectangles back to the world
+        """
+        return Frame(self.angle, self.centroid, self.translate)
+
+# Plans kept on disk by a hash of the field and every planning parameter, evicting the least recently used
+# once the directory is over its size. The most recent plans are also kept in memory.
+class PlanCache():
+    def __init__(self, directory, maxBytes = 256 * 2**20, memoryEntries = 64):
+        """
+        Args:
+            directory (str): where the plans are stored, shared between processes
+            maxBytes (int): size of the directory before plans are evicted
+            memoryEntries (int): plans also kept in memory
+        """
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.memoryEntries = memoryEntries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok = True)
+
+        # least recently used first, files are touched on every hit so the order survives restarts
+        files = [entry for entry in os.scandir(directory) if entry.name.endswith('.npz')]
+        files.sort(key = lambda entry: entry.stat().st_mtime)
+        self.index = OrderedDict((entry.name[:-4], entry.stat().st_size) for entry in files)
+        self.size = sum(self.index.values())
+        self.memory = OrderedDict()
+
+    def Key(self, polygon, toolSize, toolLength, pointsInEachPath, angle = None):
+        """
+        Hash of a field and its planning parameters. The same field with its vertices
+        starting somewhere else or going the other way around gives the same key.
+
+        Returns:
+            hex string
+        """
+        digest = hashlib.sha256()
+        digest.update(np.array([toolSize, toolLength, pointsInEachPath, np.nan if angle is None else angle], dtype = float).tobytes())
+
+        for ring in [polygon.exterior] + list(polygon.interiors):
+            coords = np.array(ring.coords, dtype = float)[:-1]
+
+            # counter clockwise, starting from the lowest x then y
+            x, y = coords[:, 0], coords[:, 1]
+            if np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y) < 0:
+                coords = coords[::-1]
+            coords = np.roll(coords, -np.lexsort((coords[:, 1], coords[:, 0]))[0], axis = 0)
+
+            digest.update(np.int64(len(coords)).tobytes())
+            digest.update(np.ascontiguousarray(coords).tobytes())
+
+        return digest.hexdigest()
+
+    def Get(self, key):
+        """
+        Returns:
+            CachedPlan, or None if the key is not cached
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.index.move_to_end(key)
+            self.hits += 1
+
+            # the file's time is the order the plans are evicted in after a restart
+            try:
+                os.utime(self.Path(key))
+            except FileNotFoundError:
+                pass
+            return self.memory[key]
+
+        if key not in self.index:
+            self.misses += 1
+            return None
+
+        # the members are mapped where they sit in the file, nothing but the headers is read until the plan is used
+        path = self.Path(key)
+        try:
+            data = MapMembers(path)
+            x, y, angle, translate = data['frame'].tolist()
+            plan = CachedPlan(data['bounds'], (x, y), angle, translate, PathArray(data['path']))
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted by another process sharing the directory
+            self.size -= self.index.pop(key)
+            self.misses += 1
+            return None
+
+        self.index.move_to_end(key)
+        self.Remember(key, plan)
+        self.hits += 1
+
+        return plan
+
+    def Put(self, key, plan):
+        """
+        Stores a plan, evicting the least recently used ones if the directory gets too big.
+
+        Args:
+            key (str): from Key
+            plan (CachedPlan)
+
+        Returns:
+            read only CachedPlan as it is kept
+        """
+        # written next to the final file and renamed so a reader never sees half a plan
+        handle, temporary = tempfile.mkstemp(dir = self.directory, suffix = '.tmp')
+        with os.fdopen(handle, 'wb') as file:
+            # every member is a zip entry to find on load, so the scalars are kept together,
+            # savez stores them as plain .npy without compressing so Get can map them
+            frame = np.array([plan.centroid[0], plan.centroid[1], plan.angle, plan.translate])
+            np.savez(file, bounds = plan.bounds, frame = frame, path = plan.path.data)
+        os.replace(temporary, self.Path(key))
+
+        self.size -= self.index.pop(key, 0)
+        self.index[key] = os.path.getsize(self.Path(key))
+        self.size += self.index[key]
+        plan = self.Remember(key, plan)
+
+        while self.size > self.maxBytes and len(self.index) > 1:
+            old, size = self.index.popitem(last = False)
+            self.memory.pop(old, None)
+            self.size -= size
+            self.evictions += 1
+            try:
+                os.remove(self.Path(old))
+            except FileNotFoundError:
+                pass
+
+        return plan
+
+    def Plan(self, polygon, toolSize, toolLength, pointsInEachPath, angle = None):
+        """
+        Returns the cached plan of a field, planning and storing it if it isn't cached yet.
+
+        Returns:
+            CachedPlan
+        """
+        key = self.Key(polygon, toolSize, toolLength, pointsInEachPath, angle)
+        plan = self.Get(key)
+
+        if plan is None:
+            rectangleFactory = RectangleFactory(polygon, toolSize, angle)
+            toolPath = ToolPath(toolSize, toolLength, rectangleFactory.rectangles, pointsInEachPath, obstacles = rectangleFactory.obstacles)
+            plan = self.Put(key, CachedPlan.FromPlanners(rectangleFactory, toolPath))
+
+        return plan
+
+    def Stats(self):
+        """
+        Returns:
+            dict of hits, misses, hit rate, evictions, plans stored and bytes used
+        """
+        lookups = self.hits + self.misses
+
+        return {'hits': self.hits, 'misses': self.misses, 'hitRate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions, 'entries': len(self.index), 'bytes': self.size}
+
+    def Path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def Remember(self, key, plan):
+        # a read only copy like the mapped plans from disk, so a caller changing one in place can't change the next hit
+        if plan.bounds.flags.writeable or plan.path.data.flags.writeable:
+            bounds, data = plan.bounds.copy(), plan.path.data.copy()
+            bounds.setflags(write = False)
+            data.setflags(write = False)
+            plan = CachedPlan(bounds, plan.centroid, plan.angle, plan.translate, PathArray(data))
+
+        self.memory[key] = plan
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memoryEntries:
+            self.memory.popitem(last = False)
+
+        return plan
@@ -1,25 +1,40 @@
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+import subprocess
+import numpy as np
 from shapely.geometry import Polygon, MultiPolygon, MultiLineString, LineString
 
 SHAPE_KEY = 'shape'
 POINT_KEY = 'point'
 
+# Layers of the batched mode, each holds all of its geometry in one array
+POLYGONS_KEY = 'polygons'
+LINES_KEY = 'lines'
+SCATTER_KEY = 'scatter'
+
+# Most frames put in a gif unless ExportAnimation is told otherwise
+GIF_FRAMES = 500
+
 # Wrapper for matplotlib::plot(), for easier implementation with these use cases.
 # Allows for adding plotting elements in the shapely library.
+# Matplotlib is only imported once a Plotter is made, so importing this module costs nothing headless.
 class Plotter:
-    def __init__(self):
+    def __init__(self, batched = False):
         """
         initializes first pyplot and initalizes a list for history
+        Params:
+            batched: draw each call as one collection and keep its history as one layer of arrays,
+                instead of an artist and a history entry per polygon or point
         """
+        import matplotlib.pyplot as plt
         self.fig, self.ax = plt.subplots()
         self.history = list()
+        self.batched = batched
         
     def Plot(self):
         """
         Shows the plot and initizes new plot with memory from old plot
         This is needed as on completion of show the plt is emptied
         """
+        import matplotlib.pyplot as plt
         plt.show()
         
         self.fig, self.ax = plt.subplots()
@@ -28,6 +43,12 @@ class Plotter:
                 self.ax.fill(*(history[1]), history[2])
             if history[0] is POINT_KEY:
                 self.ax.scatter(*(history[1]), marker='x', c=history[2])
+            if history[0] is POLYGONS_KEY:
+                self.__DrawPolygons(*history[1:])
+            if history[0] is LINES_KEY:
+                self.__DrawLines(*history[1:])
+            if history[0] is SCATTER_KEY:
+                self.ax.scatter(history[1][:, 0], history[1][:, 1], zorder=10, marker='x', c=history[2] or None)
             
     
     # since overloads don't exist in python, this is the public function 
@@ -40,6 +61,9 @@ class Plotter:
             TypeError: only 2D currently
         """
         if len(args) == 1:
+            if self.batched and isinstance(args[0], (Polygon, MultiPolygon, LineString, MultiLineString)):
+                self.__AddLayer(args[0], color = color)
+                return
             if isinstance(args[0], Polygon):
                 self.AddShapes(args[0].exterior.xy, color = color)
                 return
@@ -82,6 +106,15 @@ class Plotter:
         else:
             raise TypeError("AddPoints() takes 1 or 2 positional arguments")
         
+        if self.batched:
+            points = np.column_stack((np.asarray(x, dtype=float).ravel(), np.asarray(y, dtype=float).ravel()))
+            if connected:
+                self.__AddLines([points], color)
+            else:
+                self.ax.scatter(points[:, 0], points[:, 1], zorder=10, marker='x', c=color or None)
+                self.history.append([SCATTER_KEY, points, color])
+            return
+        
         if not connected:
             self.ax.scatter(x, y, zorder=10, marker='x')
             
@@ -104,6 +137,9 @@ class Plotter:
     
     # def Animate(self, init_ft, animate_ft, frames, blit = True):
     def Animate(self, x_coords, y_coords, init_ft = None, blit = True, frames=None):
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
+        
         ln, = self.ax.plot([], [], 'ro')
         if frames is None:
             frames = len(x_coords)
@@ -124,6 +160,109 @@ class Plotter:
         animation = FuncAnimation(self.fig, update, init_func=init, frames=frames, blit=blit, repeat=False)
         plt.show()
     
+    def ExportAnimation(self, filename, x_coords, y_coords, every = 1, spacing = None, fps = 30, dpi = None, color = 'red',
+                        maxFrames = None):
+        """
+        Renders the animation of a path to a file on the Agg backend, without showing anything.
+        The field drawn so far is rendered once and blitted under every frame, and the trail is
+        drawn onto it a piece at a time instead of redrawing the whole path each frame.
+        Params:
+            filename: .gif is written with Pillow a frame at a time as they are rendered,
+                anything else (.mp4, ...) is piped to ffmpeg
+            x_coords, y_coords: path to animate
+            every: one frame every this many points
+            spacing: one frame every this distance along the path, instead of every
+            fps: frames per second of the file
+            dpi: resolution, the figure's by default
+            color: colour of the trail
+            maxFrames: most frames to write, spread evenly over the path, GIF_FRAMES for a .gif by default
+        Returns:
+            number of frames written
+        """
+        import matplotlib
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        
+        gif = filename.lower().endswith('.gif')
+        x_coords = np.asarray(x_coords, dtype=float)
+        y_coords = np.asarray(y_coords, dtype=float)
+        frames = self.__FrameIndices(x_coords, y_coords, every, spacing)
+        
+        # every gif frame is diffed against the one before and kept until the end, so long paths are thinned
+        if maxFrames is None and gif:
+            maxFrames = GIF_FRAMES
+        if maxFrames is not None and len(frames) > maxFrames:
+            frames = frames[np.unique(np.linspace(0, len(frames) - 1, maxFrames).round().astype(int))]
+        
+        if dpi is not None:
+            self.fig.set_dpi(dpi)
+        
+        # interactive canvases that aren't Agg based get theirs back at the end
+        original = self.fig.canvas
+        canvas = original if isinstance(original, FigureCanvasAgg) else FigureCanvasAgg(self.fig)
+        canvas.draw()
+        width, height = canvas.get_width_height()
+        
+        if not gif:
+            command = matplotlib.rcParams['animation.ffmpeg_path']
+            try:
+                ffmpeg = subprocess.Popen([command, '-y', '-loglevel', 'error',
+                                           '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', '{}x{}'.format(width, height),
+                                           '-r', str(fps), '-i', '-', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+                                           '-pix_fmt', 'yuv420p', filename], stdin=subprocess.PIPE)
+            except FileNotFoundError as error:
+                self.fig.set_canvas(original)
+                raise RuntimeError("can't write {}, ffmpeg was not found at '{}'. Install it, point "
+                                   "matplotlib's animation.ffmpeg_path at it or export a .gif".format(filename, command)) from error
+        
+        rendered = self.__RenderFrames(canvas, original, x_coords, y_coords, frames, color)
+        try:
+            if gif:
+                from PIL import Image
+                
+                # working out a palette is most of the cost of a frame, the first one has every colour that will be drawn
+                first = Image.fromarray(next(rendered)[..., :3]).quantize()
+                rest = (Image.fromarray(frame[..., :3]).quantize(palette=first, dither=0) for frame in rendered)
+                first.save(filename, save_all=True, append_images=rest, duration=1000 / fps, loop=0)
+            else:
+                for frame in rendered:
+                    ffmpeg.stdin.write(frame.tobytes())
+        finally:
+            # puts the canvas back even if writing stopped part way
+            rendered.close()
+            if not gif:
+                ffmpeg.stdin.close()
+                ffmpeg.wait()
+        
+        return len(frames)
+    
+    def __RenderFrames(self, canvas, original, x_coords, y_coords, frames, color):
+        """
+        Draws the frames one at a time, each is only valid until the next one is asked for
+        Yields:
+            (height, width, 4) RGBA np.array of the canvas
+        """
+        trail, = self.ax.plot([], [], color=color, animated=True)
+        marker, = self.ax.plot([], [], 'o', color=color, animated=True)
+        
+        try:
+            background = canvas.copy_from_bbox(self.fig.bbox)
+            previous = 0
+            for frame in frames:
+                # the new piece of trail becomes part of the background for the next frame
+                canvas.restore_region(background)
+                trail.set_data(x_coords[previous:frame + 1], y_coords[previous:frame + 1])
+                self.ax.draw_artist(trail)
+                background = canvas.copy_from_bbox(self.fig.bbox)
+                previous = frame
+                
+                marker.set_data(x_coords[frame:frame + 1], y_coords[frame:frame + 1])
+                self.ax.draw_artist(marker)
+                yield np.asarray(canvas.buffer_rgba())
+        finally:
+            trail.remove()
+            marker.remove()
+            self.fig.set_canvas(original)
+    
     def get_ax(self):
         return self.ax
     
@@ -141,4 +280,59 @@ class Plotter:
                 
     def __AddLineStrings(self, multiLineString, color = ''):
         for line in multiLineString.geoms:
-            self.__AddLineString(line, color = color)
\ No newline at end of file
+            self.__AddLineString(line, color = color)
+
+    def __FrameIndices(self, x_coords, y_coords, every, spacing):
+        """
+        Points of the path that get a frame, always including the last one
+        """
+        if spacing is not None:
+            distance = np.concatenate(([0], np.cumsum(np.hypot(np.diff(x_coords), np.diff(y_coords)))))
+            frames = np.searchsorted(distance, np.arange(0, distance[-1], spacing))
+        else:
+            frames = np.arange(0, len(x_coords), every)
+        
+        return np.unique(np.append(frames, len(x_coords) - 1))
+    
+    def __AddLayer(self, geometry, color = ''):
+        """
+        Adds any Shapely geometry as one collection
+        Args:
+            geometry (Polygon, MultiPolygon, LineString or MultiLineString)
+        """
+        if isinstance(geometry, (Polygon, LineString)):
+            parts = [geometry]
+        else:
+            parts = geometry.geoms
+        
+        if isinstance(geometry, (Polygon, MultiPolygon)):
+            rings = [np.asarray(part.exterior.coords) for part in parts]
+            coords, splits = self.__Pack(rings)
+            self.__DrawPolygons(coords, splits, color)
+            self.history.append([POLYGONS_KEY, coords, splits, color])
+        else:
+            self.__AddLines([np.asarray(part.coords) for part in parts], color)
+    
+    def __AddLines(self, lines, color = ''):
+        coords, splits = self.__Pack(lines)
+        self.__DrawLines(coords, splits, color)
+        self.history.append([LINES_KEY, coords, splits, color])
+    
+    def __Pack(self, parts):
+        """
+        Joins many (n, 2) arrays into one, with where to split them back apart
+        """
+        splits = np.cumsum([len(part) for part in parts])[:-1]
+        
+        return np.concatenate(parts).reshape(-1, 2), splits
+    
+    def __DrawPolygons(self, coords, splits, color):
+        from matplotlib.collections import PolyCollection
+        color = color or None
+        self.ax.add_collection(PolyCollection(np.split(coords, splits), facecolors=color, edgecolors=color))
+        self.ax.autoscale_view()
+    
+    def __DrawLines(self, coords, splits, color):
+        from matplotlib.collections import LineCollection
+        self.ax.add_collection(LineCollection(np.split(coords, splits), colors=color or None))
+        self.ax.autoscale_view()
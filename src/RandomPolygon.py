@@ -1,19 +1,62 @@
 import random
-from shapely.geometry import Polygon
+import numpy as np
+from shapely import affinity
+from shapely.geometry import Point, Polygon
 
 # Generates a random shapely::Polygon
 class RandomPolygon(Polygon):
-    def __init__(self, num_vertices=5, min_coord=0, max_coord=500):
+    def __init__(self, num_vertices=5, min_coord=0, max_coord=500, seed=None, max_attempts=None,
+                 strategy='rejection', irregularity=0.5, holes=0, target_area=None):
+        """
+        Args:
+            num_vertices (int): vertices of the outline
+            min_coord, max_coord (float): square the polygon is generated in
+            seed (int): the same seed always gives the same polygon
+            max_attempts (int): tries before giving up, None tries forever
+            strategy (str): 'rejection' draws vertices anywhere and retries until the polygon is valid, as it always has,
+                'star' sorts vertices by angle around the middle so it is always valid first time
+            irregularity (float): 0 to 1, how far a star vertex can be pulled in towards the middle
+            holes (int): star shaped holes to cut out of the polygon
+            target_area (float): scales the polygon about its centroid to this area, it may leave the square
+        """
         self.num_vertices = num_vertices
         self.min_coord = min_coord
         self.max_coord = max_coord
+        self.seed = seed
+        self.max_attempts = max_attempts
+        self.strategy = strategy
+        self.irregularity = irregularity
+        self.holes = holes
+        self.target_area = target_area
         self.polygon = self.generate_polygon()
 
     def generate_polygon(self):
-        while True:
+        if self.strategy == 'star':
+            rng = np.random.default_rng(self.seed)
+            polygon = self.generate_star(rng)
+        elif self.strategy == 'rejection':
+            # the same seed always gives the same polygon, no seed uses the global random state
+            polygon = self.generate_rejection(random.Random(self.seed) if self.seed is not None else random)
+            rng = np.random.default_rng(self.seed)
+        else:
+            raise ValueError("unknown strategy {}".format(self.strategy))
+
+        if self.holes:
+            polygon = self.cut_holes(polygon, rng)
+
+        if self.target_area is not None:
+            scale = np.sqrt(self.target_area / polygon.area)
+            polygon = affinity.scale(polygon, scale, scale, origin='centroid')
+
+        return polygon
+
+    def generate_rejection(self, rng):
+        attempts = 0
+
+        while self.max_attempts is None or attempts < self.max_attempts:
             # Generate random points within a square
-            points = [(random.uniform(self.min_coord, self.max_coord),
-                       random.uniform(self.min_coord, self.max_coord))
+            points = [(rng.uniform(self.min_coord, self.max_coord),
+                       rng.uniform(self.min_coord, self.max_coord))
                       for i in range(self.num_vertices)]
 
             # Create a polygon from the random points
@@ -22,4 +65,44 @@ class RandomPolygon(Polygon):
             # Check if the polygon is valid (i.e., not self-intersecting)
             if polygon.is_valid:
                 return polygon
-            
\ No newline at end of file
+
+            attempts += 1
+
+        raise ValueError("no valid polygon with {} vertices in {} attempts".format(self.num_vertices, self.max_attempts))
+
+    def star_points(self, rng, center, radius, count):
+        # one angle in each of count even slices so they are sorted and never the same,
+        # connecting points in order of angle around a point can't cross itself
+        angles = (np.arange(count) + rng.uniform(0, 1, count)) * 2 * np.pi / count
+        radii = radius * (1 - self.irregularity * rng.uniform(0, 1, count))
+
+        return np.column_stack((center[0] + radii * np.cos(angles), center[1] + radii * np.sin(angles)))
+
+    def generate_star(self, rng):
+        middle = (self.min_coord + self.max_coord) / 2
+        radius = (self.max_coord - self.min_coord) / 2
+
+        return Polygon(self.star_points(rng, (middle, middle), radius, self.num_vertices))
+
+    def cut_holes(self, polygon, rng):
+        minx, miny, maxx, maxy = polygon.bounds
+        holes = []
+        attempts = 0
+
+        while len(holes) < self.holes:
+            if self.max_attempts is not None and attempts >= self.max_attempts:
+                raise ValueError("could not fit {} holes in {} attempts".format(self.holes, self.max_attempts))
+            attempts += 1
+
+            center = Point(rng.uniform(minx, maxx), rng.uniform(miny, maxy))
+            if not polygon.contains(center):
+                continue
+
+            # leaving a gap to the outline and the other holes so they never touch
+            room = min([polygon.exterior.distance(center)] + [hole.distance(center) for hole in holes])
+            if room <= 0:
+                continue
+
+            holes.append(Polygon(self.star_points(rng, (center.x, center.y), room * rng.uniform(0.2, 0.6), 8)))
+
+        return Polygon(polygon.exterior.coords, [hole.exterior.coords for hole in holes])
@@ -1,38 +1,58 @@
 # Library
 import numpy as np
-from shapely.geometry import LineString, MultiPolygon, box
-from shapely import affinity
+from shapely.geometry import MultiPolygon, Polygon, box
+
+# Local
+from Frame import Frame
+from Instrumentation import Stage, Count
+from Obstacles import Obstacles
 
 # This is not a factory method, instead it produces rectangles that descibe a shapely::Polygon
 class RectangleFactory():
-    def __init__(self, polygon, toolSize):
-        self.rectangles, self.centroid, self.angle, self.translate = self.CreateRects(polygon, toolSize)
+    def __init__(self, polygon, toolSize, angle = None, obstacles = None):
+        self.rectangles, self.frame = self.CreateRects(polygon, toolSize, angle)
+        self.centroid = polygon.centroid
+        self.angle = self.frame.angle
+        self.translate = self.frame.translate
+        self.obstacles = self.LocalObstacles(polygon, obstacles, toolSize)
+    
+    def LocalObstacles(self, polygon, obstacles, toolSize):
+        """
+        Indexes the holes of a polygon and any other obstacles in the field's local frame, to hand to ToolPath.
+
+        Args:
+            polygon (Shapely::Polygon): field, its holes are obstacles
+            obstacles (list of Shapely::Polygon or Shapely::MultiPolygon): other obstacles in world coordinates
+            toolSize (float): the middle of the tool keeps half of this from every obstacle
+
+        Returns: 
+            Obstacles, None if there aren't any
+        """
+        polygons = [Polygon(ring) for ring in polygon.interiors]
+        if obstacles is not None:
+            polygons += list(getattr(obstacles, 'geoms', obstacles))
+        
+        if not polygons:
+            return None
         
-    def VerticalAt(self, polygon):
+        with Stage('IndexObstacles'):
+            return Obstacles([self.frame.ToLocal(obstacle) for obstacle in polygons], toolSize / 2)
+        
+    def VerticalAt(self, coords):
         """
         Helper function to define if a polygon starts by traveling vertically
 
         Args:
-            x: point to compare
-            polygon: polygon to test verticalness at lower bound
+            coords (np.array): (n, 2) closed exterior of the polygon to test verticalness at lower bound
 
         Returns: 
             Bool descibing if rectangle starts vertically
         """
         tolerance = 0.01
-        coords = list(polygon.exterior.coords)
-        occurrences = [i for i, point in enumerate(coords) if abs(point[0] - polygon.bounds[0]) < tolerance]
-        
-        # is not strait line becuase only one point
-        if len(occurrences) < 2:
-            return False
+        occurrences = np.flatnonzero(np.abs(coords[:, 0] - coords[:, 0].min()) < tolerance)
         
-        # checking if they are next to eachother
-        for i in range(len(occurrences) - 1):
-            if abs(occurrences[i] - occurrences[i+1]) == 1:
-                return True
-        
-        return False
+        # is not strait line becuase only one point, otherwise checking if two are next to eachother
+        return bool(np.any(np.diff(occurrences) == 1))
     
     def RotateForLongestEdge(self, polygon):
         """
@@ -44,132 +64,194 @@ class RectangleFactory():
             polygon (Shapely::Polygon)
 
         Returns: 
-            A roated copy of a Shapely::Polygon
-            The angle of rotation
-            The translation needed to get the lowest left corner to (0,0)
+            (n, 2) np.array of the exterior in the field's local frame
+            Frame of the rotation and the translation needed to get the lowest point to y = 0
         """
-        longest_edge = None
-        max_length = 0
-
-        for i in range(len(polygon.exterior.coords) - 1):
-            p1 = polygon.exterior.coords[i]
-            p2 = polygon.exterior.coords[i + 1]
-            edge = LineString([p1, p2])
-            length = edge.length
-
-            if length > max_length:
-                max_length = length
-                longest_edge = edge
-
-        dx = longest_edge.coords[1][0] - longest_edge.coords[0][0]
-        dy = longest_edge.coords[1][1] - longest_edge.coords[0][1]
-        angle = np.math.atan2(dy, dx)
-        
-        rotatedAngle = np.pi / 2 - angle
+        world = np.array(polygon.exterior.coords, dtype=float)
+        origin = polygon.centroid.coords[0]
         
-        initalRotate = affinity.rotate(polygon, rotatedAngle, use_radians=True, origin=polygon.centroid)
+        # the first of the longest edges, same as walking them and keeping a strictly longer one
+        dx, dy = np.diff(world, axis=0).T
+        longest = np.argmax(np.hypot(dx, dy))
+        rotatedAngle = np.pi / 2 - np.arctan2(dy[longest], dx[longest])
         
-        if not self.VerticalAt(initalRotate):
-            initalRotate = affinity.rotate(initalRotate, np.pi, use_radians=True, origin=polygon.centroid)
+        coords = Frame(rotatedAngle, origin, 0).Forward(world.copy())
+        if not self.VerticalAt(coords):
             rotatedAngle += np.pi
         
-        # Gets minimum y distance so can translate into +x
-        min_y = initalRotate.bounds[1]
+        return self.__ToLocal(world, rotatedAngle, origin)
+    
+    def RotateByAngle(self, polygon, angle):
+        """
+        Rotates Polygon by a chosen angle instead of the longest edge, for sweeping in any direction.
+
+        Args:
+            polygon (Shapely::Polygon)
+            angle (float): radians to rotate about the centroid
+
+        Returns: 
+            (n, 2) np.array of the exterior in the field's local frame
+            Frame of the rotation and the translation needed to get the lowest point to y = 0
+        """
+        world = np.array(polygon.exterior.coords, dtype=float)
         
-        if min_y >= 0:
-            translated = 0
-        else:
-            translated = -min_y
-            initalRotate = affinity.translate(initalRotate, yoff=translated)
-            
-        return initalRotate, rotatedAngle, translated
+        return self.__ToLocal(world, angle, polygon.centroid.coords[0])
     
     def ContourToPoints(self, contour):
+        """
+        Args:
+            contour: x's and y's of a contour, e.g. Shapely::LinearRing.xy or a (2, n) np.array
+
+        Returns:
+            [[x1,y1], [x2,y2], ...] starting from the first point with the smallest x
+        """
+        x = np.asarray(contour[0], dtype=float)
+        y = np.asarray(contour[1], dtype=float)
         
         # A contour starts and ends at the same point, want to remove it if that is was is passed in
-        contour = list(contour)
-        if contour[0][0] == contour[0][-1]:
-            contour[0].pop()
-            contour[1].pop()
-            
-        points = [[x, y] for x, y in zip(contour[0], contour[1])]
-        minIndexX = points.index(min(points, key=lambda p: p[0]))
+        if x[0] == x[-1]:
+            x, y = x[:-1], y[:-1]
+        
         # Sorting so that min x point is used
-        return points[minIndexX:] + points[:minIndexX]
+        return np.roll(np.column_stack((x, y)), -np.argmin(x), axis=0).tolist()
+    
+    def ColumnPositions(self, minX, maxX, toolSize):
+        """
+        Positions of the sweep columns, starting at minX and stepping by toolSize while below maxX.
+        The steps are accumulated (not multiplied) so every column lands on the same float as
+        repeatedly doing x += toolSize.
+
+        Args:
+            minX (float): first column
+            maxX (float): columns stop before this
+            toolSize (float): spacing of the columns
+
+        Returns: 
+            np.array of column x's, ascending
+        """
+        count = int(np.ceil((maxX - minX) / toolSize)) + 1
+        columns = np.add.accumulate(np.concatenate(([minX], np.full(count, toolSize))))
+        
+        return columns[columns < maxX]
+    
+    def ScanlineIntersections(self, contour, columns, minY, maxY):
+        """
+        Intersects every edge of a contour with every sweep column in one batched pass.
+
+        Args:
+            contour (np.array): closed contour of shape (n, 2), first point repeated at the end
+            columns (np.array): x of each column, ascending
+            minY (float): bottom of the columns
+            maxY (float): top of the columns
+
+        Returns: 
+            Index of the edge each intersection lies on, and the intersections as a (m, 2) array.
+            The intersections on an edge are ordered by decreasing column.
+        """
+        start = contour[:-1]
+        end = contour[1:]
+        lo = np.minimum(start[:, 0], end[:, 0])
+        hi = np.maximum(start[:, 0], end[:, 0])
+        
+        # only a column strictly inside an edge crosses it, touching at a vertex is not a crossing.
+        # vertical edges never get a column this way, same as the old contains check
+        first = np.searchsorted(columns, lo, side='right')
+        last = np.searchsorted(columns, hi, side='left')
+        counts = np.maximum(last - first, 0)
+        
+        edges = np.repeat(np.arange(len(start)), counts)
+        within = np.arange(len(edges)) - np.repeat(np.cumsum(counts) - counts, counts)
+        x = columns[last[edges] - 1 - within]
+        
+        x0, y0 = start[edges, 0], start[edges, 1]
+        x1, y1 = end[edges, 0], end[edges, 1]
+        y = y0 + (x - x0) * (y1 - y0) / (x1 - x0)
+        
+        # a crossing on the very end of a column still bounds it, e.g. a horizontal edge along the bottom of the field
+        keep = (y >= minY) & (y <= maxY)
+        
+        return edges[keep], np.column_stack((x[keep], y[keep]))
     
-    def FillLines(self, points, toolSize):
+    def FillLines(self, points, toolSize, columns = None):
         """
-        Fills a set of lines with many points for animation later.
+        Fills a set of lines with many points for animation later. Every edge gets a point
+        where it crosses each sweep column, inserted after the start of that edge.
 
         Args:
             points ([[x1,y1], [x2,y2], ...])
+            toolSize (float): spacing of the sweep columns
+            columns (np.array): x of the sweep columns, to share them with another polygon, from the smallest x by default
 
         Returns: 
-            Map of Shapely::Linstring to the points contained in that linestring.
-            *right now a list, maybe should be a map but unsure what is more efficient.
+            [[x1,y1], [x2,y2], ...] with the crossings merged into the contour
         """
         # ensuring that we have a complete contour
         if points[0] != points[-1]:
             points.append(points[0])
+        
+        contour = np.asarray(points, dtype=float)
+        minX, minY = contour.min(axis=0)
+        maxX, maxY = contour.max(axis=0)
+        
+        if columns is None:
+            columns = self.ColumnPositions(minX, maxX + toolSize, toolSize)
+        edges, crossings = self.ScanlineIntersections(contour, columns, minY, maxY)
+        
+        # vertex i comes before the crossings on edge i, a stable sort keeps the rest in order
+        keys = np.concatenate((np.arange(len(contour)), edges))
+        order = np.argsort(keys, kind='stable')
+        merged = np.concatenate((contour, crossings))[order]
+        
+        # a crossing that lands on a vertex is the same point, only one of them is kept
+        repeated = np.concatenate(([False], np.all(merged[1:] == merged[:-1], axis=1)))
+        
+        return merged[~repeated].tolist()
 
-        # Doing this right now for the MultiLineString API
-        lineList = [LineString([points[i], points[i+1]]) for i in range(len(points)-1)]
-        
-        # lets see if this works
-        relativeMap = [i for i in range(len(lineList))]
-        
-        minX = min(points, key=lambda p: p[0])[0]
-        maxX = max(points, key=lambda p: p[0])[0] + toolSize
-        minY = min(points, key=lambda p: p[1])[1]
-        maxY = max(points, key=lambda p: p[1])[1]
-        
-        x = minX
-        
-        # yes, super inefficent
-        while x < maxX:
-            
-            # making this line very high, should just do max height and min height
-            line_string = LineString([[x, minY], [x, maxY]])
-            
-            for index, line in enumerate(lineList):
-                # check if it crosses and if it is the same line
-                if line.crosses(line_string) and not line_string.contains(line):
-                    # therefore there is only one intersection
-                    intersection = line.intersection(line_string)
-                    
-                    if intersection not in points:
-                        
-                        # finally insert the point
-                        points.insert(relativeMap[index]+1, [intersection.x, intersection.y])
-                        
-                        # update the map
-                        for i in range(index+1, len(relativeMap)):
-                            relativeMap[i] += 1
-                                
-            x += toolSize    
-                
-        return points
-
-    def DefineRect(self, point, x, toolSize):
-        """
-        Helper function to define if a point should be in the created rectangle.
+    def ColumnBounds(self, points, toolSize, edges = None):
+        """
+        Bounds of the rectangles BuildRectsFromPoints makes, without making them.
+        Points are binned into toolSize wide columns starting at the smallest x, a point on the
+        line between two columns belongs to both of them.
 
         Args:
-            point: ([x1,y1])
-            x: point to compare
-            toolSize: Size of rectangle
+            point: ([[x1,y1], [x2,y2], ...])
+            toolSize: Width of rectangle
+            edges (np.array): left of every column, the columns FillLines was given
 
         Returns: 
-            Bool descibing if point shoul dbe in rectangle
+            (n, 4) np.array of minX, minY, maxX, maxY of each rectangle, left to right
         """
-        if point[0] <= (x + toolSize):
-            return True
-        else:
-            return False
+        points = np.asarray(points, dtype=float)
+        x, y = points[:, 0], points[:, 1]
+        
+        # same accumulated columns that FillLines put its crossings on
+        if edges is None:
+            edges = self.ColumnPositions(x.min(), x.max() + toolSize, toolSize)
+        column = np.searchsorted(edges, x, side='right') - 1
+        
+        shared = (column > 0) & (x == edges[column])
+        column = np.concatenate((column, column[shared] - 1))
+        x = np.concatenate((x, x[shared]))
+        y = np.concatenate((y, y[shared]))
         
+        order = np.argsort(column, kind='stable')
+        column, x, y = column[order], x[order], y[order]
+        
+        starts = np.flatnonzero(np.diff(column, prepend=-1))
+        yMin = np.minimum.reduceat(y, starts)
+        yMax = np.maximum.reduceat(y, starts)
+        xMax = np.maximum.reduceat(x, starts)
+        left = edges[column[starts]]
+        
+        # crossings on a column's right edge are in it too, so a column with only points on its left edge
+        # is past the field and has nothing to cover
+        keep = xMax > left
+        
+        return np.column_stack((left[keep], yMin[keep], left[keep] + toolSize, yMax[keep]))
+
     def BuildRectsFromPoints(self, points, toolSize):
         """
-        Given a set of points, construct rectangles that are of width of the given toolSize
+        Given a set of points, construct rectangles that are of width of the given toolSize.
 
         Args:
             point: ([[x1,y1], [x2,y2], ...])
@@ -178,49 +260,53 @@ class RectangleFactory():
         Returns: 
             Rectangles that descibe the points
         """
-        rects = []
-        points.sort(key = lambda x: x[0])
-        
-        while len(points):
-            x = points[0][0]
-            r = []
-
-            # All the points within a certain x + distance
-            pointsInRange = [point for point in points if self.DefineRect(point, x, toolSize)]
-
-            # Checking if any points greater than x, don't need to make an empty rect if only one point
-            xplusPointTest = [point for point in pointsInRange if point[0] > (x)]
-            if len(xplusPointTest) == 0:
-                break 
-
-            y_min = min([r[1] for r in pointsInRange])
-            y_max = max([r[1] for r in pointsInRange])
-
-            points = [point for point in points if point[0] >= (x + toolSize)]
-
-            rects.append(box(x, y_min, x+toolSize, y_max, ccw = True))
-            
-        return rects
+        return [box(*bounds, ccw = True) for bounds in self.ColumnBounds(points, toolSize)]
         
-    def CreateRects(self, polygon, toolSize):
+    def CreateRects(self, polygon, toolSize, angle = None):
         """Constructs a set of rectangles that best describe a complex Polygon
 
         Args:
             polygon (Shapely::Polygon): collection of points describing the outline of an area
             toolSize (float): thickness of the tool; how large the rectangles can be
+            angle (float): radians to rotate the polygon by, defaults to making the longest edge vertical
 
-        Returns: Shapely::MultiPolygon
+        Returns: Shapely::MultiPolygon in the field's local frame, and the Frame to get back to the world
         """
         polygons = []
-        centroid = polygon.centroid
         
         # Rotating the polygon so that the longest edge is vertical
-        polygon, angle, translation = self.RotateForLongestEdge(polygon)
-        contour = polygon.exterior.coords.xy
+        if angle is None:
+            with Stage('RotateForLongestEdge'):
+                coords, frame = self.RotateForLongestEdge(polygon)
+        else:
+            with Stage('RotateByAngle'):
+                coords, frame = self.RotateByAngle(polygon, angle)
+        contour = coords.T
+        
+        with Stage('FillLines'):
+            points = self.FillLines(self.ContourToPoints(contour), toolSize)
+        with Stage('BuildRectsFromPoints'):
+            polygons = self.BuildRectsFromPoints(points, toolSize)
+        
+        Count('densifiedPoints', len(points))
+        Count('rectangles', len(polygons))
         
-        points = self.FillLines(self.ContourToPoints(contour), toolSize)
-        polygons = self.BuildRectsFromPoints(points, toolSize)
+        if not polygons:
+            raise ValueError('polygon has no area wider than a column to plan')
 
-        # return affinity.rotate(MultiPolygon(polygons), -angle, centroid, use_radians=True)
-        # lets carry the angle of rotation to later for similicity, yes we can;t make this simple then
-        return MultiPolygon(polygons), centroid, angle, translation
\ No newline at end of file
+        # everything is planned in the local frame, the frame takes it back to the world when it is wanted
+        return MultiPolygon(polygons), frame
+    
+    def __ToLocal(self, world, angle, origin):
+        """
+        Moves an exterior into the local frame, rotated by angle and then up so its lowest point is at y = 0
+        """
+        coords = Frame(angle, origin, 0).Forward(world.copy())
+        
+        # Gets minimum y distance so can translate into +x
+        minY = coords[:, 1].min()
+        translated = 0 if minY >= 0 else -minY
+        
+        frame = Frame(angle, origin, translated)
+        
+        return frame.Forward(world), frame
\ No newline at end of file
@@ -0,0 +1,200 @@
+# Library
+import numpy as np
+from shapely.geometry import MultiPolygon, box
+
+# Local
+from Instrumentation import Stage, Count
+from PathArray import PathArray, PASS
+from Rectangles import RectangleFactory
+from ToolPath import ToolPath
+
+# Keeps a plan around so it can be changed without starting again, for edits made from the cab.
+# The frame of the first plan is kept so the columns stay where they are, an edit to the boundary only
+# re-plans the passes whose rectangles changed and splices them into the path, and a stop part way
+# through only needs the rest of the path already planned.
+class Replanner():
+    def __init__(self, polygon, toolSize, toolLength, pointsInEachPath, angle = None, obstacles = None):
+        """
+        Args:
+            polygon (Shapely::Polygon): field to plan
+            toolSize (float): Width of rectangle
+            toolLength (float): length of trailing object
+            pointsInEachPath (int): points to be in each seperate path object
+            angle (float): radians to rotate the polygon by, defaults to making the longest edge vertical
+            obstacles (list of Shapely::Polygon): other obstacles in world coordinates, see RectangleFactory
+        """
+        self.toolSize = toolSize
+        self.toolLength = toolLength
+        self.pointsInEachPath = pointsInEachPath
+        self.extraObstacles = obstacles
+
+        self.factory = RectangleFactory(polygon, toolSize, angle, obstacles)
+        self.frame = self.factory.frame
+        self.polygon = polygon
+        self.bounds = self.Columns(polygon)
+        self.obstacles = self.factory.obstacles
+
+        toolPath = ToolPath(toolSize, toolLength, self.bounds, pointsInEachPath, obstacles = self.obstacles)
+        self.path = toolPath.array
+        self.Index()
+
+        self._rectangles = None
+
+    @property
+    def rectangles(self):
+        """
+        Shapely::MultiPolygon of the rectangles in the local frame, only built the first time it is asked for
+        """
+        if self._rectangles is None:
+            self._rectangles = MultiPolygon([box(*bound, ccw = True) for bound in self.bounds])
+
+        return self._rectangles
+
+    def Index(self):
+        """
+        Where each pass starts in the path, the points of pass i are self.path.data[splits[i]:splits[i + 1]].
+        """
+        self.splits = np.searchsorted(self.path.passIndex, np.arange(len(self.bounds) + 1))
+
+    def Columns(self, polygon):
+        """
+        Bounds of the rectangles of a polygon in the kept frame, the same as RectangleFactory would make.
+
+        Returns:
+            (n, 4) np.array
+        """
+        coords = self.frame.Forward(np.array(polygon.exterior.coords, dtype=float))
+        points = self.factory.FillLines(self.factory.ContourToPoints(coords.T), self.toolSize)
+
+        return self.factory.ColumnBounds(points, self.toolSize)
+
+    def Edit(self, polygon, done = 0):
+        """
+        Re-plans after the boundary or its holes have been edited. Only the passes whose rectangles changed,
+        and the pass after them that turns in from the last one, are planned again. Each pass carries the
+        turn into it and a turn only depends on the two passes it joins, so the turns from the kept passes
+        into the re-planned ones and back out are solved again with them and the result is the same as
+        planning the whole field.
+
+        Args:
+            polygon (Shapely::Polygon): edited field
+            done (int): passes already driven, they are left as they are
+
+        Returns:
+            (first, last) passes that were planned again, last not included
+        """
+        with Stage('Replan'):
+            bounds = self.Columns(polygon)
+
+            obstacles = self.obstacles
+            holes = [ring.coords[:] for ring in polygon.interiors]
+            if holes != [ring.coords[:] for ring in self.polygon.interiors]:
+                obstacles = self.factory.LocalObstacles(polygon, self.extraObstacles, self.toolSize)
+
+            first, last = self.Changed(self.bounds, bounds, self.obstacles, obstacles)
+            first = max(first, done)
+
+            if first < last:
+                toolPath = ToolPath(self.toolSize, self.toolLength, bounds, self.pointsInEachPath, stream = True, obstacles = obstacles)
+                block, _ = toolPath.PlanPasses(self.toolSize, self.toolLength, bounds, self.pointsInEachPath, first, last)
+
+                tail = self.path.data[self.splits[last]:] if last < len(bounds) else self.path.data[:0]
+                self.path = PathArray(np.concatenate((self.path.data[:self.splits[first]], block.data, tail)))
+            else:
+                first = last = 0
+
+            self.polygon = polygon
+            self.bounds = bounds
+            self.obstacles = obstacles
+            self._rectangles = None
+            self.Index()
+
+        Count('passesReplanned', last - first)
+
+        return first, last
+
+    def Changed(self, old, new, oldObstacles, newObstacles):
+        """
+        Passes that need planning again between two sets of rectangle bounds.
+        The columns all move if the first one does, and the passes after a column that appears or
+        disappears all change direction, so both re-plan everything from there on.
+
+        Returns:
+            (first, last) passes, last not included
+        """
+        count = min(len(old), len(new))
+        if count == 0 or old[0, 0] != new[0, 0]:
+            return 0, len(new)
+
+        changed = np.flatnonzero(np.any(old[:count] != new[:count], axis=1))
+        if len(old) != len(new):
+            return int(min(changed.min(initial = count), count)), len(new)
+
+        # only the holes that moved change the passes that go near where they were or are now
+        for zone in self.Moved(oldObstacles, newObstacles):
+            minX, _, maxX, _ = zone.bounds
+            changed = np.append(changed, np.flatnonzero((new[:, 2] >= minX) & (new[:, 0] <= maxX)))
+
+        if len(changed) == 0:
+            return 0, 0
+
+        # the pass after the last change turns in from it
+        return int(changed.min()), min(int(changed.max()) + 2, len(new))
+
+    def Moved(self, oldObstacles, newObstacles):
+        """
+        Zones that are only in one of the two sets, the ones that were added, removed or moved.
+
+        Returns:
+            list of Shapely::Polygon
+        """
+        if oldObstacles is newObstacles:
+            return []
+
+        old = oldObstacles.zones if oldObstacles is not None else []
+        new = newObstacles.zones if newObstacles is not None else []
+        oldKeys = {zone.wkb for zone in old}
+        newKeys = {zone.wkb for zone in new}
+
+        return [zone for zone in old if zone.wkb not in newKeys] + [zone for zone in new if zone.wkb not in oldKeys]
+
+    def Resume(self, passIndex, position = None):
+        """
+        The rest of the path from a progress marker, nothing is planned again.
+
+        Args:
+            passIndex (int): pass being driven
+            position ((x, y)): where the tractor stopped in world coordinates, the start of the pass if not given
+
+        Returns:
+            PathArray in world coordinates
+        """
+        rows = self.path.data[self.splits[passIndex]:].copy()
+
+        if position is not None:
+            here = self.frame.Forward(np.array([position], dtype=float))[0]
+            driving = rows[:self.splits[passIndex + 1] - self.splits[passIndex]]
+            working = np.flatnonzero(driving['kind'] == PASS)
+            if len(working) == 0:
+                working = np.arange(len(driving))
+
+            # carries on from the closest point of the pass itself, not its lead in or turn, the position is the first point
+            nearest = working[np.argmin(np.hypot(driving['x'][working] - here[0], driving['y'][working] - here[1]))]
+            rows = rows[nearest:]
+            rows['x'][0], rows['y'][0] = here
+            rows['kind'][0] = PASS
+
+        path = PathArray(rows)
+        self.frame.Inverse(path.coords)
+
+        return path
+
+    @property
+    def array(self):
+        """
+        PathArray of the whole path in world coordinates
+        """
+        path = PathArray(self.path.data.copy())
+        self.frame.Inverse(path.coords)
+
+        return path
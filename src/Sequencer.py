@@ -0,0 +1,204 @@
+# Library
+import numpy as np
+
+# Local
+from Instrumentation import Stage, Count
+from PathArray import PASS
+from ToolPath import ToolPath, TURN_UNSOLVED
+
+# Points each turn is drawn with to measure it
+TURN_POINTS = 32
+
+# Chooses the order the passes are driven in. Driving them strictly left to right puts every turn between
+# neighbouring passes, which are closer than the machine can turn and need slow bulb shaped turns.
+# Skipping rows lets most turns be plain U turns instead.
+class Sequencer():
+    def __init__(self, rectangles, turningRadius, maxSkip = None, toolLength = 0):
+        """
+        Args:
+            rectangles (shapely::MultiPolygon): set of vertical rectangles, one per pass, left to right
+            turningRadius (float): tightest circle the machine can drive
+            maxSkip (int): largest skip-row pattern tried, defaults to enough to clear two turning radii
+            toolLength (float): length of trailing object, the lead in before every turn
+        """
+        self.bounds = np.array([rect.bounds for rect in rectangles.geoms], dtype=float).reshape(-1, 4)
+        self.x = (self.bounds[:, 0] + self.bounds[:, 2]) / 2
+        self.bottoms = self.bounds[:, 1]
+        self.tops = self.bounds[:, 3]
+        self.turningRadius = turningRadius
+        self.toolSize = float(np.median(self.bounds[:, 2] - self.bounds[:, 0])) if len(self.bounds) else 1.0
+        self.toolLength = toolLength
+
+        if maxSkip is None:
+            width = np.median(np.diff(self.x)) if len(self.x) > 1 else 1.0
+            maxSkip = int(np.ceil(2 * turningRadius / width)) + 1
+        self.maxSkip = max(1, min(maxSkip, len(self.x)))
+
+        self.cost = None
+        self.baseline = None
+        self.tight = None
+        self._costs = None
+
+    def TurnLength(self, dx, dy):
+        """
+        Length of the turns between passes dx apart whose ends are dy apart. Passes at least two
+        turning radii apart are joined by a U turn, closer ones by an omega turn that swings out
+        the other way first (Bochtis & Vougioukas 2008).
+
+        Args:
+            dx (np.array): distance between the passes
+            dy (np.array): difference in height of their ends
+
+        Returns:
+            np.array of lengths, same shape as dx
+        """
+        r = self.turningRadius
+        dx = np.asarray(dx, dtype=float)
+        if r <= 0:
+            return dx + dy
+
+        u = np.pi * r + dx - 2 * r
+        omega = r * (3 * np.pi - 2 * np.arccos(np.clip(1 - (2 * r + dx)**2 / (8 * r**2), -1, 1)))
+
+        return np.where(dx >= 2 * r, u, omega) + dy
+
+    @property
+    def costs(self):
+        """
+        (2, n, n) cost of turning from the end of pass i to the start of pass j, first over the tops
+        of the passes and then under the bottoms. A pass can't follow itself.
+        """
+        if self._costs is None:
+            dx = np.abs(self.x[:, None] - self.x[None, :])
+            self._costs = np.stack((self.TurnLength(dx, np.abs(self.tops[:, None] - self.tops[None, :])),
+                                    self.TurnLength(dx, np.abs(self.bottoms[:, None] - self.bottoms[None, :]))))
+            np.einsum('kii->ki', self._costs)[:] = np.inf
+
+        return self._costs
+
+    def Cost(self, order):
+        """
+        Total turning of driving the passes in an order, the first one upwards.
+
+        Args:
+            order (np.array): every pass once
+
+        Returns:
+            float
+        """
+        order = np.asarray(order)
+        if len(order) < 2:
+            return 0.0
+
+        # after an upwards pass the turn is over the tops
+        ends = np.arange(len(order) - 1) % 2
+
+        return float(self.costs[ends, order[:-1], order[1:]].sum())
+
+    def SkipRows(self, skip):
+        """
+        Alternating blocks of 2 * skip passes, going out skip passes and back skip - 1 each turn:
+        0, skip, 1, skip + 1, ... The passes left over after the last whole block are driven in order.
+
+        Args:
+            skip (int): passes to go across on the way out, 1 is plain left to right
+
+        Returns:
+            np.array order of the passes
+        """
+        n = len(self.x)
+        index = np.arange(n)
+        block, within = np.divmod(index, 2 * skip)
+        order = block * 2 * skip + within // 2 + (within % 2) * skip
+
+        whole = (n // (2 * skip)) * 2 * skip
+        order[whole:] = index[whole:]
+
+        return order
+
+    def Greedy(self, start):
+        """
+        Nearest neighbour from one pass, always turning to the cheapest pass not driven yet.
+
+        Args:
+            start (int): first pass
+
+        Returns:
+            np.array order of the passes
+        """
+        n = len(self.x)
+        costs = self.costs
+        left = np.ones(n, dtype=bool)
+        order = np.empty(n, dtype=int)
+        order[0] = start
+        left[start] = False
+
+        for k in range(1, n):
+            row = np.where(left, costs[(k - 1) % 2, order[k - 1]], np.inf)
+            order[k] = np.argmin(row)
+            left[order[k]] = False
+
+        return order
+
+    def Driven(self, order):
+        """
+        What driving the passes in an order really costs, measured on the lead ins and turns ToolPath draws
+        rather than the U and omega turns the cost matrix is built from. ToolPath doesn't know the turning
+        radius, so a drawn turn tighter than it can't be driven as it is and is charged the turn of the cost
+        matrix the machine would drive instead.
+
+        Args:
+            order (np.array): every pass once
+
+        Returns:
+            length of everything between the passes, and the number of drawn turns tighter than the turning radius
+        """
+        n = len(order)
+        toolPath = ToolPath(self.toolSize, self.toolLength, self.bounds, TURN_POINTS, stream = True, order = order)
+        path, turns = toolPath.PassRows(self.toolSize, self.toolLength, self.bounds, TURN_POINTS, 0, n)
+
+        # the rows between passes belong to the pass they lead into, which is one after the turn
+        steps = np.hypot(np.diff(path.x), np.diff(path.y))
+        between = path.kind[:-1] != PASS
+        drawn = np.bincount(path.passIndex[:-1][between], weights = steps[between], minlength = n)[1:]
+
+        # radius of curvature of each beizer curve from its derivatives
+        p0, p1, p2, p3 = (turns.controls[:, i, None, :] for i in range(4))
+        t = np.linspace(0, 1, TURN_POINTS)[None, :, None]
+        d1 = 3 * ((1-t)**2 * (p1 - p0) + 2 * (1-t) * t * (p2 - p1) + t**2 * (p3 - p2))
+        d2 = 6 * ((1-t) * (p2 - 2 * p1 + p0) + t * (p3 - 2 * p2 + p1))
+        bend = np.abs(d1[..., 0] * d2[..., 1] - d1[..., 1] * d2[..., 0])
+        radius = np.hypot(d1[..., 0], d1[..., 1])**3 / np.maximum(bend, 1e-12)
+        tight = (radius.min(axis=1) < self.turningRadius) & (turns.status != TURN_UNSOLVED)
+
+        model = self.costs[np.arange(n - 1) % 2, order[:-1], order[1:]] + self.toolLength
+        length = np.where(tight, np.maximum(drawn, model), drawn)
+
+        return float(length.sum()), int(np.count_nonzero(tight))
+
+    def Order(self):
+        """
+        Skip-row patterns and nearest neighbour tours, each started from either side of the field, are made
+        with the cost matrix, and the one that is shortest to drive by Driven is kept. Left to right is one
+        of them, so the order kept is never longer to drive than it.
+
+        Returns:
+            np.array of pass indexes in the order they are driven
+        """
+        n = len(self.x)
+        if n < 3:
+            return np.arange(n)
+
+        with Stage('SequencePasses'):
+            candidates = [self.SkipRows(skip) for skip in range(1, self.maxSkip + 1)]
+            candidates += [self.Greedy(0), self.Greedy(n - 1)]
+            candidates += [(n - 1) - order for order in candidates[:self.maxSkip]]
+
+            driven = [self.Driven(order) for order in candidates]
+            best = min(range(len(candidates)), key = lambda i: driven[i][0])
+
+        Count('sequenceCandidates', len(candidates))
+        self.cost, self.tight = driven[best]
+        self.baseline = driven[0][0]
+
+        return candidates[best]
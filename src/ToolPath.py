@@ -1,26 +1,112 @@
 # Library
 import numpy as np
-from shapely.geometry import LineString
+from collections import namedtuple
+
+# Local
+from Instrumentation import Stage, Count, Enabled
+from PathArray import PathArray, PASS, TURN, LEAD_IN, TRANSIT
+
+# How a turn was solved
+TURN_OK = 0         # the starting control point already goes over the rectangle
+TURN_RAISED = 1     # p1 had to be raised to go over the rectangle
+TURN_CLEAR = 2      # the curve starts above the rectangle, used to be "the first box is taller than the second"
+TURN_UNSOLVED = 3   # the passes are closer than the tolerance, nothing to go around
+TURN_BLOCKED = 4    # the curve runs into an obstacle
+
+# t's checked between the start of a curve and where it would hit the rectangle
+TURN_SAMPLES = 64
+
+# height of p1 and p2 over the ends of a turn for each unit it goes across, close to a half circle
+TURN_HEIGHT = 2 / 3
+
+# Control points of a batch of beizer curves (n, 4, 2), whether each was constructed backwards,
+# how it was solved and how far p1 sits from p0
+TurnSolution = namedtuple('TurnSolution', ['controls', 'reverse', 'status', 'offset'])
 
 class ToolPath():
-    def __init__(self, toolSize, toolLength, rectangles, pointsInEachPath):
+    def __init__(self, toolSize, toolLength, rectangles, pointsInEachPath, stream = False, obstacles = None,
+                 maxSpacing = None, chordTolerance = None, order = None, templates = None):
         """
         Constructs a tool path given a set of rectangles.
+        Giving maxSpacing or chordTolerance samples the path adaptively instead of pointsInEachPath
+        points on everything, straight lines only get their ends and turns only as many points as they bend.
 
         Args:
             toolSize (float): Width of rectangle
             toolLength (float): length of trailing object
-            rectangles (shapely::MultiPolygon): set of vertical rectangles that the toolpath with descibe
+            rectangles (shapely::MultiPolygon): set of vertical rectangles that the toolpath with descibe,
+                or an (n, 4) np.array of their bounds
             pointsInEachPath (int): points to be in each seperate path object
+            stream (bool): don't plan anything up front, the path is read pass by pass with Segments()
+            obstacles (Obstacles): obstacles in the same frame as the rectangles, from RectangleFactory.obstacles
+            maxSpacing (float): longest gap between points on the passes and lead ins when sampling adaptively
+            chordTolerance (float): furthest a turn is allowed from the straight lines between its points,
+                defaults to a hundredth of the toolSize when sampling adaptively
+            order (np.array): rectangle driven in each pass e.g. from Sequencer.Order(), defaults to left to right
+            templates (TurnTemplates): turns already solved, shared between paths, None solves every turn
 
         Returns: 
             tool path that follows the rectangles
         """
-        self.min_x, self.min_y, self.max_x, self.max_y = rectangles.bounds
+        self.bounds = self.RectangleBounds(rectangles)
+        self.min_x, self.min_y = self.bounds[:, :2].min(axis=0)
+        self.max_x, self.max_y = self.bounds[:, 2:].max(axis=0)
         self.normalizedPts = int(np.ceil(toolLength / ((self.max_y - self.min_y) / pointsInEachPath)))
         
-        self.path = self.CreatePath(toolSize, toolLength, rectangles, pointsInEachPath)
+        self.toolSize = toolSize
+        self.toolLength = toolLength
+        self.rectangles = rectangles
+        self.pointsInEachPath = pointsInEachPath
+        self.obstacles = obstacles if obstacles is not None and len(obstacles) else None
+        self.adaptive = maxSpacing is not None or chordTolerance is not None
+        self.maxSpacing = maxSpacing
+        self.chordTolerance = chordTolerance if chordTolerance is not None else toolSize / 100
+        self.templates = templates
+        self.order = np.arange(len(self.bounds)) if order is None else np.asarray(order, dtype=int)
+        
+        # only turns that skip passes need to look at the ones in between
+        self.skips = bool(np.any(np.abs(np.diff(self.order)) > 1))
         
+        self._array = None
+        self._lineString = None
+        if not stream:
+            self._array = self.CreatePath(toolSize, toolLength, rectangles, pointsInEachPath)
+    
+    @property
+    def array(self):
+        """
+        PathArray of the whole path, planned the first time it is asked for when streaming
+        """
+        if self._array is None:
+            self._array = self.CreatePath(self.toolSize, self.toolLength, self.rectangles, self.pointsInEachPath)
+        
+        return self._array
+    
+    @property
+    def path(self):
+        """
+        Shapely::LineString of the path, only built the first time it is asked for
+        """
+        if self._lineString is None:
+            self._lineString = self.array.ToLineString()
+        
+        return self._lineString
+        
+    def RectangleBounds(self, rectangles):
+        """
+        Bounds of every rectangle, the rectangles are only looked at once.
+
+        Args:
+            rectangles (shapely::MultiPolygon or np.array): rectangles or their (n, 4) bounds
+
+        Returns: 
+            (n, 4) np.array of minX, minY, maxX, maxY
+        """
+        if isinstance(rectangles, np.ndarray):
+            return np.asarray(rectangles, dtype=float).reshape(-1, 4)
+        
+        return np.array([rect.bounds for rect in rectangles.geoms], dtype=float).reshape(-1, 4)
+    
     def GetMidLinePointsFrom(self, shape):
         """
         Returns a line bisecting a rectangle.
@@ -42,7 +128,8 @@ class ToolPath():
     def InterpolatePoints(self, startPt, endPt, num):
         """
         Given a start and end point, creates a set of points linearly between them.
-        Does not include the starting point in line
+        Does not include the starting point in line. Also takes (n, 2) arrays of start and
+        end points to interpolate many lines at once, each gets the same points it would alone.
         
         Args:
             startPt (x,y)
@@ -50,15 +137,202 @@ class ToolPath():
             num (int): number of points to add
 
         Returns: 
-            [[x1, y1], ... [endPtX, endPtY]]
+            [[x1, y1], ... [endPtX, endPtY]], or (n, num, 2) for arrays of points
         """
-        x = np.linspace(startPt[0], endPt[0], num+1)
-        y = np.linspace(startPt[1], endPt[1], num+1)
+        startPt = np.asarray(startPt, dtype=float)[..., None, :]
+        endPt = np.asarray(endPt, dtype=float)[..., None, :]
+        fraction = (np.arange(1, num + 1) / num)[:, None]
+        
+        points = startPt + fraction * (endPt - startPt)
+        points[..., -1, :] = endPt[..., 0, :]
         
-        x = x[1:]
-        y = y[1:]
+        return points
+    
+    def BernsteinBasis(self, numPoints):
+        """
+        Cubic bernstein polynomials evaluated at the t's a curve is drawn with.
+
+        Args:
+            numPoints (int): points to be in a curve
+
+        Returns: 
+            (numPoints, 4) array, one column per control point
+        """
+        t = np.arange(numPoints) / numPoints
         
-        return np.column_stack((x, y))
+        return np.column_stack(((1-t)**3, 3*(1-t)**2 * t, 3*(1-t) * t**2, t**3))
+    
+    def SolveTurns(self, ends, starts, up, toolSize, toolLength, beyond = None):
+        """
+        Finds the control points of the beizer curves connecting the end of each pass to the start of
+        the next one, for every turn at once.
+        
+        p1 and p2 sit straight above p0 and p3, so the x of a curve only depends on t and the t where
+        the curve gets too close to the corner of the rectangle it goes around is known up front.
+        The height of p1 needed to be over the corner by then is linear, so it is solved for directly.
+        p1 and p2 start TURN_HEIGHT of the way across the turn above the ends, so a turn has the same
+        shape whatever field it is in, rather than growing with how wide the field is for its height.
+
+        Args:
+            ends (np.array): (n, 2) last point of each pass
+            starts (np.array): (n, 2) first point of the pass after it
+            up (np.array): (n,) whether each curve faces upwards or downwards
+            toolSize (float): Width of rectangle
+            toolLength (float): length of trailing object
+            beyond (np.array): (n,) furthest any pass between the two reaches in the way the curve faces,
+                for turns that skip over passes
+
+        Returns: 
+            TurnSolution of the n turns
+        """
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+        sign = np.where(up, 1.0, -1.0)
+        
+        tolerance = toolSize / 10
+        
+        # past the end of the pass by the length of the trailing object
+        lead = ends + np.column_stack((np.zeros(len(ends)), sign * toolLength))
+        
+        # if the lead in is below the next pass the curve goes from it over the next rectangle,
+        # otherwise it is constructed going backwards over the first rectangle
+        forward = sign * lead[:, 1] <= sign * starts[:, 1]
+        p0 = np.where(forward[:, None], lead, starts)
+        p3 = np.where(forward[:, None], starts, lead)
+        
+        # flipping the downward curves so everything below faces upwards
+        y0 = sign * p0[:, 1]
+        y3 = sign * p3[:, 1]
+        clearY = sign * np.where(forward, starts[:, 1], ends[:, 1])
+        if beyond is not None:
+            clearY = np.maximum(clearY, sign * np.asarray(beyond, dtype=float))
+        
+        # x goes from p0 to p3 by 3t^2 - 2t^3, inverting that for where it is tolerance across
+        width = np.abs(p3[:, 0] - p0[:, 0])
+        solvable = width > tolerance
+        ratio = np.where(solvable, tolerance / np.where(solvable, width, 1), 0.5)
+        
+        # only the turn itself decides how high it goes, not the field it is in, so every turn of the same shape is the same
+        ctrBegin = TURN_HEIGHT * np.maximum(width, toolSize)
+        tClear = 0.5 - np.sin(np.arcsin(1 - 2 * ratio) / 3)
+        
+        # the curve only has to be over the corner somewhere before tClear, so taking the
+        # lowest p1 that reaches it at any t up to there
+        t = tClear[:, None] * (np.arange(1, TURN_SAMPLES + 1) / TURN_SAMPLES)
+        base = ((1-t)**3 + 3*(1-t)**2 * t) * y0[:, None] + 3*(1-t) * t**2 * (y3 + ctrBegin)[:, None] + t**3 * y3[:, None]
+        needed = ((clearY[:, None] - base) / (3*(1-t)**2 * t)).min(axis=1)
+        Count('turnSamples', t.size)
+        
+        clear = y0 >= clearY
+        status = np.where(needed <= ctrBegin, TURN_OK, TURN_RAISED)
+        status = np.where(solvable, status, TURN_UNSOLVED)
+        status = np.where(clear, TURN_CLEAR, status)
+        offset = np.where(status == TURN_RAISED, needed, ctrBegin)
+        
+        controls = np.stack((p0, p0, p3, p3), axis=1)
+        controls[:, 1, 1] += sign * offset
+        controls[:, 2, 1] += sign * ctrBegin
+        
+        return TurnSolution(controls, ~forward, status, offset)
+    
+    def EvaluateTurns(self, turns, basis):
+        """
+        Draws every solved curve with a precomputed bernstein basis.
+
+        Args:
+            turns (TurnSolution): solved turns
+            basis (np.array): (numPoints, 4) from BernsteinBasis
+
+        Returns: 
+            (n, numPoints, 2) array of the curves, in the order they are driven
+        """
+        c = turns.controls
+        curves = (basis[:, 0, None] * c[:, None, 0] + basis[:, 1, None] * c[:, None, 1]
+                  + basis[:, 2, None] * c[:, None, 2] + basis[:, 3, None] * c[:, None, 3])
+        
+        # the backwards curves were constructed going the other way, need to reverse them
+        curves[turns.reverse] = curves[turns.reverse, ::-1]
+        
+        return curves
+    
+    def SampleCounts(self, lengths, maxSpacing):
+        """
+        Points on each straight line when sampling adaptively, only its end unless a maxSpacing is given.
+
+        Args:
+            lengths (np.array): (n,) length of each line
+            maxSpacing (float): longest gap between points, None for just the ends
+
+        Returns:
+            (n,) np.array of ints, at least 1
+        """
+        lengths = np.asarray(lengths, dtype=float)
+        if maxSpacing is None:
+            return np.ones(len(lengths), dtype=int)
+        
+        return np.maximum(np.ceil(lengths / maxSpacing).astype(int), 1)
+    
+    def InterpolateRagged(self, startPts, endPts, counts):
+        """
+        InterpolatePoints for many lines that each get their own number of points.
+
+        Args:
+            startPts (np.array): (n, 2) start of each line, not included
+            endPts (np.array): (n, 2) end of each line
+            counts (np.array): (n,) points on each line
+
+        Returns:
+            (sum(counts), 2) array of every line's points one after another
+        """
+        line = np.repeat(np.arange(len(counts)), counts)
+        step = np.arange(len(line)) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+        fraction = (step / counts[line])[:, None]
+        
+        points = startPts[line] + fraction * (endPts[line] - startPts[line])
+        points[np.cumsum(counts) - 1] = endPts
+        
+        return points
+    
+    def TurnSegments(self, turns, tolerance):
+        """
+        Straight segments each curve is drawn with so none of them is further than tolerance from it.
+        Wang's formula bounds the chord error of a cubic from its control points' second differences,
+        so tight turns get more points and nearly straight ones hardly any.
+
+        Args:
+            turns (TurnSolution): solved turns
+            tolerance (float): largest chord error allowed
+
+        Returns:
+            (n,) np.array of ints, at least 1
+        """
+        c = turns.controls
+        bend = np.maximum(np.hypot(*(c[:, 0] - 2*c[:, 1] + c[:, 2]).T), np.hypot(*(c[:, 1] - 2*c[:, 2] + c[:, 3]).T))
+        
+        return np.maximum(np.ceil(np.sqrt(0.75 * bend / tolerance)).astype(int), 1)
+    
+    def SampleTurns(self, turns, segments):
+        """
+        Draws every solved curve with its own number of segments, the same as EvaluateTurns but
+        without either end of the curve, they are the end of the lead in and the start of the pass.
+
+        Args:
+            turns (TurnSolution): solved turns
+            segments (np.array): (n,) from TurnSegments
+
+        Returns:
+            (m, 2) array of the curves one after another in the order they are driven, and (n,) points in each
+        """
+        counts = segments - 1
+        turn = np.repeat(np.arange(len(counts)), counts)
+        step = np.arange(len(turn)) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+        t = step / segments[turn]
+        
+        # the backwards curves are driven from t = 1
+        t = np.where(turns.reverse[turn], 1 - t, t)
+        basis = np.column_stack(((1-t)**3, 3*(1-t)**2 * t, 3*(1-t) * t**2, t**3))
+        
+        return np.einsum('mk,mkd->md', basis, turns.controls[turn]), counts
     
     def NonIntersectingCurve(self, rect1, rect2, toolSize, toolLength, numPoints, up):
         """
@@ -73,151 +347,263 @@ class ToolPath():
             up (bool): Whether the curve should face upwards or downwards 
 
         Returns: 
-            tool path that follows the rectangles
+            points of the lead in past rect1 followed by the curve
         """
-        tolerance = toolSize / 10
-        ctrBegin = (self.max_x - self.min_x) / (self.max_y - self.min_y)
-        ctrIncrease = (self.max_x - self.min_x) / (self.max_y - self.min_y)
-        
         if up:
             point1, _ = self.GetMidLinePointsFrom(rect1.exterior.coords)
             point2, _ = self.GetMidLinePointsFrom(rect2.exterior.coords)
-            
-            if ((point1[1] + toolLength) <= point2[1]):
-                # this is the point where the curve cannot cross
-                rectMinX = rect2.exterior.coords[3][0]
-                rectMaxY = rect2.exterior.coords[1][1]
-                no_touching_pt = [rectMinX + tolerance - (toolSize/2), rectMaxY]
-
-                # initaling bezizer control points, p0 and p3 always remain the same
-                # change p1 and p2
-                p0 = [point1[0], point1[1] + toolLength]
-                p3 = point2
-                
-                # time is +x
-                diff_multipler = 1
-            else:
-                # this is the point where the curve cannot cross
-                rectMaxX = rect1.exterior.coords[0][0]
-                rectMaxY = rect1.exterior.coords[1][1]
-                no_touching_pt = [rectMaxX - tolerance + (toolSize/2), rectMaxY] # This makes sense(Y)
-
-                # initaling bezizer control points, p0 and p3 always remain the same
-                # change p1 and p2
-                p0 = point2
-                p3 = [point1[0], point1[1] + toolLength]
-                
-                # time is -x
-                diff_multipler = -1
-        # Now where going down, were gathering timber    
         else:
-            toolLength *= -1
-            ctrBegin *= -1
-            ctrIncrease *= -1
             _, point1 = self.GetMidLinePointsFrom(rect1.exterior.coords)
             _, point2 = self.GetMidLinePointsFrom(rect2.exterior.coords)
-                
-            # If the starting point is less than the end point
-            if( (point1[1] + toolLength) >= point2[1]):
-                
-                # this is the point where the curve cannot cross
-                rectMinX = rect2.exterior.coords[3][0]
-                rectMinY = rect2.exterior.coords[3][1]
-                no_touching_pt = [rectMinX + tolerance - (toolSize/2), rectMinY]
-
-                # initaling bezizer control points, p0 and p3 always remain the same
-                # change p1 and p2
-                p0 = [point1[0], point1[1] + toolLength]
-                p3 = point2
-                
-                # +x
-                diff_multipler = 1
+            toolLength *= -1
+        
+        if self.templates is not None:
+            _, curves = self.templates.Solve(self, [point1], [point2], [up], toolSize, abs(toolLength), numPoints = numPoints)
+            curve = curves[0]
+        else:
+            turns = self.SolveTurns([point1], [point2], [up], toolSize, abs(toolLength))
+            curve = self.EvaluateTurns(turns, self.BernsteinBasis(numPoints))[0]
+        leadIn = self.InterpolatePoints(point1, [point1[0], point1[1] + toolLength], self.normalizedPts)
+        
+        return np.concatenate((leadIn, curve))
+    
+    def MidLines(self, bounds):
+        """
+        Bisecting lines of many rectangles, same as GetMidLinePointsFrom.
+
+        Args:
+            bounds (np.array): (n, 4) bounds of vertical rectangles
+
+        Returns: 
+            (n, 2) top points and (n, 2) bottom points
+        """
+        minX, minY, maxX, maxY = np.asarray(bounds, dtype=float).reshape(-1, 4).T
+        x = minX - (minX - maxX) / 2
+        
+        return np.column_stack((x, maxY)), np.column_stack((x, minY))
+    
+    def Beyond(self, bounds, order, up):
+        """
+        Highest top (or lowest bottom for the downward turns) of the rectangles each turn goes over,
+        both passes and any it skips.
+
+        Args:
+            bounds (np.array): (m, 4) bounds of every rectangle
+            order (np.array): (n,) rectangle of each pass
+            up (np.array): (n,) whether each pass is driven upwards
+
+        Returns: 
+            (n - 1,) np.array
+        """
+        tops, bottoms = bounds[:, 3], bounds[:, 1]
+        
+        low = np.minimum(order[:-1], order[1:])
+        high = np.maximum(order[:-1], order[1:])
+        highest, lowest = tops[low].copy(), bottoms[low].copy()
+        
+        # skips are short, so stepping every turn across a rectangle at a time is cheap
+        for step in range(1, int((high - low).max(initial=0)) + 1):
+            within = low + step <= high
+            at = np.minimum(low + step, high)
+            highest = np.where(within, np.maximum(highest, tops[at]), highest)
+            lowest = np.where(within, np.minimum(lowest, bottoms[at]), lowest)
+        
+        return np.where(up[:-1], highest, lowest)
+    
+    def PlanPasses(self, toolSize, toolLength, rects, numPoints, first, last):
+        """
+        Plans the passes from first up to last, each with the lead in and turn that leads into it,
+        taken around any obstacles.
+
+        Args:
+            toolSize (float): Width of rectangle
+            toolLength (float): length of trailing object
+            rects (shapely::MultiPolygon): set of vertical rectangles that the toolpath with descibe
+            numPoints (int): points to be in each seperate path object
+            first (int): first pass to plan
+            last (int): pass to stop before
+
+        Returns: 
+            PathArray of the passes and the TurnSolution of their turns
+        """
+        path, turns = self.PassRows(toolSize, toolLength, rects, numPoints, first, last)
+        
+        if self.obstacles is not None:
+            with Stage('AvoidObstacles'):
+                path = self.AvoidObstacles(path, toolSize, toolLength, rects, numPoints, first, last)
+        
+        return path, turns
+    
+    def PassRows(self, toolSize, toolLength, rects, numPoints, first, last):
+        """
+        Points of the passes from first up to last, each with the lead in and turn that leads into it.
+        Even passes are driven upwards and odd ones downwards, pass i drives the rectangle self.order[i].
+
+        Args:
+            toolSize (float): Width of rectangle
+            toolLength (float): length of trailing object
+            rects (shapely::MultiPolygon): set of vertical rectangles that the toolpath with descibe
+            numPoints (int): points to be in each seperate path object
+            first (int): first pass to plan
+            last (int): pass to stop before
+
+        Returns: 
+            PathArray of the passes and the TurnSolution of their turns
+        """
+        # the pass before first is needed for the turn out of it
+        before = max(first - 1, 0)
+        bounds = self.__Bounds(rects)
+        tops, bottoms = self.MidLines(bounds[self.order[before:last]])
+        up = np.arange(before, last) % 2 == 0
+        starts = np.where(up[:, None], bottoms, tops)
+        ends = np.where(up[:, None], tops, bottoms)
+        
+        # a turn goes up after an upwards pass
+        with Stage('SolveTurns'):
+            beyond = self.Beyond(bounds, self.order[before:last], up) if self.skips else None
+            if self.templates is not None:
+                turns, curves = self.templates.Solve(self, ends[:-1], starts[1:], up[:-1], toolSize, toolLength, beyond,
+                                                     None if self.adaptive else numPoints)
             else:
-                # this is the point where the curve cannot cross
-                rectMaxX = rect1.exterior.coords[0][0]
-                rectMinY = rect1.exterior.coords[0][1]
-                no_touching_pt = [rectMaxX - tolerance + (toolSize/2), rectMinY] # This makes sense(Y)
-
-                # initaling bezizer control points, p0 and p3 always remain the same
-                # change p1 and p2
-                p0 = point2
-                p3 = [point1[0], point1[1] + toolLength]
-                
-                # -x
-                diff_multipler = -1
-
-
-        # offset it a vertical point from p0 and p3 respectively so we have tanget lines
-        p1 = [p0[0], p0[1] + ctrBegin]
-        p2 = [p3[0], p3[1] + ctrBegin]
-
-        points = []
-        points.extend(self.InterpolatePoints(point1, [point1[0], point1[1] + toolLength], self.normalizedPts))
-
-        # So it doesn't go on forever
-        counter = 0
-        while counter < 100:
-            # these are the orders of n in the 3rd order poly equation that I am trying to solve
-            ord0 = p0[1] - no_touching_pt[1]
-            ord1 = -3 * p0[1] + 3*p1[1]
-            ord2 = 3*p0[1] - 6*p1[1] + 3*p2[1]
-            ord3 = -1*p0[1] + 3*p1[1] - 3*p2[1] + p3[1]
-
-            # getting the t where the top of the box is for out curve to check if the x is too close
-            # ts_at_y = np.roots([ord0, ord1, ord2, ord3])
-            ts_at_y = np.roots([ord3, ord2, ord1, ord0])
-            
-            # finds if any of the t is before halfway. returns a index corralating to ts_at_y
-            # Error when it sees its at 1 (or like .9999)
-            condition = (ts_at_y < 0.999) & (ts_at_y > 0)
-            
-            if not np.any(condition):
-                # This catches if the box + the length is the same height
-                print("the first box is taller than the second")
-                break
-            
-            t_at_y = np.where(condition)
+                turns = self.SolveTurns(ends[:-1], starts[1:], up[:-1], toolSize, toolLength, beyond)
+        
+        leadEnds = ends[:-1].copy()
+        leadEnds[:, 1] += np.where(up[:-1], toolLength, -toolLength)
+        
+        with Stage('EvaluateTurns'):
+            if self.adaptive:
+                turnPoints, turnCounts = self.SampleTurns(turns, self.TurnSegments(turns, self.chordTolerance))
+            elif self.templates is None:
+                curves = self.EvaluateTurns(turns, self.BernsteinBasis(numPoints))
+        
+        if self.obstacles is not None:
+            if self.adaptive:
+                # the clearance check needs both ends of every curve too
+                curves = [np.concatenate(([a], piece, [b])) for a, piece, b
+                          in zip(leadEnds, np.split(turnPoints, np.cumsum(turnCounts)[:-1]), starts[1:])]
+            with Stage('TurnClearance'):
+                clear = self.obstacles.Clear(curves)
+            turns = turns._replace(status=np.where(clear, turns.status, TURN_BLOCKED))
+        
+        if Enabled():
+            solved = np.bincount(turns.status, minlength=5)
+            Count('turns', len(turns.status))
+            Count('turnsRaised', int(solved[TURN_RAISED]))
+            Count('turnsClear', int(solved[TURN_CLEAR]))
+            Count('turnsUnsolved', int(solved[TURN_UNSOLVED]))
+            Count('turnsBlocked', int(solved[TURN_BLOCKED]))
+        
+        if self.adaptive:
+            path = self.AdaptiveBlocks(starts, ends, leadEnds, turnPoints, turnCounts, toolLength, before, first)
+        else:
+            passes = self.InterpolatePoints(starts, ends, numPoints)
+            leadIns = self.InterpolatePoints(ends[:-1], leadEnds, self.normalizedPts)
             
-            # if it is more than one we have problems so just getting the first one and iterating
-            if len(t_at_y[0]) > 1:
-                t_at_y = ts_at_y[t_at_y[0][0]]
-            elif len(t_at_y[0]) == 1:
-                t_at_y = ts_at_y[t_at_y[0]]
+            # every pass after the first is its lead in, turn and then the pass itself
+            blocks = np.concatenate((leadIns, curves, passes[1:]), axis=1)
+            blockKinds = np.repeat([LEAD_IN, TURN, PASS], [self.normalizedPts, numPoints, numPoints])
+            blockPasses = np.repeat(np.arange(before + 1, last), blocks.shape[1])
             
-            # calcuating the x using t in our beizer curve equ
-            x_at_y = (1-t_at_y)**3 * p0[0] + 3*(1-t_at_y)**2 * t_at_y * p1[0] + 3*(1-t_at_y) * t_at_y**2 * p2[0] + t_at_y**3 * p3[0]
+            path = PathArray.Empty((1 + numPoints if first == 0 else 0) + blocks.shape[0] * blocks.shape[1])
+            offset = 0
+            if first == 0:
+                offset = path.Write(offset, starts[0], PASS, 0)
+                offset = path.Write(offset, passes[0], PASS, 0)
+            path.Write(offset, blocks.reshape(-1, 2), np.tile(blockKinds, len(blocks)), blockPasses)
+        
+        return path, turns
+    
+    def AdaptiveBlocks(self, starts, ends, leadEnds, turnPoints, turnCounts, toolLength, before, first):
+        """
+        Lays out adaptively sampled passes like PlanPasses does, every one of them different lengths.
+        Each pass starts with its own first point since the turns stop short of it, so the passes
+        always have both ends in the path even when they are only sampled at their ends.
 
-            # if there is no overlap, break the cycle
-            # if there is, increase the y, should only do this for the first point but you know
-            diff = diff_multipler * (no_touching_pt[0] - x_at_y)
-            if (diff) >= 0:
-                break
-            else:
-                p1 = [p1[0], p1[1] + ctrIncrease]
-                # Maybe one day I'll increase both?
-                # p2 = [p2[0], p2[1] + offset_to_increase]
-                
-            counter += 1
+        Args:
+            starts, ends (np.array): (n, 2) ends of each pass from before
+            leadEnds (np.array): (n - 1, 2) end of the lead in after each pass
+            turnPoints, turnCounts (np.array): from SampleTurns
+            toolLength (float): length of trailing object
+            before (int): pass the arrays start at
+            first (int): first pass to plan, before it only its turn out is wanted
 
-        # construct our curve
-        T = [(t/numPoints) for t in range(numPoints)]
+        Returns:
+            PathArray of the passes
+        """
+        leadCounts = self.SampleCounts(np.full(len(leadEnds), toolLength), self.maxSpacing)
+        passCounts = self.SampleCounts(np.abs(ends[:, 1] - starts[:, 1]), self.maxSpacing)
+        leadIns = self.InterpolateRagged(ends[:-1], leadEnds, leadCounts)
+        passes = self.InterpolateRagged(starts, ends, passCounts)
         
-        # when first box is taller than the second (without the increase), the line is constructed going -x,
-        # need to reverse this
-        if diff_multipler == -1:
-            T.reverse()
+        # which pass each point goes with and where it goes in it, a lead in, its turn, the start and then the rest
+        later = np.arange(1, len(starts))
+        points = np.concatenate((leadIns, turnPoints, starts, passes))
+        passIndex = np.concatenate((np.repeat(later, leadCounts), np.repeat(later, turnCounts),
+                                    np.arange(len(starts)), np.repeat(np.arange(len(starts)), passCounts)))
+        section = np.repeat([0, 1, 2, 3], [len(leadIns), len(turnPoints), len(starts), len(passes)])
+        kinds = np.array([LEAD_IN, TURN, PASS, PASS])[section]
         
-        for t in T:
-            Bx = (1-t)**3 * p0[0] + 3*(1-t)**2 * t * p1[0] + 3*(1-t) * t**2 * p2[0] + t**3 * p3[0]
-            By = (1-t)**3 * p0[1] + 3*(1-t)**2 * t * p1[1] + 3*(1-t) * t**2 * p2[1] + t**3 * p3[1]
-            points.append([Bx, By])
-
+        order = np.lexsort((np.arange(len(points)), section, passIndex))
+        if first > 0:
+            order = order[passIndex[order] > 0]
         
-        return points
+        path = PathArray.Empty(len(order))
+        path.Write(0, points[order], kinds[order], passIndex[order] + before)
+        
+        return path
+    
+    def AvoidObstacles(self, path, toolSize, toolLength, rects, numPoints, first, last):
+        """
+        Takes the passes, lead ins and turns around every obstacle they run into, with the tool up along
+        the outline of the obstacle from where they go in to where they come out.
+        A detour can carry on past the passes planned, so the end of the pass before first and the passes
+        after last, up to where the detour comes out, are looked at too. Planning the passes in blocks
+        gives the same path as planning them all at once.
 
+        Args:
+            path (PathArray): planned passes from first up to last
+            toolSize, toolLength, rects, numPoints, first, last: see PlanPasses
+
+        Returns: 
+            PathArray with the detours in it
+        """
+        count = len(self.__Bounds(rects))
+        pieces = [path.data]
+        if first > 0:
+            # the pass before is only needed for where it ends
+            tops, bottoms = self.MidLines(self.__Bounds(rects)[self.order[first - 1:first]])
+            before = PathArray.Empty(1)
+            before.Write(0, tops if (first - 1) % 2 == 0 else bottoms, PASS, first - 1)
+            pieces.insert(0, before.data)
+        
+        stop = last
+        while True:
+            rows = np.concatenate(pieces)
+            source, points, transit, inside = self.obstacles.Reroute(PathArray(rows).coords)
+            if not inside or stop >= count:
+                break
+            
+            # ended in an obstacle, the passes after it are needed to see where the detour comes out
+            ahead = min(count, stop + max(stop - first, 1))
+            more, _ = self.PassRows(toolSize, toolLength, rects, numPoints, stop, ahead)
+            pieces.append(more.data)
+            stop = ahead
+        
+        if source is None:
+            return path
+        
+        rows = rows[source]
+        rows['x'], rows['y'] = points[:, 0], points[:, 1]
+        rows['kind'][transit] = TRANSIT
+        
+        # only the rows of these passes are kept, the pass index only goes up
+        keep = slice(np.searchsorted(rows['pass'], first), np.searchsorted(rows['pass'], last))
+        
+        return PathArray(rows[keep])
+    
     def CreatePath(self, toolSize, toolLength, rects, numPoints):
         """
-        Constructs the path.
+        Constructs the path. The solved curves are kept in self.turns.
 
         Args:
             toolSize (float): Width of rectangle
@@ -226,28 +612,39 @@ class ToolPath():
             numPoints (int): points to be in each seperate path object
 
         Returns: 
-            tool path that follows the rectangles
+            PathArray that follows the rectangles
         """
-        lines = []
-        
-        for i in range(len(rects.geoms)):
-            
-            if i % 2 == 0:
-                endPoint, startPoint = self.GetMidLinePointsFrom(rects.geoms[i].exterior.coords)
-                
-                # On first pass only line in the midpoint   
-                if i != 0:
-                    lines.extend(self.NonIntersectingCurve(rects.geoms[i-1], rects.geoms[i], toolSize, toolLength, numPoints, up = False))
-                else:
-                    lines.append(startPoint)
-                    
-                lines.extend(self.InterpolatePoints(startPoint, endPoint, numPoints).tolist())
-                
-            else:
-                lines.extend(self.NonIntersectingCurve(rects.geoms[i-1], rects.geoms[i], toolSize, toolLength, numPoints, up = True))
-                
-                startPoint, endPoint = self.GetMidLinePointsFrom(rects.geoms[i].exterior.coords)
-                lines.extend(self.InterpolatePoints(startPoint, endPoint, numPoints).tolist())
+        with Stage('CreatePath'):
+            path, self.turns = self.PlanPasses(toolSize, toolLength, rects, numPoints, 0, len(self.__Bounds(rects)))
+        Count('pathPoints', len(path))
         
+        return path
+    
+    def __Bounds(self, rects):
+        """
+        Bounds of rects, already known when they are this path's rectangles
+        """
+        return self.bounds if rects is self.rectangles else self.RectangleBounds(rects)
+    
+    def Segments(self, blockSize = 64):
+        """
+        Plans the path a block of passes at a time and yields it pass by pass, so driving can start
+        before the rest is planned. Each segment is the lead in and turn into a pass followed by the pass,
+        concatenated they are exactly the eager path.
+
+        Args:
+            blockSize (int): passes planned together, only one block is held at a time
+
+        Returns: 
+            generator of PathArray, one per pass
+        """
+        count = len(self.bounds)
         
-        return LineString(lines)
\ No newline at end of file
+        for first in range(0, count, blockSize):
+            last = min(first + blockSize, count)
+            block, _ = self.PlanPasses(self.toolSize, self.toolLength, self.rectangles, self.pointsInEachPath, first, last)
+            
+            # the pass index is sorted so each pass is one slice of the block
+            splits = np.searchsorted(block.passIndex, np.arange(first, last + 1))
+            for a, b in zip(splits[:-1], splits[1:]):
+                yield PathArray(block.data[a:b])
@@ -0,0 +1,142 @@
+# Library
+from collections import OrderedDict
+
+import numpy as np
+
+# Local
+from Instrumentation import Count
+from ToolPath import TurnSolution
+
+# Solved turns kept by their shape. Most turns in a field are the same distance across with the same
+# difference in height, so each shape is solved and drawn once, going up and to the right from (0, 0),
+# and every turn like it is that curve mirrored and moved onto its pass. The least recently used shapes
+# are evicted once there are too many.
+class TurnTemplates():
+    def __init__(self, maxEntries = 4096, quantum = 0.05):
+        """
+        Args:
+            maxEntries (int): shapes kept before the least recently used is evicted
+            quantum (float): fraction of the toolSize the shapes are rounded to, turns closer than
+                this share a shape and are bent to meet their passes exactly. Half of the tenth of a
+                toolSize SolveTurns keeps from the corners, so the bend stays inside what it allows for
+                and turns along a curved edge, whose heights never repeat exactly, still share shapes
+        """
+        self.maxEntries = maxEntries
+        self.quantum = quantum
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def Solve(self, toolPath, ends, starts, up, toolSize, toolLength, beyond = None, numPoints = None):
+        """
+        Same as ToolPath.SolveTurns followed by ToolPath.EvaluateTurns, only solving the shapes that aren't kept yet.
+
+        Args:
+            toolPath (ToolPath): solves the new shapes
+            ends, starts, up, toolSize, toolLength, beyond: see ToolPath.SolveTurns
+            numPoints (int): points in each curve, None to only solve them
+
+        Returns:
+            TurnSolution of the n turns, and the (n, numPoints, 2) curves in the order they are driven or None
+        """
+        ends = np.asarray(ends, dtype = float).reshape(-1, 2)
+        starts = np.asarray(starts, dtype = float).reshape(-1, 2)
+        up = np.asarray(up, dtype = bool).reshape(-1)
+        n = len(ends)
+        if n == 0:
+            turns = toolPath.SolveTurns(ends, starts, up, toolSize, toolLength, beyond)
+            return turns, None if numPoints is None else toolPath.EvaluateTurns(turns, toolPath.BernsteinBasis(numPoints))
+
+        # every turn flipped to go up and to the right from the end of its pass
+        mirror = np.column_stack((np.where(starts[:, 0] < ends[:, 0], -1.0, 1.0), np.where(up, 1.0, -1.0)))
+        across = mirror * (starts - ends)
+        over = np.full(n, -np.inf) if beyond is None else mirror[:, 1] * (np.asarray(beyond, dtype = float) - ends[:, 1])
+
+        step = self.quantum * toolSize
+        shapes, inverse = np.unique(np.round(np.column_stack((across, over)) / step), axis = 0, return_inverse = True)
+        inverse = inverse.reshape(-1)
+        context = (toolSize, toolLength, numPoints)
+        keys = [tuple(shape) + context for shape in shapes.tolist()]
+
+        missing = [i for i, key in enumerate(keys) if key not in self.entries]
+        if missing:
+            self.Add([keys[i] for i in missing], shapes[missing] * step, toolPath, toolSize, toolLength, numPoints)
+
+        found = []
+        for key in keys:
+            self.entries.move_to_end(key)
+            found.append(self.entries[key])
+        self.Evict()
+
+        # only the first turn of a new shape missed, the rest of them used it
+        hits = n - len(missing)
+        self.hits += hits
+        self.misses += n - hits
+        Count('turnTemplateHits', hits)
+        Count('turnTemplateMisses', n - hits)
+
+        controls, reverse, status, offset, curves = (np.stack(column) for column in zip(*found))
+        controls, reverse, status, offset = controls[inverse], reverse[inverse], status[inverse], offset[inverse]
+
+        # the shapes were rounded, what is left to bend the start of the next pass onto
+        error = starts - (ends + mirror * (shapes[inverse, :2] * step))
+
+        # p1 sits on p0 and p2 on p3, so they move with whichever end is the start of the next pass
+        controls = controls * mirror[:, None, :] + ends[:, None, :]
+        moved = np.where(reverse[:, None], [True, True, False, False], [False, False, True, True])
+        controls += moved[:, :, None] * error[:, None, :]
+        turns = TurnSolution(controls, reverse, status, offset)
+
+        if numPoints is None:
+            return turns, None
+
+        basis = toolPath.BernsteinBasis(numPoints)
+        weight = np.where(reverse[:, None], basis[:, 0] + basis[:, 1], basis[:, 2] + basis[:, 3])
+        curves = curves[inverse] * mirror[:, None, :] + ends[:, None, :] + weight[:, :, None] * error[:, None, :]
+
+        # drawn the way they were constructed, the backwards curves need reversing
+        curves[reverse] = curves[reverse, ::-1]
+
+        return turns, curves
+
+    def Add(self, keys, shapes, toolPath, toolSize, toolLength, numPoints):
+        """
+        Solves and keeps new shapes, all in one batch.
+
+        Args:
+            keys (list): key of each shape
+            shapes (np.array): (m, 3) how far across and up the next pass starts, and how high the curve needs to go
+        """
+        starts = shapes[:, :2]
+        # a turn with nothing to get over beyond its own passes is -inf here, which SolveTurns ignores
+        beyond = shapes[:, 2]
+        turns = toolPath.SolveTurns(np.zeros_like(starts), starts, np.ones(len(starts), dtype = bool), toolSize, toolLength, beyond)
+
+        if numPoints is None:
+            curves = [None] * len(keys)
+        else:
+            curves = toolPath.EvaluateTurns(turns._replace(reverse = np.zeros(len(keys), dtype = bool)), toolPath.BernsteinBasis(numPoints))
+
+        for i, key in enumerate(keys):
+            self.entries[key] = (turns.controls[i], turns.reverse[i], turns.status[i], turns.offset[i],
+                                 np.zeros((0, 2)) if curves[i] is None else curves[i])
+
+    def Evict(self):
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last = False)
+            self.evictions += 1
+
+    def Stats(self):
+        """
+        Returns:
+            dict of hits, misses, hit rate, evictions and shapes kept
+        """
+        lookups = self.hits + self.misses
+
+        return {'hits': self.hits, 'misses': self.misses, 'hitRate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions, 'entries': len(self.entries)}
@@ -1,19 +1,20 @@
 # Local
-from Plotter import Plotter
 from RandomPolygon import RandomPolygon
 from Rectangles import RectangleFactory
 from ToolPath import ToolPath
 
 # Library
-from shapely import affinity
+import argparse
 
 def main():
+    parser = argparse.ArgumentParser(description = 'Plans and animates the tool path of a random field.')
+    parser.add_argument('--headless', action = 'store_true', help = "only plan, without importing matplotlib or drawing anything")
+    parser.add_argument('--chord-tolerance', type = float, default = None, help = "sample the path adaptively, turns kept within this of the curve")
+    args = parser.parse_args()
     
     toolSize = 1
     toolLength = 1
     
-    P = Plotter()
-    
     # generate a random polygon with 5 sides
     rp = RandomPolygon(5, max_coord=toolSize*10)
     polygon = rp.polygon
@@ -22,23 +23,26 @@ def main():
     RectangleObject = RectangleFactory(polygon, toolSize)
     
     Rects = RectangleObject.rectangles
-    centroid = RectangleObject.centroid
-    angle = RectangleObject.angle
-    translate = RectangleObject.translate
+    frame = RectangleObject.frame
+    
+    toolPath = ToolPath(toolSize, toolLength, Rects, 20, chordTolerance = args.chord_tolerance).path
     
-    toolPath = ToolPath(toolSize, toolLength, Rects, 20).path
+    if args.headless:
+        print('{} rectangles, {} path points, length {:.2f}'.format(len(Rects.geoms), len(toolPath.coords), toolPath.length))
+        return
+    
+    # only loaded when there is something to look at
+    from Plotter import Plotter
+    P = Plotter()
     
     # Drawing Rectangles to show path
-    Rects = affinity.rotate(Rects, angle = -angle, use_radians = True, origin=centroid)
-    Rects = affinity.translate(Rects, yoff = -translate)
-    # P.AddShapes(Rects)
+    # P.AddShapes(frame.ToWorld(Rects))
     
     # Drawing inital shape
     P.AddShapes(polygon, color = 'green')
     
     # Unrotating toolPath
-    toolPath = affinity.translate(toolPath, yoff=-translate)
-    toolPath = affinity.rotate(toolPath, angle = -angle, use_radians = True, origin=centroid)
+    toolPath = frame.ToWorld(toolPath)
     P.AddShapes(toolPath)
 
     P.Animate(toolPath.xy[0], toolPath.xy[1])
@@ -0,0 +1,23 @@
+# Library
+from shapely.geometry import Polygon
+
+# Local
+import Batch
+
+FIELD = Polygon([(0, 0), (40, 3), (45, 30), (10, 38), (-3, 20)])
+
+def test_planned_field_is_ok():
+    record, result = Batch.PlanField('field', FIELD, 1, 1, 20, False)
+
+    assert record['status'] == 'ok'
+    assert result is not None
+
+def test_field_left_uncovered_is_a_warning(monkeypatch):
+    # no path can cover more than all of its field
+    monkeypatch.setattr(Batch, 'MIN_COVERED', 1.5)
+
+    record, result = Batch.PlanField('field', FIELD, 1, 1, 20, False)
+
+    assert record['status'] == 'warning'
+    assert 'covers' in record['warning']
+    assert result is not None
@@ -0,0 +1,52 @@
+# Library
+import numpy as np
+import pytest
+from shapely import affinity
+from shapely.geometry import LineString, Point, Polygon
+
+# Local
+from CellDecomposition import CellDecomposition
+from Coverage import Coverage
+from PathArray import TRANSIT
+
+U = Polygon([(0, 0), (60, 0), (60, 40), (45, 40), (45, 12), (15, 12), (15, 40), (0, 40)])
+E = Polygon([(0, 0), (70, 0), (70, 10), (20, 10), (20, 25), (60, 25), (60, 35), (20, 35), (20, 50), (70, 50), (70, 60), (0, 60)])
+
+# turned so the columns cross the arms twice and the field has to be split
+FIELDS = {'U': U, 'U17': affinity.rotate(U, 17), 'E33': affinity.rotate(E, 33)}
+
+@pytest.mark.parametrize('name', sorted(FIELDS))
+def test_cells_cover_concave_fields_once(name):
+    polygon = FIELDS[name]
+    plan = CellDecomposition(polygon, 1, 1, 20, workers = 1)
+
+    report = Coverage(polygon, plan.array, 1).Exact()
+
+    assert len(plan.cells) > 1
+    assert report.covered == pytest.approx(polygon.area, rel = 1e-3)
+    # neighbouring cells share their columns, nothing along the cuts is driven twice
+    assert report.double < 1e-3 * polygon.area
+
+@pytest.mark.parametrize('name', ['U17', 'E33'])
+def test_ways_between_cells_stay_in_the_field(name):
+    polygon = FIELDS[name]
+    plan = CellDecomposition(polygon, 1, 1, 20, workers = 1)
+    path = plan.array
+
+    transits = [LineString(path.coords[i - 1:i + 1]) for i in np.flatnonzero(path.kind == TRANSIT) if i > 0]
+    outside = sum(line.difference(polygon.buffer(1)).length for line in transits)
+
+    assert transits
+    assert outside == pytest.approx(0, abs = 1e-6)
+
+def test_ways_between_cells_go_around_obstacles():
+    polygon = affinity.rotate(U, 17)
+    straight = CellDecomposition(polygon, 1, 1, 20, workers = 1).array
+    ends = [i for i in np.flatnonzero(straight.kind == TRANSIT) if i > 0 and straight.kind[i - 1] != TRANSIT]
+
+    # right in the middle of the first way between two cells
+    middle = straight.coords[ends[0] - 1:ends[0] + 1].mean(axis = 0)
+    obstacle = Point(middle).buffer(1)
+    path = CellDecomposition(polygon, 1, 1, 20, obstacles = [obstacle], workers = 1).array
+
+    assert LineString(path.coords).intersection(obstacle).length == pytest.approx(0, abs = 1e-6)
@@ -0,0 +1,49 @@
+# Library
+import pytest
+from shapely.geometry import Point, Polygon, box
+
+# Local
+from Coverage import Coverage
+from Headlands import Headlands
+from Rectangles import RectangleFactory
+from ToolPath import ToolPath
+
+PENTAGON = [(0, 0), (40, 3), (45, 30), (10, 38), (-3, 20)]
+HOLE = Polygon(PENTAGON, [[(15, 15), (25, 15), (25, 22), (15, 22)]])
+
+def Passes(field):
+    rects = RectangleFactory(field, 1, 0, obstacles = [])
+    return Coverage.FromPlan(field, rects, ToolPath(1, 1, rects.rectangles, 20, obstacles = rects.obstacles))
+
+PLANS = {
+    'box': lambda: Passes(box(0, 0, 30, 40)),
+    'pentagon': lambda: Passes(Polygon(PENTAGON)),
+    'circle': lambda: Passes(Point(0, 0).buffer(20)),
+    'hole': lambda: Passes(HOLE),
+    # the laps go over the ends of the passes, so some of it is covered twice
+    'headlands': lambda: Coverage(HOLE, Headlands(HOLE, 1, 1, 20).array, 1),
+}
+
+@pytest.mark.parametrize('resolution', [0.1, 0.25, 0.5])
+@pytest.mark.parametrize('name', sorted(PLANS))
+def test_raster_agrees_with_exact(name, resolution):
+    coverage = PLANS[name]()
+    exact = coverage.Exact()
+    raster = coverage.Raster(resolution, regions = True)
+
+    # a cell is only counted wrong where an edge, of the field or of what was missed or covered twice, runs through it
+    edges = coverage.polygon.length + exact.missedRegions.length + exact.doubleRegions.length
+    for area in ('area', 'covered', 'missed', 'double', 'outside'):
+        assert getattr(raster, area) == pytest.approx(getattr(exact, area), abs = edges * resolution)
+
+    # and the regions are in the same places
+    assert raster.missedRegions.symmetric_difference(exact.missedRegions).area <= exact.missedRegions.length * resolution
+    assert raster.doubleRegions.symmetric_difference(exact.doubleRegions).area <= exact.doubleRegions.length * resolution
+
+def test_raster_is_exact_on_a_box():
+    coverage = PLANS['box']()
+    exact = coverage.Exact()
+    raster = coverage.Raster(0.25)
+
+    for area in ('area', 'covered', 'missed', 'double', 'outside'):
+        assert getattr(raster, area) == pytest.approx(getattr(exact, area), abs = 1e-6)
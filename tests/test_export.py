@@ -0,0 +1,123 @@
+# Library
+import json
+
+import numpy as np
+import pytest
+from shapely.geometry import Polygon
+
+# Local
+import Export
+from Export import Load, MapMembers, Save, StreamWriter, KIND_NAMES
+from Headlands import Headlands
+from PathArray import PathArray
+from Rectangles import RectangleFactory
+from ToolPath import ToolPath
+
+FIELD = Polygon([(0, 0), (40, 3), (45, 30), (10, 38), (-3, 20)], [[(15, 15), (25, 15), (25, 22), (15, 22)]])
+
+@pytest.fixture(scope = 'module')
+def plan():
+    # planned at an angle, so the local frame isn't the world
+    rects = RectangleFactory(FIELD, 1, 0.3)
+    toolPath = ToolPath(1, 1, rects.rectangles, 20, obstacles = rects.obstacles)
+    world = PathArray(toolPath.array.data.copy())
+    rects.frame.Inverse(world.coords)
+
+    return rects, toolPath, world
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_npz_round_trip(tmp_path, plan, mmap):
+    rects, toolPath, world = plan
+    filename = str(tmp_path / 'plan.npz')
+    Save(filename, world, rects.rectangles, rects.frame, 1, 1)
+    saved = Load(filename, mmap = mmap)
+
+    assert saved.header['version'] == Export.FORMAT_VERSION
+    assert (saved.header['toolSize'], saved.header['toolLength']) == (1, 1)
+    assert saved.header['angle'] == rects.frame.angle
+    assert np.array_equal(saved.path.data, world.data)
+    assert np.array_equal(saved.rectangles, toolPath.bounds)
+
+    # the saved matrix takes the local path to the world one
+    local = toolPath.array.coords
+    moved = np.column_stack((local, np.ones(len(local)))) @ saved.header['toWorld'].T
+    assert np.allclose(moved[:, :2], world.coords)
+
+def test_members_are_memory_mapped(tmp_path, plan):
+    rects, _, world = plan
+    filename = str(tmp_path / 'plan.npz')
+    Save(filename, world, rects.rectangles, rects.frame, 1, 1)
+    members = MapMembers(filename)
+
+    assert sorted(members) == ['header', 'path', 'rectangles']
+    with np.load(filename) as loaded:
+        for name, member in members.items():
+            assert isinstance(member, np.memmap)
+            assert not member.flags.writeable
+            assert member.dtype == loaded[name].dtype
+            assert np.array_equal(member, loaded[name])
+
+def test_empty_and_compressed_members(tmp_path, plan):
+    _, _, world = plan
+
+    # nothing to map without rectangles, they still come back with their shape
+    filename = str(tmp_path / 'path.npz')
+    Save(filename, world)
+    saved = Load(filename)
+    assert saved.rectangles.shape == (0, 4)
+    assert np.array_equal(saved.header['toWorld'], np.identity(3))
+
+    compressed = str(tmp_path / 'compressed.npz')
+    np.savez_compressed(compressed, path=world.data)
+    with pytest.raises(ValueError):
+        MapMembers(compressed)
+
+def test_npy_and_newer_versions(tmp_path, plan, monkeypatch):
+    _, _, world = plan
+    filename = str(tmp_path / 'path.npy')
+    Save(filename, world)
+    saved = Load(filename)
+    assert saved.header is None and saved.rectangles is None
+    assert np.array_equal(saved.path.data, world.data)
+
+    filename = str(tmp_path / 'newer.npz')
+    monkeypatch.setattr(Export, 'FORMAT_VERSION', Export.FORMAT_VERSION + 1)
+    Save(filename, world)
+    monkeypatch.undo()
+    with pytest.raises(ValueError):
+        Load(filename)
+
+def test_streamed_csv(tmp_path, plan):
+    rects, toolPath, world = plan
+    streamed = ToolPath(1, 1, rects.rectangles, 20, obstacles = rects.obstacles, stream = True)
+    filename = str(tmp_path / 'plan.csv')
+    with StreamWriter(filename, frame = rects.frame, precision = 9) as writer:
+        for segment in streamed.Segments(blockSize = 4):
+            writer.Write(segment)
+
+    rows = np.loadtxt(filename, delimiter = ',', skiprows = 1)
+    assert np.allclose(rows[:, :2], world.coords, rtol = 0, atol = 1e-8)
+    assert np.array_equal(rows[:, 2], world.kind)
+    assert np.array_equal(rows[:, 3], world.passIndex)
+
+def test_streamed_geojson(tmp_path):
+    # headlands are already in the world and have every kind of point
+    world = Headlands(FIELD, 1, 1, 20, rings = 2).array
+    filename = str(tmp_path / 'plan.geojson')
+    with StreamWriter(filename, precision = 9) as writer:
+        for rows in np.array_split(np.arange(len(world)), 7):
+            writer.Write(PathArray(world.data[rows]))
+
+    with open(filename) as file:
+        features = json.load(file)['features']
+
+    # each line starts where the one before it ended, so dropping those repeats gives every point back
+    lines = [np.array(feature['geometry']['coordinates']) for feature in features]
+    points = np.concatenate([lines[0]] + [line[1:] for line in lines[1:]])
+    assert np.allclose(points, world.coords, rtol = 0, atol = 1e-8)
+
+    # and each line is the run of one kind of one pass
+    for feature, line in zip(features, lines):
+        end = np.flatnonzero(np.all(np.isclose(world.coords, line[-1], rtol = 0, atol = 1e-8), axis = 1))
+        assert any(KIND_NAMES[world.kind[row]] == feature['properties']['kind'] and
+                   world.passIndex[row] == feature['properties']['pass'] for row in end)
@@ -0,0 +1,68 @@
+# Library
+import numpy as np
+import pytest
+from shapely.geometry import LineString, Polygon
+
+# Local
+from Headlands import Headlands
+from PathArray import HEADLAND, TRANSIT
+
+FIELD = Polygon([(0, 0), (40, 3), (45, 30), (10, 38), (-3, 20)], [[(15, 15), (25, 15), (25, 22), (15, 22)]])
+
+def test_laps_are_joined_with_the_tool_up():
+    plan = Headlands(FIELD, 1, 1, 20, rings = 2)
+    path = plan.array
+    kind, coords = path.kind, path.coords
+
+    # every ring, outside and round the hole, of both laps
+    starts = np.flatnonzero((kind[1:] == HEADLAND) & (kind[:-1] != HEADLAND)) + 1
+    assert len(starts) == 4
+
+    # each is driven to with the tool up, from where the path before it ended
+    for start in starts:
+        assert kind[start - 1] == TRANSIT
+        assert kind[start - 2] == TRANSIT
+        assert np.allclose(coords[start - 1], coords[start])
+        assert np.allclose(coords[start - 3], coords[start - 2])
+
+    # the way there stays in the field
+    for start in starts:
+        line = LineString(coords[start - 2:start])
+        assert line.difference(FIELD).length == pytest.approx(0, abs = 1e-6)
+
+def test_ways_between_segments_stay_in_a_concave_field():
+    # a U too thin at the bottom for the inside to go round, so its arms are planned apart across the gap
+    field = Polygon([(0, 0), (60, 0), (60, 50), (40, 50), (40, 3), (20, 3), (20, 50), (0, 50)])
+    plan = Headlands(field, 1, 1, 20, rings = 2)
+    path = plan.array
+    assert len(plan.plans) == 2
+
+    around = field.buffer(1 + 1e-6)
+    transit = path.kind == TRANSIT
+    rows = np.flatnonzero(transit[1:] & transit[:-1])
+    assert len(rows)
+    for row in rows:
+        assert around.contains(LineString(path.coords[row:row + 2]))
+
+def test_laps_and_ways_go_round_obstacles():
+    obstacle = Polygon([(18, -1), (22, -1), (22, 4), (18, 4)])
+    plan = Headlands(FIELD, 1, 1, 20, rings = 2, obstacles = [obstacle])
+    path = plan.array
+
+    # nothing is driven over the obstacle, with the tool down or up
+    inside = obstacle.buffer(-1e-6)
+    for row in range(len(path) - 1):
+        assert not LineString(path.coords[row:row + 2]).intersects(inside)
+
+    # the outer lap runs into it, so part of the lap is a detour with the tool up
+    assert ((path.kind == TRANSIT) & (path.passIndex == 0)).any()
+
+def test_angle_search_keeps_the_obstacles():
+    obstacle = Polygon([(20, 25), (24, 25), (24, 29), (20, 29)])
+    plan = Headlands(FIELD, 1, 1, 20, rings = 1, obstacles = [obstacle], search = True)
+    path = plan.array
+
+    inside = obstacle.buffer(-1e-6)
+    down = (path.kind[1:] != TRANSIT) & (path.kind[:-1] != TRANSIT)
+    for row in np.flatnonzero(down):
+        assert not LineString(path.coords[row:row + 2]).intersects(inside)
@@ -0,0 +1,26 @@
+# Library
+import numpy as np
+import pytest
+
+# Local
+from Batch import PlanField
+from MaskReader import MaskReader
+
+def test_traced_mask_is_covered(tmp_path):
+    # an L shaped field, traced boundaries are all along the pixel edges
+    mask = np.zeros((120, 200), dtype = np.uint8)
+    mask[10:110, 10:60] = 1
+    mask[70:110, 60:190] = 1
+    path = str(tmp_path / 'mask.npy')
+    np.save(path, mask)
+
+    polygons = MaskReader(path, tileSize = 64).Polygons()
+    assert len(polygons) == 1
+    polygon = polygons[0]
+    assert polygon.area == pytest.approx(mask.sum())
+
+    record, result = PlanField('mask', polygon, 2, 1, 20, False, coverage = True)
+
+    assert record['status'] == 'ok'
+    assert record['coverage']['missed'] < 0.01 * polygon.area
+    assert record['coverage']['covered'] == pytest.approx(polygon.area, rel = 0.01)
@@ -0,0 +1,61 @@
+# Library
+import numpy as np
+import pytest
+from shapely.geometry import LineString, Point, Polygon, box
+
+# Local
+from Coverage import Coverage
+from PathArray import PathArray, TRANSIT
+from Rectangles import RectangleFactory
+from ToolPath import ToolPath
+
+FIELD = Polygon([(0, 0), (40, 3), (45, 30), (10, 38), (-3, 20)])
+
+OBSTACLES = {
+    'end': [Point(20, 35).buffer(3)],
+    'start': [Point(22, 3).buffer(2.5)],
+    'middle': [Point(20, 18).buffer(3)],
+}
+
+def Plan(obstacles, **kwargs):
+    rects = RectangleFactory(FIELD, 1, obstacles = obstacles)
+    toolPath = ToolPath(1, 1, rects.rectangles, 20, obstacles = rects.obstacles, **kwargs)
+
+    return rects, toolPath
+
+@pytest.mark.parametrize('name', sorted(OBSTACLES))
+def test_path_keeps_out_of_obstacles(name):
+    obstacles = OBSTACLES[name]
+    rects, toolPath = Plan(obstacles)
+    world = PathArray(toolPath.array.data.copy())
+    rects.frame.Inverse(world.coords)
+
+    assert not any(obstacle.contains(Point(point)) for obstacle in obstacles for point in world.coords)
+    assert sum(LineString(world.coords).intersection(obstacle).length for obstacle in obstacles) == pytest.approx(0)
+    assert np.all(np.diff(world.passIndex) >= 0)
+
+@pytest.mark.parametrize('name', sorted(OBSTACLES))
+def test_streamed_detours_match_eager(name):
+    _, eager = Plan(OBSTACLES[name])
+    _, streamed = Plan(OBSTACLES[name], stream = True)
+    path = PathArray.Concatenate(streamed.Segments(blockSize = 1))
+
+    assert np.array_equal(path.kind, eager.array.kind)
+    assert np.array_equal(path.passIndex, eager.array.passIndex)
+    assert np.allclose(path.coords, eager.array.coords)
+
+# the passes either side of the hole run right along the edges of its zone
+@pytest.mark.parametrize('hole', [box(20, 25, 40, 45), box(20.3, 25, 40.3, 45)])
+def test_passes_along_a_straight_edge_keep_out_of_the_hole(hole):
+    field = Polygon(box(0, 0, 60, 70).exterior.coords, [hole.exterior.coords])
+    rects = RectangleFactory(field, 1, 0)
+    world = PathArray(ToolPath(1, 1, rects.rectangles, 20, obstacles = rects.obstacles).array.data.copy())
+    rects.frame.Inverse(world.coords)
+
+    driven = [LineString(world.coords[i - 1:i + 1]) for i in np.flatnonzero(world.kind != TRANSIT) if i > 0]
+    assert sum(line.intersection(hole).length for line in driven) == pytest.approx(0, abs = 1e-6)
+
+    # everything is covered, but for the clearance the tool keeps round the hole and the columns it cuts into
+    report = Coverage(field, world, 1).Raster(regions = True)
+    assert report.missed < 0.02 * report.area
+    assert report.missedRegions is None or hole.buffer(1).contains(report.missedRegions)
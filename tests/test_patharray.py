@@ -0,0 +1,71 @@
+# Library
+import numpy as np
+import pytest
+from shapely.geometry import Point, box
+
+# Local
+from PathArray import PathArray, PATH_DTYPE, HEADLAND, LEAD_IN, PASS, TRANSIT, TURN
+from Headlands import Headlands
+from Rectangles import RectangleFactory
+from ToolPath import ToolPath
+
+FIELD = box(0, 0, 12, 30)
+
+def test_dtype():
+    path = ToolPath(1, 1, RectangleFactory(FIELD, 1, 0).rectangles, 20).array
+    assert path.data.dtype == PATH_DTYPE
+    assert PATH_DTYPE.names == ('x', 'y', 'kind', 'pass')
+    assert path.x.dtype == np.float64 and path.kind.dtype == np.uint8 and path.passIndex.dtype == np.int32
+
+    # coords is a view, not a copy
+    path.coords[0] = (-1, -2)
+    assert (path.x[0], path.y[0]) == (-1, -2)
+
+def test_kinds_of_each_pass():
+    toolPath = ToolPath(1, 1, RectangleFactory(FIELD, 1, 0).rectangles, 20)
+    path, lead = toolPath.array, toolPath.normalizedPts
+
+    # the first pass is only the pass, every other one its lead in, the turn into it and then the pass
+    passes = np.split(path.kind, np.flatnonzero(np.diff(path.passIndex)) + 1)
+    assert len(passes) == 12
+    assert passes[0].tolist() == [PASS] * 21
+    for kinds in passes[1:]:
+        assert kinds.tolist() == [LEAD_IN] * lead + [TURN] * 20 + [PASS] * 20
+    assert (np.diff(path.passIndex) >= 0).all()
+
+@pytest.fixture
+def filled(monkeypatch):
+    # every preallocated path and the furthest row written into it
+    paths = {}
+    empty, write = PathArray.Empty.__func__, PathArray.Write
+
+    def Empty(cls, size):
+        path = empty(cls, size)
+        paths[id(path)] = [path, 0]
+        return path
+
+    def Write(self, offset, points, kind, passIndex):
+        end = write(self, offset, points, kind, passIndex)
+        if id(self) in paths:
+            paths[id(self)][1] = max(paths[id(self)][1], end)
+        return end
+
+    monkeypatch.setattr(PathArray, 'Empty', classmethod(Empty))
+    monkeypatch.setattr(PathArray, 'Write', Write)
+    return paths
+
+@pytest.mark.parametrize('plan', [
+    lambda: ToolPath(1, 1, RectangleFactory(FIELD, 1, 0).rectangles, 20).array,
+    lambda: ToolPath(1, 1, RectangleFactory(FIELD, 1, 0).rectangles, 20, chordTolerance = 0.01).array,
+    lambda: PathArray.Concatenate(ToolPath(1, 1, RectangleFactory(FIELD, 1, 0).rectangles, 20, stream = True).Segments()),
+    lambda: Headlands(FIELD.difference(Point(6, 15).buffer(3)), 1, 1, 20, rings = 2).array,
+])
+def test_preallocated_rows_are_all_filled(filled, plan):
+    path = plan()
+
+    assert filled
+    for allocated, written in filled.values():
+        assert written == len(allocated)
+
+    # every row is one of the known kinds
+    assert np.isin(path.kind, [PASS, TURN, LEAD_IN, TRANSIT, HEADLAND]).all()
@@ -0,0 +1,49 @@
+# Library
+import os
+
+import numpy as np
+import pytest
+from shapely.geometry import Polygon
+
+# Local
+from PlanCache import PlanCache
+
+FIELD = Polygon([(0, 0), (40, 3), (45, 30), (10, 38), (-3, 20)])
+
+def test_hit_from_disk_is_memory_mapped(tmp_path):
+    planned = PlanCache(str(tmp_path)).Plan(FIELD, 1, 1, 20)
+
+    # a new cache has nothing in memory so it reads the file
+    cache = PlanCache(str(tmp_path))
+    plan = cache.Get(cache.Key(FIELD, 1, 1, 20))
+
+    assert cache.Stats()['hits'] == 1
+    assert isinstance(plan.path.data, np.memmap)
+    assert isinstance(plan.bounds, np.memmap)
+    assert not plan.path.data.flags.writeable
+    assert np.array_equal(plan.path.data, planned.path.data)
+    assert np.array_equal(plan.bounds, planned.bounds)
+    assert plan.angle == planned.angle
+
+def test_memory_hits_are_read_only_and_keep_the_disk_order(tmp_path):
+    cache = PlanCache(str(tmp_path))
+    planned = cache.Plan(FIELD, 1, 1, 20)
+    cache.Plan(Polygon([(0, 0), (30, 0), (30, 30)]), 1, 1, 20)
+
+    # a miss and a memory hit behave like a hit from disk
+    assert not planned.path.data.flags.writeable
+    assert not planned.bounds.flags.writeable
+    with pytest.raises(ValueError):
+        planned.frame.Inverse(planned.path.coords)
+
+    # both written a while ago, the first before the other
+    key = cache.Key(FIELD, 1, 1, 20)
+    otherKey = cache.Key(Polygon([(0, 0), (30, 0), (30, 30)]), 1, 1, 20)
+    old = os.path.getmtime(cache.Path(key)) - 100
+    os.utime(cache.Path(key), (old, old))
+    os.utime(cache.Path(otherKey), (old + 50, old + 50))
+    assert cache.Get(key) is planned
+
+    # the first plan was used last, so a new cache over the directory evicts the other one first
+    assert os.path.getmtime(cache.Path(key)) > old
+    assert list(PlanCache(str(tmp_path)).index) == [otherKey, key]
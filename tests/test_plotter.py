@@ -0,0 +1,30 @@
+# Library
+import matplotlib
+import numpy as np
+import pytest
+
+matplotlib.use('Agg')
+
+# Local
+from Plotter import Plotter
+
+X = np.linspace(0, 10, 200)
+Y = np.sin(X)
+
+def test_gif_is_capped_and_written_as_it_goes(tmp_path):
+    from PIL import Image
+
+    plotter = Plotter()
+    plotter.AddPoints((X, Y), connected = True, color = 'black')
+    frames = plotter.ExportAnimation(str(tmp_path / 'path.gif'), X, Y, maxFrames = 20)
+
+    assert frames == 20
+    assert Image.open(str(tmp_path / 'path.gif')).n_frames == 20
+    assert len(plotter.ax.lines) == 1
+
+def test_missing_ffmpeg_says_so(tmp_path, monkeypatch):
+    monkeypatch.setitem(matplotlib.rcParams, 'animation.ffmpeg_path', str(tmp_path / 'no-ffmpeg'))
+    plotter = Plotter()
+
+    with pytest.raises(RuntimeError, match = 'ffmpeg was not found'):
+        plotter.ExportAnimation(str(tmp_path / 'path.mp4'), X, Y)
@@ -0,0 +1,25 @@
+# Library
+import random
+
+from shapely.geometry import Polygon
+
+# Local
+from RandomPolygon import RandomPolygon
+
+def test_default_draws_the_same_polygons_as_before():
+    polygon = RandomPolygon(5, max_coord = 100, seed = 3).polygon
+
+    # what the only strategy there used to be gave, the first valid draw of the seed
+    rng = random.Random(3)
+    while True:
+        expected = Polygon([(rng.uniform(0, 100), rng.uniform(0, 100)) for i in range(5)])
+        if expected.is_valid:
+            break
+
+    assert list(polygon.exterior.coords) == list(expected.exterior.coords)
+
+def test_star_is_valid_first_time():
+    polygon = RandomPolygon(500, seed = 3, strategy = 'star', max_attempts = 1).polygon
+
+    assert polygon.is_valid
+    assert len(polygon.exterior.coords) == 501
@@ -0,0 +1,32 @@
+# Library
+import pytest
+from shapely.geometry import Polygon, box
+
+# Local
+from Coverage import Coverage
+from Rectangles import RectangleFactory
+from ToolPath import ToolPath
+
+# fields with edges along the columns, every crossing of them is on the top or bottom of a column
+FIELDS = {
+    'box': box(0, 0, 100, 50),
+    'L': Polygon([(0, 0), (40, 0), (40, 10), (10, 10), (10, 40), (0, 40)]),
+    'U': Polygon([(0, 0), (60, 0), (60, 40), (45, 40), (45, 12), (15, 12), (15, 40), (0, 40)]),
+}
+
+@pytest.mark.parametrize('name', sorted(FIELDS))
+def test_axis_aligned_fields_are_covered(name):
+    polygon = FIELDS[name]
+    rects = RectangleFactory(polygon, 1)
+    toolPath = ToolPath(1, 1, rects.rectangles, 20, obstacles = rects.obstacles)
+
+    report = Coverage.FromPlan(polygon, rects, toolPath).Exact()
+
+    assert report.covered == pytest.approx(polygon.area, rel = 1e-6)
+    assert report.missed == pytest.approx(0, abs = 1e-6)
+
+def test_box_has_a_rectangle_for_every_column():
+    rects = RectangleFactory(box(0, 0, 100, 50), 1)
+
+    assert len(rects.rectangles.geoms) == 50
+    assert rects.rectangles.area == pytest.approx(5000)
@@ -0,0 +1,70 @@
+# Library
+import numpy as np
+import pytest
+from shapely.geometry import LineString, MultiPolygon, Point, Polygon
+
+# Local
+from Coverage import Coverage
+from PathArray import PASS, TRANSIT
+from Replanner import Replanner
+from ToolPath import ToolPath
+
+FIELD = [(0, 0), (40, 3), (45, 30), (10, 38), (-3, 20)]
+HOLES = [[(5, 10), (8, 10), (8, 14), (5, 14)], [(30, 15), (33, 15), (33, 19), (30, 19)]]
+
+def Fresh(replanner, polygon):
+    obstacles = replanner.factory.LocalObstacles(polygon, None, 1) if polygon.interiors else None
+    return ToolPath(1, 1, replanner.Columns(polygon), 20, obstacles = obstacles).array
+
+@pytest.mark.parametrize('edited', [
+    [(0, 0), (40, 3), (45, 34), (10, 38), (-3, 20)],    # taller
+    [(0, 0), (40, 6), (45, 30), (10, 38), (-3, 20)],    # shorter
+    [(0, 0), (40, 3), (48, 30), (10, 38), (-3, 20)],    # a column more
+    [(0, 0), (40, 3), (42, 30), (10, 38), (-3, 20)],    # a column less
+])
+def test_edit_matches_planning_again(edited):
+    replanner = Replanner(Polygon(FIELD), 1, 1, 20, angle = 0)
+    polygon = Polygon(edited)
+    first, last = replanner.Edit(polygon)
+    fresh = Fresh(replanner, polygon)
+
+    assert 0 < first < last
+    assert np.allclose(replanner.path.coords, fresh.coords)
+    assert np.array_equal(replanner.path.kind, fresh.kind)
+    assert np.array_equal(replanner.path.passIndex, fresh.passIndex)
+
+def test_moving_a_hole_only_replans_near_it():
+    replanner = Replanner(Polygon(FIELD, HOLES), 1, 1, 20, angle = 0)
+    moved = [HOLES[0], [(x, y + 2) for x, y in HOLES[1]]]
+    polygon = Polygon(FIELD, moved)
+    first, last = replanner.Edit(polygon)
+    fresh = Fresh(replanner, polygon)
+
+    # the columns of the hole that stayed where it was are left alone
+    assert replanner.bounds[first, 0] > 8
+    assert np.allclose(replanner.path.coords, fresh.coords)
+
+    # and the spliced path is a good one, not only the same as planning again
+    world = replanner.array
+    driven = [LineString(world.coords[i - 1:i + 1]) for i in np.flatnonzero(world.kind != TRANSIT) if i > 0]
+    for hole in [Polygon(HOLES[0]), Polygon(moved[1])]:
+        assert not any(hole.contains(Point(point)) for point in world.coords)
+        assert sum(line.intersection(hole).length for line in driven) == pytest.approx(0, abs = 1e-6)
+
+    report = Coverage(polygon, world, 1).Raster(regions = True)
+    assert report.missed < 0.02 * report.area
+    # anything missed is round the holes, but for a raster cell or so on the boundary
+    around = MultiPolygon([Polygon(hole) for hole in moved]).buffer(1)
+    assert report.missedRegions is None or report.missedRegions.difference(around).area < 0.1
+
+def test_resume_carries_on_from_the_pass():
+    replanner = Replanner(Polygon(FIELD), 1, 1, 20, angle = 0)
+    lead = replanner.path.data[replanner.splits[5]:replanner.splits[6]]
+    lead = lead[lead['kind'] != PASS][0]
+
+    # stopped right where the lead in into the pass is, the nearest point of the pass is still its start
+    position = replanner.frame.Inverse(np.array([[lead['x'], lead['y']]]))[0]
+    path = replanner.Resume(5, position)
+
+    assert np.all(path.passIndex >= 5)
+    assert np.count_nonzero(path.passIndex == 5) == np.count_nonzero(replanner.path.data[replanner.splits[5]:replanner.splits[6]]['kind'] == PASS)
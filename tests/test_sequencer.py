@@ -0,0 +1,40 @@
+# Library
+import numpy as np
+import pytest
+from shapely.geometry import Polygon, box
+
+# Local
+from PathArray import PASS
+from Rectangles import RectangleFactory
+from Sequencer import Sequencer, TURN_POINTS
+from ToolPath import ToolPath
+
+FIELDS = {
+    'box': box(0, 0, 60, 30),
+    'pentagon': Polygon([(0, 0), (40, 3), (45, 30), (10, 38), (-3, 20)]),
+}
+
+def Between(path):
+    steps = np.hypot(np.diff(path.x), np.diff(path.y))
+    return steps[path.kind[:-1] != PASS].sum()
+
+@pytest.mark.parametrize('name', sorted(FIELDS))
+@pytest.mark.parametrize('turningRadius', [0.1, 3, 6])
+def test_order_is_no_longer_to_drive_than_left_to_right(name, turningRadius):
+    rects = RectangleFactory(FIELDS[name], 1, 0)
+    sequencer = Sequencer(rects.rectangles, turningRadius, toolLength = 1)
+    order = sequencer.Order()
+
+    assert sorted(order) == list(range(len(order)))
+    assert sequencer.cost <= sequencer.baseline
+    assert sequencer.cost == pytest.approx(sequencer.Driven(order)[0])
+    assert sequencer.baseline == pytest.approx(sequencer.Driven(np.arange(len(order)))[0])
+
+@pytest.mark.parametrize('name', sorted(FIELDS))
+def test_driven_length_is_the_assembled_path(name):
+    rects = RectangleFactory(FIELDS[name], 1, 0)
+    sequencer = Sequencer(rects.rectangles, 0, toolLength = 1)
+    order = sequencer.SkipRows(3)
+    path = ToolPath(1, 1, rects.rectangles, TURN_POINTS, order = order).array
+
+    assert sequencer.Driven(order) == (pytest.approx(Between(path)), 0)
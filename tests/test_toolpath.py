@@ -0,0 +1,122 @@
+# Library
+import numpy as np
+import pytest
+from shapely.geometry import LineString, MultiPoint, Point, Polygon, box
+
+# Local
+from Obstacles import Obstacles
+from PathArray import PathArray, LEAD_IN, PASS, TURN
+from Rectangles import RectangleFactory
+from ToolPath import ToolPath, TURN_BLOCKED, TURN_CLEAR, TURN_HEIGHT, TURN_OK, TURN_RAISED, TURN_UNSOLVED
+
+def Plan(field, **kwargs):
+    rects = RectangleFactory(field, 1, 0)
+    return ToolPath(1, 1, rects.rectangles, 20, **kwargs)
+
+def test_turns_are_the_same_in_a_wide_field():
+    narrow = Plan(box(0, 0, 10, 40)).array
+    wide = Plan(box(0, 0, 400, 40)).array
+
+    first = lambda path: path.coords[(path.kind == TURN) & (path.passIndex == 1)]
+    assert np.allclose(first(narrow), first(wide))
+
+    # a turn between neighbouring passes only needs to go a little past them, however wide the field is
+    turns = wide.coords[wide.kind == TURN]
+    assert turns[:, 1].max() < 40 + 1.5
+    assert turns[:, 1].min() > -1.5
+
+def Turn(bounds, obstacles = None):
+    # one turn from the first rectangle up and over into the second, toolSize and toolLength 1
+    path = ToolPath(1, 1, np.array(bounds, dtype=float), 20, stream = True, obstacles = obstacles)
+    rows, turns = path.PassRows(1, 1, path.rectangles, 20, 0, 2)
+    return rows, turns
+
+@pytest.mark.parametrize('top, status', [(10, TURN_CLEAR), (11.2, TURN_OK), (12, TURN_RAISED), (15, TURN_RAISED)])
+def test_turn_status(top, status):
+    rows, turns = Turn([[0, 0, 1, 10], [1, 0, 2, top]])
+    assert turns.status.tolist() == [status]
+
+    # p1 only moves off its starting height when it had to be raised
+    if status == TURN_RAISED:
+        assert turns.offset[0] > TURN_HEIGHT
+    else:
+        assert turns.offset[0] == pytest.approx(TURN_HEIGHT)
+
+    # either way the curve is over the second pass by the time it gets a tenth of the toolSize from it
+    curve = rows.coords[rows.kind == TURN]
+    near = curve[:, 0] >= 1.5 - 0.1
+    assert (curve[near, 1] >= top - 1e-9).all()
+
+def test_turn_between_passes_on_top_of_each_other_is_unsolved():
+    _, turns = Turn([[0, 0, 1, 10], [0.05, 0, 1.05, 15]])
+    assert turns.status.tolist() == [TURN_UNSOLVED]
+
+def test_turn_into_an_obstacle_is_blocked():
+    obstacle = Obstacles([box(0.9, 10.8, 1.1, 11.6)], 0.1)
+    _, turns = Turn([[0, 0, 1, 10], [1, 0, 2, 10]], obstacle)
+    assert turns.status.tolist() == [TURN_BLOCKED]
+
+    # the same turn with the obstacle out of the way is fine
+    _, turns = Turn([[0, 0, 1, 10], [1, 0, 2, 10]], Obstacles([box(0.9, 20, 1.1, 21)], 0.1))
+    assert turns.status.tolist() == [TURN_CLEAR]
+
+STREAMED = {
+    'plain': (Polygon([(0, 0), (40, 3), (45, 30), (10, 38), (-3, 20)]), None),
+    'hole': (Polygon(box(0, 0, 60, 70).exterior.coords, [box(20, 25, 40, 45).exterior.coords]), None),
+    'obstacle': (box(0, 0, 30, 40), [Point(15, 20).buffer(4)]),
+}
+
+@pytest.mark.parametrize('blockSize', [1, 5, 64])
+@pytest.mark.parametrize('options', [{}, {'chordTolerance': 0.01}, {'order': 'reversed'}])
+@pytest.mark.parametrize('name', sorted(STREAMED))
+def test_streamed_passes_join_up_to_the_eager_path(name, options, blockSize):
+    field, obstacles = STREAMED[name]
+    rects = RectangleFactory(field, 1, obstacles = obstacles)
+    if options.get('order') == 'reversed':
+        options = {'order': np.arange(len(rects.rectangles.geoms))[::-1]}
+
+    eager = ToolPath(1, 1, rects.rectangles, 20, obstacles = rects.obstacles, **options).array
+    segments = list(ToolPath(1, 1, rects.rectangles, 20, obstacles = rects.obstacles, stream = True, **options).Segments(blockSize))
+
+    # one segment per pass, in order
+    assert [np.unique(segment.passIndex).tolist() for segment in segments] == [[i] for i in range(len(segments))]
+    path = PathArray.Concatenate(segments)
+    assert np.array_equal(path.kind, eager.kind)
+    assert np.array_equal(path.passIndex, eager.passIndex)
+
+    # the detours round the zones are only found again to rounding
+    assert np.allclose(path.coords, eager.coords, rtol = 0, atol = 1e-9)
+
+@pytest.mark.parametrize('chordTolerance', [0.1, 0.01, 0.001])
+def test_adaptive_turns_stay_within_the_chord_tolerance(chordTolerance):
+    rects = RectangleFactory(STREAMED['plain'][0], 1, 0)
+    toolPath = ToolPath(1, 1, rects.rectangles, 20, chordTolerance = chordTolerance)
+    path = toolPath.array
+
+    # the same curves drawn finely
+    _, turns = toolPath.PassRows(1, 1, toolPath.rectangles, 20, 0, len(toolPath.bounds))
+    curves = toolPath.EvaluateTurns(turns, toolPath.BernsteinBasis(500))
+
+    for i, curve in enumerate(curves, start = 1):
+        # drawn from the end of the lead in to the start of the pass, maybe with no points between
+        rows = np.flatnonzero(path.passIndex == i)
+        rows = np.arange(rows[path.kind[rows] == LEAD_IN][-1], rows[path.kind[rows] == PASS][0] + 1)
+        assert path.kind[rows[0]] == LEAD_IN and path.kind[rows[-1]] == PASS
+
+        drawn = LineString(path.coords[rows])
+        assert max(drawn.distance(Point(point)) for point in curve) <= chordTolerance * 1.01
+
+def test_adaptive_sampling_uses_fewer_points():
+    rects = RectangleFactory(STREAMED['plain'][0], 1, 0)
+    fixed = ToolPath(1, 1, rects.rectangles, 20)
+    counts = [len(ToolPath(1, 1, rects.rectangles, 20, chordTolerance = tolerance).array) for tolerance in (0.1, 0.01)]
+
+    # a tighter tolerance needs more points, but at the default hundredth of the toolSize the straight passes
+    # only needing their ends still more than makes up for it
+    assert counts[0] < counts[1] < len(fixed.array) / 2
+
+    # unless they are given a spacing to keep to
+    spaced = ToolPath(1, 1, rects.rectangles, 20, maxSpacing = 2).array
+    straight = (spaced.kind[1:] != TURN) & (spaced.kind[:-1] != TURN) & (spaced.passIndex[1:] == spaced.passIndex[:-1])
+    gaps = np.hypot(*np.diff(spaced.coords, axis = 0).T)[straight]
+    assert gaps.max() <= 2 + 1e-9
@@ -0,0 +1,48 @@
+# Library
+import numpy as np
+from shapely.geometry import LineString, Point, box
+from shapely.ops import unary_union
+
+# Local
+from PathArray import TURN
+from Rectangles import RectangleFactory
+from ToolPath import ToolPath
+from TurnTemplates import TurnTemplates
+
+def Plan(field, templates = None):
+    rects = RectangleFactory(field, 1, 0)
+    return ToolPath(1, 1, rects.rectangles, 20, templates = templates).array
+
+def test_fields_of_any_shape_share_turns():
+    templates = TurnTemplates()
+    Plan(box(0, 0, 20, 40), templates)
+    misses = templates.Stats()['misses']
+
+    # wider and shorter, but every turn is still one pass across
+    Plan(box(0, 0, 60, 25), templates)
+
+    assert misses > 0
+    assert templates.Stats()['misses'] == misses
+
+def test_templated_turns_match_solved_ones():
+    field = box(0, 0, 60, 25)
+    path = Plan(field, TurnTemplates())
+    solved = Plan(field)
+
+    assert np.allclose(path.coords, solved.coords)
+
+def test_turns_along_a_curved_edge_share_shapes():
+    field = Point(0, 0).buffer(100, 64)
+    rects = RectangleFactory(field, 1)
+    templates = TurnTemplates()
+    toolPath = ToolPath(1, 1, rects.rectangles, 20, templates = templates)
+
+    # the heights of neighbouring passes never repeat exactly on a circle
+    assert templates.Stats()['hitRate'] > 0.5
+
+    # the bent turns still keep the tolerance clear of the passes they go around
+    path = toolPath.array
+    passes = unary_union([box(minX + 0.1, minY, maxX - 0.1, maxY) for minX, minY, maxX, maxY in toolPath.bounds])
+    for i in np.unique(path.passIndex[path.kind == TURN]):
+        turn = LineString(path.coords[(path.kind == TURN) & (path.passIndex == i)])
+        assert turn.intersection(passes).length < 1e-3